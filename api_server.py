@@ -0,0 +1,248 @@
+# api_server.py
+"""
+予測パイプラインの JSON API（ASGI）。
+
+bot.py と同じ asyncio ループ上で uvicorn を起動するので、キャッシュ・HTTP 接続プール・
+チャンネル状態ストアを Discord 側と共有する。
+
+  POST /forecast      {"text": str, "horizon": int, "country": str, "overrides": {...}}
+                      ?stream=1（または Accept: application/x-ndjson）で NDJSON を逐次返す
+  POST /policies      {"text": str}
+  GET  /explain/{id}  ?format=text で整形済みテキスト
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs
+
+import uvicorn
+
+from core.jsonutil import dumps, loads
+
+MAX_BODY = int(os.getenv("API_MAX_BODY", str(64 * 1024)))
+MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))
+QUEUE_WAIT_SEC = float(os.getenv("API_QUEUE_WAIT_SEC", "5"))
+REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "60"))
+# 締め切り：タイムアウトの手前で（劣化してでも）結果を返すための余裕
+DEADLINE_RESERVE = 1.0
+
+_sem: asyncio.Semaphore | None = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _sem
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: List[Tuple[bytes, bytes]] | None = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+
+async def _read_json(receive) -> Dict[str, Any]:
+    chunks, size = [], 0
+    while True:
+        msg = await receive()
+        body = msg.get("body", b"")
+        size += len(body)
+        if size > MAX_BODY:
+            raise HTTPError(413, "request body too large")
+        chunks.append(body)
+        if not msg.get("more_body"):
+            break
+    try:
+        obj = loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise HTTPError(400, "invalid JSON body")
+    if not isinstance(obj, dict):
+        raise HTTPError(400, "JSON body must be an object")
+    return obj
+
+
+async def _send_json(send, status: int, obj: Any, headers: List[Tuple[bytes, bytes]] | None = None):
+    body = dumps(obj).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                            (b"content-length", str(len(body)).encode())] + (headers or [])})
+    await send({"type": "http.response.body", "body": body})
+
+
+class _Slot:
+    """同時実行数の上限。待ち時間が QUEUE_WAIT_SEC を超えたら 429"""
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(_semaphore().acquire(), timeout=QUEUE_WAIT_SEC)
+        except asyncio.TimeoutError:
+            raise HTTPError(429, "too many concurrent requests", [(b"retry-after", b"5")])
+
+    async def __aexit__(self, *exc):
+        _semaphore().release()
+
+
+def _forecast_args(body: Dict[str, Any]) -> Dict[str, Any]:
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPError(400, "'text' is required")
+    try:
+        horizon = int(body.get("horizon", 5))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "'horizon' must be an integer")
+    overrides = body.get("overrides") or {}
+    if not isinstance(overrides, dict):
+        raise HTTPError(400, "'overrides' must be an object")
+    return {"country": body.get("country"), "horizon": horizon, "text": text, "overrides": overrides}
+
+
+def _result_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": result.get("id"),
+        "scenarios": result.get("scenarios"),
+        "cpi": result.get("cpi"),
+        "profile": result.get("profile_used"),
+        "policies": (result.get("policies_struct") or {}).get("policies", []),
+        "degraded": result.get("degraded") or [],
+    }
+
+
+async def _forecast(scope, receive, send):
+    from core.orchestrator import run_pipeline, save_run
+    from core.scheduler import JobRejected, get_scheduler
+    from core.context import request_context
+    args = _forecast_args(await _read_json(receive))
+    qs = parse_qs(scope.get("query_string", b"").decode())
+    accept = dict(scope.get("headers") or []).get(b"accept", b"")
+    stream = qs.get("stream", ["0"])[0] in ("1", "true") or b"application/x-ndjson" in accept
+
+    client = (scope.get("client") or ("api", 0))[0]
+
+    async def submit(**extra):
+        # Discord と同じスケジューラ（全体の上限・公平キュー）を通す。API は1つのギルドとして扱う
+        # 締め切りは待ち時間込み。投入時のコンテキストが実行タスクへ引き継がれる
+        with request_context(max(1.0, REQUEST_TIMEOUT - DEADLINE_RESERVE)):
+            return await get_scheduler().submit(lambda: run_pipeline(**args, **extra), guild="api", user=client)
+
+    async with _Slot():
+        if not stream:
+            try:
+                result = await asyncio.wait_for(submit(), timeout=REQUEST_TIMEOUT)
+            except JobRejected as e:
+                raise HTTPError(503, f"overloaded: {e.reason}", [(b"retry-after", str(int(e.estimated_wait) + 1).encode())])
+            save_run(result.get("explain"))
+            await _send_json(send, 200, _result_payload(result))
+            return
+
+        # NDJSON: 段ごとのイベント → 最終結果（途中で失敗したら error イベント）
+        events: asyncio.Queue = asyncio.Queue()
+        t0 = time.perf_counter()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/x-ndjson; charset=utf-8")]})
+
+        async def emit(obj):
+            await send({"type": "http.response.body", "body": (dumps(obj) + "\n").encode("utf-8"), "more_body": True})
+
+        def progress(event, data):
+            events.put_nowait({"event": event, "elapsed": round(time.perf_counter() - t0, 3), "data": data})
+
+        task = asyncio.ensure_future(asyncio.wait_for(submit(progress=progress), timeout=REQUEST_TIMEOUT))
+        await emit({"event": "accepted"})
+        try:
+            while not task.done() or not events.empty():
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    await emit(getter.result())
+                else:
+                    getter.cancel()
+            result = task.result()
+            save_run(result.get("explain"))
+            await emit({"event": "result", "elapsed": round(time.perf_counter() - t0, 3), "data": _result_payload(result)})
+        except Exception as e:
+            await emit({"event": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            if not task.done():
+                task.cancel()
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _policies(scope, receive, send):
+    from core.orchestrator import extract_policies
+    from core.policy import policies_to_struct
+    body = await _read_json(receive)
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPError(400, "'text' is required")
+    async with _Slot():
+        data = await asyncio.wait_for(extract_policies(text), timeout=REQUEST_TIMEOUT)
+    await _send_json(send, 200, policies_to_struct(data.get("policies") or [], data.get("horizon_years")))
+
+
+async def _explain(scope, receive, send, run_id: str):
+    from core.orchestrator import get_run
+    from core.explain import render_lines
+    rec = get_run(run_id)
+    if rec is None:
+        raise HTTPError(404, "unknown id")
+    qs = parse_qs(scope.get("query_string", b"").decode())
+    if qs.get("format", [""])[0] == "text":
+        body = "\n".join(render_lines(rec)).encode("utf-8")
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+        return
+    await _send_json(send, 200, rec)
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    method, path = scope["method"], scope["path"].rstrip("/") or "/"
+    try:
+        if path == "/forecast":
+            if method != "POST":
+                raise HTTPError(405, "method not allowed")
+            await _forecast(scope, receive, send)
+        elif path == "/policies":
+            if method != "POST":
+                raise HTTPError(405, "method not allowed")
+            await _policies(scope, receive, send)
+        elif path.startswith("/explain/"):
+            if method != "GET":
+                raise HTTPError(405, "method not allowed")
+            await _explain(scope, receive, send, path[len("/explain/"):])
+        else:
+            raise HTTPError(404, "not found")
+    except HTTPError as e:
+        await _send_json(send, e.status, {"error": e.message}, e.headers)
+    except asyncio.TimeoutError:
+        await _send_json(send, 504, {"error": "pipeline timed out"})
+    except Exception as e:
+        print("[api] error:", repr(e))
+        await _send_json(send, 500, {"error": f"{type(e).__name__}: {e}"})
+
+
+class _EmbeddedServer(uvicorn.Server):
+    # シグナル処理は discord.Client 側に任せる
+    def capture_signals(self):
+        from contextlib import nullcontext
+        return nullcontext()
+
+
+async def serve(host: str | None = None, port: int | None = None):
+    """現在のイベントループ上で API を起動（bot.py の setup_hook から呼ぶ）"""
+    host = host or os.getenv("API_HOST", "0.0.0.0")
+    port = port or int(os.getenv("API_PORT", "8081"))
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off", access_log=False)
+    print(f"[api] listening on {host}:{port}")
+    await _EmbeddedServer(config).serve()
+
+
+if __name__ == "__main__":
+    # 単体起動（Discord なし）
+    asyncio.run(serve())
@@ -0,0 +1,72 @@
+# backtest.py
+"""
+成長モデルの過去データによるバックテスト CLI（tiers.yml を変えたときの確認・CI 用）。
+
+  python ingest_data.py wb-panel WDICSV.csv          # 先に過去パネルを作る（data/wb_panel.cols）
+  python backtest.py --start 1995 --end 2018 --horizon 5
+  python backtest.py --tiers tiers_new.yml -o new.json --compare baseline.json --tolerance 0.05
+
+- 表（ティア × h の MAE / RMSE / バイアス / 帯の的中率 / 前年値持ち越しとの比較）を標準出力に出す
+- -o で結果を JSON に保存。--compare で前回の JSON と比べ、MAE が --tolerance（pp）を超えて
+  悪化したセルがあれば一覧を出して終了コード 1
+- 過去パネルが無ければ終了コード 2
+"""
+import argparse
+import json
+import sys
+import time
+
+
+def main(argv=None) -> int:
+    this_year = time.gmtime().tm_year
+    ap = argparse.ArgumentParser(description="成長モデルの過去データによるバックテスト")
+    ap.add_argument("--start", type=int, default=1995, help="最初の基準年（既定 1995）")
+    ap.add_argument("--end", type=int, default=this_year - 2, help="最後の基準年（既定 今年-2）")
+    ap.add_argument("--horizon", type=int, default=5, help="予測年数（1–10、既定 5）")
+    ap.add_argument("--tiers", help="使うティア表（既定: TIERS_PATH の tiers.yml）")
+    ap.add_argument("--panel", help="過去パネル（既定: WB_PANEL_STORE）")
+    ap.add_argument("-o", "--output", help="結果の JSON の保存先")
+    ap.add_argument("--compare", help="比べる前回の結果（JSON）")
+    ap.add_argument("--tolerance", type=float, default=0.05, help="許容する MAE の悪化（pp、既定 0.05）")
+    ap.add_argument("--min-n", type=int, default=30, help="比べるセルの最小件数（既定 30）")
+    ap.add_argument("-q", "--quiet", action="store_true", help="表を出さない")
+    args = ap.parse_args(argv)
+
+    from core import backtest, tiers
+    from core.colstore import open_store
+    from providers.data_worldbank import WB_PANEL_STORE
+
+    panel = open_store(args.panel or WB_PANEL_STORE)
+    if panel is None:
+        print(f"[backtest] panel not found: {args.panel or WB_PANEL_STORE} "
+              f"(run: python ingest_data.py wb-panel ...)", file=sys.stderr)
+        return 2
+    try:
+        tables = tiers.load_tables(args.tiers) if args.tiers else tiers.tables()
+    except Exception as e:   # YAML の構文エラーも含む
+        print(f"[backtest] cannot load tiers: {e!r}", file=sys.stderr)
+        return 2
+
+    res = backtest.run(panel, tables, args.start, args.end, args.horizon)
+    res["tiers"] = args.tiers or tiers.TIERS_PATH
+    if not args.quiet:
+        print(backtest.format_table(res))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        worse = backtest.compare(res, old, args.tolerance, args.min_n)
+        for w in worse:
+            print(f"[backtest] worse: {w['tier']} {w['h']} mae {w['prev_mae']:.3f} -> {w['mae']:.3f}",
+                  file=sys.stderr)
+        if worse:
+            return 1
+        print(f"[backtest] no regression vs {args.compare} (tolerance {args.tolerance}pp)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# batch_forecast.py
+"""
+JSONL の入力をまとめて予測するオフライン用 CLI（研究・回帰確認用）。
+
+  python batch_forecast.py input.jsonl -o out.jsonl --concurrency 8 --workers 4
+
+入力は1行1件: {"id": 任意, "country": str, "horizon": int, "text": str, "overrides": {...}}
+（id が無ければ "line:<行番号>"。"-" で標準入力）
+
+- 入力は逐次読み込み、同時に走らせるのは --concurrency 件まで（LLM・外部 API の I/O 待ち）
+- モデル計算は --workers 個のプロセスプール（core.offload と共有）で実行（0 ならメインプロセス）。
+  大きいテキストの抽出・政策クラスタリングも同じプールに出る
+- 結果は完了順に1行ずつ書き出し、行ごとに段別の所要秒を付ける
+- -o の出力が既にあれば、成功済みの id を飛ばして追記する（中断からの再開）。失敗行は出力から消してから
+  再実行するので、再開後も出力の id は1件ずつ
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+
+def _read_rows(fp: TextIO) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """(row_id, row, エラー) を順に返す。壊れた行もエラーとして出力に残す"""
+    for lineno, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield f"line:{lineno}", None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield f"line:{lineno}", None, "row must be an object"
+            continue
+        rid = row.get("id")
+        yield (str(rid) if rid is not None else f"line:{lineno}"), row, None
+
+
+def _compact_output(path: str) -> Set[str]:
+    """再開前に既存の出力を成功行だけに詰め直し、成功済み id を返す。
+    失敗行（このあと再実行して追記される）・同じ id の2回目以降の成功行・途中で切れた最終行は捨てる。
+    1行ずつ一時ファイルへ写してから置き換えるので、出力全体はメモリに載せない"""
+    done: Set[str] = set()
+    tmp = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+            for line in src:
+                try:
+                    rec = json.loads(line)
+                    rid = rec.get("id")
+                except (ValueError, AttributeError):
+                    continue
+                if rid is None or not rec.get("ok") or str(rid) in done:
+                    continue
+                done.add(str(rid))
+                dst.write(line if line.endswith("\n") else line + "\n")
+    except FileNotFoundError:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        return done
+    os.replace(tmp, path)
+    return done
+
+
+async def _run_row(rid: str, row: Dict[str, Any], executor, deadline: Optional[float]) -> Dict[str, Any]:
+    from core.orchestrator import run_pipeline
+    t0 = time.perf_counter()
+    try:
+        text = row.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("'text' is required")
+        result = await run_pipeline(
+            country=row.get("country"),
+            horizon=int(row.get("horizon", 5)),
+            text=text,
+            overrides=row.get("overrides") or {},
+            deadline=deadline,
+            executor=executor,
+        )
+    except Exception as e:
+        return {"id": rid, "ok": False, "error": f"{type(e).__name__}: {e}",
+                "timings": {"total": round(time.perf_counter() - t0, 4)}}
+    profile = result.get("profile_used") or {}
+    return {
+        "id": rid,
+        "ok": True,
+        "run_id": result.get("id"),
+        "country": profile.get("display_name"),
+        "income_tier": profile.get("income_tier"),
+        "scenarios": result.get("scenarios"),
+        "cpi": result.get("cpi"),
+        "policies": (result.get("policies_struct") or {}).get("policies", []),
+        "degraded": result.get("degraded") or [],
+        "timings": result.get("timings") or {"total": round(time.perf_counter() - t0, 4)},
+    }
+
+
+async def run_batch(inp: TextIO, out: TextIO, concurrency: int = 8, executor=None,
+                    skip: Optional[Set[str]] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+    from core.jsonutil import dumps
+    skip = skip or set()
+    stats = {"ok": 0, "error": 0, "skipped": 0, "totals": []}
+    pending: Set[asyncio.Task] = set()
+
+    def _write(rec: Dict[str, Any]):
+        out.write(dumps(rec) + "\n")
+        out.flush()   # 1行ずつ確定させる（再開用）
+        stats["ok" if rec.get("ok") else "error"] += 1
+        stats["totals"].append(rec["timings"]["total"])
+
+    async def _drain(return_when):
+        nonlocal pending
+        if not pending:
+            return
+        done, pending = await asyncio.wait(pending, return_when=return_when)
+        for t in done:
+            _write(t.result())
+
+    for rid, row, err in _read_rows(inp):
+        if rid in skip:
+            stats["skipped"] += 1
+            continue
+        if err is not None:
+            _write({"id": rid, "ok": False, "error": err, "timings": {"total": 0.0}})
+            continue
+        skip.add(rid)   # 入力内の重複 id も1回だけ
+        while len(pending) >= concurrency:
+            await _drain(asyncio.FIRST_COMPLETED)
+        pending.add(asyncio.ensure_future(_run_row(rid, row, executor, deadline)))
+    await _drain(asyncio.ALL_COMPLETED)
+    return stats
+
+
+def _pct(xs, q):
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="JSONL バッチ予測")
+    ap.add_argument("input", help="入力 JSONL（- で標準入力）")
+    ap.add_argument("-o", "--output", help="出力 JSONL（省略時は標準出力。指定すると再開可能）")
+    ap.add_argument("-c", "--concurrency", type=int, default=8, help="同時実行件数（I/O）")
+    ap.add_argument("-w", "--workers", type=int, default=0, help="モデル計算のプロセス数（0=メインプロセス）")
+    ap.add_argument("--deadline", type=float, default=None, help="1件あたりの締め切り秒（超えたら劣化結果）")
+    ap.add_argument("--restart", action="store_true", help="既存の出力を消して最初から")
+    args = ap.parse_args(argv)
+
+    # パイプラインのログは stderr へ（標準出力は JSONL 専用）
+    real_stdout = sys.stdout
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        inp = sys.stdin if args.input == "-" else stack.enter_context(open(args.input, encoding="utf-8"))
+        skip: Set[str] = set()
+        if args.output:
+            if not args.restart:
+                skip = _compact_output(args.output)
+            out = stack.enter_context(open(args.output, "w" if args.restart else "a", encoding="utf-8"))
+        else:
+            out = real_stdout
+        from core import offload
+        offload.configure(args.workers)
+        stack.callback(offload.shutdown)
+        executor = offload.get_pool()
+        if executor is not None:
+            offload.warm()
+
+        t0 = time.perf_counter()
+        stats = asyncio.run(run_batch(inp, out, max(1, args.concurrency), executor, skip, args.deadline))
+        wall = time.perf_counter() - t0
+
+    tot = stats["totals"]
+    print(f"[batch] ok={stats['ok']} error={stats['error']} skipped={stats['skipped']} "
+          f"wall={wall:.1f}s p50={_pct(tot, 0.5):.2f}s p95={_pct(tot, 0.95):.2f}s",
+          file=sys.stderr)
+    return 0 if stats["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
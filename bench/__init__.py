@@ -0,0 +1 @@
+# bench: ベンチマーク・負荷試験用のスクリプト群（本番では import しない）
@@ -0,0 +1,145 @@
+# bench/loadgen.py
+"""
+run_pipeline への負荷生成（プロバイダはプロセス内スタブ）。
+
+Discord の /forecast と同じく、締め切り付きのコンテキストでスケジューラに投入する。
+--concurrency 個の仮想ユーザーが合計 --requests 件を閉ループで投げ、
+スループットとレイテンシのパーセンタイルを返す。
+
+スタブの遅延は core.cassette.LatencyModel の書式（lognormal:<中央値ms>:<sigma> など）。
+入力テキストは数種類しかないので、既定ではほぼ同じテキストの再利用（core.neardup）を切る
+（有効のままだと最初の数件以外は索引から返り、パイプラインではなく再利用の速さを測ることになる）。
+"""
+import asyncio
+import contextlib
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+_TEXTS = [
+    "港湾インフラ整備に年1.5兆円、教育投資と規制改革",
+    "半導体工場に補助金5000億円、法人税減税",
+    "FTA を締結して輸出を拡大、物流の効率化",
+    "職業訓練とリスキリングを拡充、スタートアップの起業手続を簡素化",
+    "送電網の更新に GDP 比 0.5% を投資",
+]
+_COUNTRIES = ["Japan", "United States", "Germany", "India", "Viet Nam", "China", "Ethiopia"]
+
+
+def percentile(xs: List[float], q: float) -> float:
+    """最近傍順位法のパーセンタイル（q は 0–100）"""
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    k = max(0, min(len(xs) - 1, int(round(q / 100.0 * len(xs) + 0.5)) - 1))
+    return xs[k]
+
+
+def install_stubs(llm_latency: str = "lognormal:800:0.5", data_latency: str = "lognormal:80:0.4",
+                  error_rate: float = 0.0, seed: int = 0, neardup: bool = False):
+    """LLM / World Bank / FX をネットワークに出ないスタブへ差し替える。neardup=False で再利用の索引も切る"""
+    import providers.data_worldbank as wb
+    import providers.fx_exchangerate as fx
+    import providers.llm_gemini as ge
+    import providers.llm_openai as oa
+    from bench.mock_upstream import _COUNTRIES as META
+    from core import neardup as neardup_index
+    from core.cassette import LatencyModel
+    from providers.llm_local import extract_policies_local
+
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    lat_llm = LatencyModel(llm_latency, seed=seed)
+    lat_data = LatencyModel(data_latency, seed=seed + 1)
+    rng = random.Random(seed)
+    by_name = {c["name"].lower(): (iso3, c) for iso3, c in META.items()}
+    tiers = {"HIC": "high_income", "UMC": "middle_income", "LMC": "middle_income", "LIC": "low_income"}
+
+    async def llm(text: str):
+        await asyncio.sleep(lat_llm.delay(0.0))
+        if rng.random() < error_rate:
+            raise RuntimeError("stub provider error")
+        out = extract_policies_local(text)
+        out.pop("_model_name", None)
+        return out
+
+    def wb_profile(name: str):
+        time.sleep(lat_data.delay(0.0))
+        hit = by_name.get((name or "").strip().strip('"').lower())
+        if hit is None:
+            return None
+        iso3, c = hit
+        return {"display_name": c["name"], "iso3": iso3, "baseline_gdp_usd": c["gdp"],
+                "income_tier": tiers.get(c["income"], "middle_income"), "inflation_recent": c["infl"],
+                "openness_ratio": c["open"] / 100.0, "investment_rate": c["invest"] / 100.0,
+                "labor_growth": c["pop"], "debt_to_gdp": None}
+
+    async def fx_rates(base: str = "USD"):
+        await asyncio.sleep(lat_data.delay(0.0))
+        return {"base": base, "rates": {}}
+
+    oa.extract_policies_openai = llm
+    ge.extract_policies_gemini = llm
+    wb.fetch_country_profile = wb.fetch_wb_profile = wb_profile
+    fx.fetch_fx = fx_rates
+    neardup_index.ENABLED = neardup
+
+
+async def _run(concurrency: int, requests: int, deadline: Optional[float], guilds: int, seed: int) -> Dict[str, Any]:
+    from core.context import request_context
+    from core.orchestrator import run_pipeline
+    from core.scheduler import JobRejected, get_scheduler
+
+    sched = get_scheduler()
+    rng = random.Random(seed)
+    plan = [(rng.choice(_COUNTRIES), rng.randint(3, 10), rng.choice(_TEXTS)) for _ in range(requests)]
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    it = iter(enumerate(plan))
+
+    async def user(uid: int):
+        for i, (country, horizon, text) in it:
+            t0 = time.perf_counter()
+            try:
+                with request_context(deadline or 1e9):
+                    res = await sched.submit(
+                        lambda: run_pipeline(country=country, horizon=horizon, text=text, overrides={}),
+                        guild=uid % max(1, guilds), user=uid)
+            except JobRejected:
+                outcomes["rejected"] += 1
+                continue
+            except Exception as e:
+                outcomes["error:" + type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+            outcomes["degraded" if res.get("degraded") else "ok"] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user(u) for u in range(concurrency)))
+    wall = time.perf_counter() - t0
+    done = len(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "completed": done,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(done / wall, 3) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+        "outcomes": dict(outcomes),
+    }
+
+
+def run(concurrency: int = 16, requests: int = 200, deadline: Optional[float] = 55.0, guilds: int = 4,
+        llm_latency: str = "lognormal:800:0.5", data_latency: str = "lognormal:80:0.4",
+        error_rate: float = 0.0, seed: int = 0, neardup: bool = False) -> Dict[str, Any]:
+    install_stubs(llm_latency, data_latency, error_rate, seed, neardup)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        res = asyncio.run(_run(concurrency, requests, deadline, guilds, seed))
+    res.update({"llm_latency": llm_latency, "data_latency": data_latency, "error_rate": error_rate,
+                "neardup": neardup})
+    return res
@@ -0,0 +1,121 @@
+# bench/micro.py
+"""
+ホットパスのマイクロベンチマーク。
+
+各関数を固定シードの合成入力で繰り返し実行し、1回あたりの所要時間（µs）の
+中央値・最小値を返す。1回の計測が --min-time 秒以上になるよう反復回数を自動調整する。
+"""
+import contextlib
+import os
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+_LEVER_TOKENS = ["インフラ", "infrastructure", "教育", "education", "規制", "deregulation", "産業", "industrial policy",
+                 "貿易", "trade", "エネルギー", "energy", "物流", "logistics", "金融", "finance", "ガバナンス", "税", "R&D"]
+_TITLES = ["港湾インフラ整備", "高速鉄道網の建設", "職業訓練の拡充", "規制改革パッケージ", "半導体工場への補助金",
+           "FTA の締結", "送電網の更新", "法人税減税", "スタートアップ支援", "デジタル政府の推進", "大学研究費の増額",
+           "物流 DX"]
+_UNITS = [("trillion_yen_per_year", 1.5), ("%GDP", 0.8), ("USD", 2.0e9), (None, None), ("percent", 3.0)]
+_TEXT = ("港湾インフラ整備に年1.5兆円を投じ、送電網と鉄道を更新する。職業訓練とリスキリングを拡充し、"
+         "規制改革でビジネス環境を改善する。半導体の製造業に補助金、FTA で輸出を後押し。") * 3
+
+
+def _synthetic_outputs(rng: random.Random, models=("openai", "gemini", "claude", "local"), per_model: int = 12):
+    from core.policy import Policy
+    outs = []
+    for m in models:
+        pols = []
+        for _ in range(per_model):
+            title = rng.choice(_TITLES) + ("" if rng.random() < 0.6 else "（第2弾）")
+            unit, val = rng.choice(_UNITS)
+            pols.append(Policy.from_dict({
+                "title": title,
+                "lever": rng.sample(_LEVER_TOKENS, rng.randint(1, 3)),
+                "lag_years": rng.randint(0, 3),
+                "scale": None if unit is None else {"value": val, "unit": unit},
+                "confidence": rng.choice("SABCD"),
+            }))
+        outs.append({"_model_name": m, "horizon_years": 5, "policies": pols})
+    return outs
+
+
+def _fixtures(seed: int) -> Dict[str, Any]:
+    from core import tiers
+    rng = random.Random(seed)
+    outputs = _synthetic_outputs(rng)
+    wb = {"display_name": "Japan", "iso3": "JPN", "baseline_gdp_usd": 4.2e12, "income_tier": "high_income",
+          "inflation_recent": 3.2, "openness_ratio": 0.45, "investment_rate": 0.26, "labor_growth": -0.5}
+    profile = dict(wb, tier_params=tiers.get("high_income"))
+    return {"outputs": outputs, "policies": [p for o in outputs for p in o["policies"]][:16],
+            "wb": wb, "profile": profile}
+
+
+def cases(seed: int = 0) -> Dict[str, Callable[[], Any]]:
+    """名前 → 引数なしで1回分を実行する関数"""
+    from core.ensemble import cluster_policies, merge_outputs
+    from core.model import make_growth_paths
+    from core.orchestrator import fuse_profile
+    from core.policy import _normalize_lever_token
+    from providers.llm_local import extract_policies_local
+
+    fx = _fixtures(seed)
+    tokens = _LEVER_TOKENS
+
+    def norm_cold():
+        _normalize_lever_token.cache_clear()
+        for t in tokens:
+            _normalize_lever_token(t)
+
+    def norm_cached():
+        for t in tokens:
+            _normalize_lever_token(t)
+
+    return {
+        "cluster_policies": lambda: cluster_policies(fx["outputs"]),
+        "merge_outputs": lambda: merge_outputs(fx["outputs"]),
+        "normalize_lever_token": norm_cold,
+        "normalize_lever_token_cached": norm_cached,
+        "extract_policies_local": lambda: extract_policies_local(_TEXT),
+        "make_growth_paths": lambda: make_growth_paths(fx["profile"], fx["policies"], 10),
+        "fuse_profile": lambda: fuse_profile(fx["wb"], {}, {}, {}, {"investment_rate": 0.3}, "Japan"),
+    }
+
+
+def _time_once(fn: Callable[[], Any], number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - t0) / number
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    # 反復回数を 1 回の計測が min_time 秒を超えるまで倍々に増やす
+    number = 1
+    while True:
+        dt = _time_once(fn, number) * number
+        if dt >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if dt <= 0 else max(2, min(10, int(min_time / dt) + 1))
+    samples = [_time_once(fn, number) * 1e6 for _ in range(repeat)]
+    return {"median_us": round(statistics.median(samples), 3), "min_us": round(min(samples), 3),
+            "number": number, "repeat": repeat}
+
+
+def run(only: List[str] | None = None, repeat: int = 5, min_time: float = 0.2, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    res: Dict[str, Dict[str, Any]] = {}
+    # パイプラインのログ（print）は計測の邪魔なので捨てる
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        table = cases(seed)
+        for name, fn in table.items():
+            if only and name not in only:
+                continue
+            fn()   # ウォームアップ（遅延 import・キャッシュ）
+            res[name] = measure(fn, repeat, min_time)
+    return res
+
+
+def format_table(res: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
+    return [(name, f"{r['median_us']:>12.2f} µs  (min {r['min_us']:.2f}, n={r['number']}x{r['repeat']})")
+            for name, r in res.items()]
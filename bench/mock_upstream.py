@@ -0,0 +1,282 @@
+# bench/mock_upstream.py
+"""
+負荷試験用のローカル上流モック（ASGI）。プロバイダが叩くエンドポイントだけを実装する。
+
+  python -m bench.mock_upstream --port 9100 --latency lognormal:80:0.4 --llm-latency lognormal:1500:0.5 \
+      --error-rate 0.02 --rate-limit-rate 0.05 --slow-stream-rate 0.01
+
+プロバイダ側はベース URL を差し替えて使う:
+  WB_BASE_URL=http://127.0.0.1:9100/v2
+  OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+  ANTHROPIC_BASE_URL=http://127.0.0.1:9100/v1
+  GEMINI_BASE_URL=http://127.0.0.1:9100/v1beta
+  FX_BASE_URL=http://127.0.0.1:9100
+
+- 遅延はルート種別（data / llm）ごとの分布（core.cassette.LatencyModel と同じ書式）
+  --route openai=lognormal:3000:0.3 のようにルート単位でも上書きできる
+- 一定確率で 500 / 429（retry-after 付き）を返す
+- 一定確率でボディを少しずつ送る（slow stream：読み取りタイムアウトの確認用）
+- LLM の応答内容はプロンプト中の政策テキストをローカル抽出器にかけて作る（スキーマ準拠）
+- GET /__stats でルート×結果ごとの件数、POST /__reset でリセット
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+import uvicorn
+
+from core.cassette import LatencyModel
+
+# 国メタデータ（ISO3 → 名前, 所得区分, 通貨, 指標の既定値）
+_COUNTRIES: Dict[str, Dict[str, Any]] = {
+    "JPN": {"name": "Japan", "iso2": "JP", "income": "HIC", "ccy": "JPY", "gdp": 4.2e12, "gdp_pc": 33800,
+            "invest": 26.0, "open": 45.0, "infl": 3.2, "pop": -0.5},
+    "USA": {"name": "United States", "iso2": "US", "income": "HIC", "ccy": "USD", "gdp": 2.7e13, "gdp_pc": 80000,
+            "invest": 21.5, "open": 25.0, "infl": 4.1, "pop": 0.5},
+    "DEU": {"name": "Germany", "iso2": "DE", "income": "HIC", "ccy": "EUR", "gdp": 4.5e12, "gdp_pc": 52700,
+            "invest": 22.0, "open": 88.0, "infl": 5.9, "pop": 0.8},
+    "IND": {"name": "India", "iso2": "IN", "income": "LMC", "ccy": "INR", "gdp": 3.6e12, "gdp_pc": 2500,
+            "invest": 31.0, "open": 46.0, "infl": 5.6, "pop": 0.8},
+    "VNM": {"name": "Viet Nam", "iso2": "VN", "income": "LMC", "ccy": "VND", "gdp": 4.3e11, "gdp_pc": 4300,
+            "invest": 33.0, "open": 180.0, "infl": 3.3, "pop": 0.7},
+    "CHN": {"name": "China", "iso2": "CN", "income": "UMC", "ccy": "CNY", "gdp": 1.8e13, "gdp_pc": 12600,
+            "invest": 42.0, "open": 37.0, "infl": 0.2, "pop": -0.1},
+    "ETH": {"name": "Ethiopia", "iso2": "ET", "income": "LIC", "ccy": "ETB", "gdp": 1.6e11, "gdp_pc": 1300,
+            "invest": 25.0, "open": 20.0, "infl": 30.2, "pop": 2.5},
+}
+_IND_FIELD = {
+    "NY.GDP.MKTP.CD": "gdp", "NY.GDP.PCAP.CD": "gdp_pc", "NE.GDI.FTOT.ZS": "invest",
+    "NE.TRD.GNFS.ZS": "open", "FP.CPI.TOTL.ZG": "infl", "SP.POP.GROW": "pop",
+}
+_FX = {"USD": 1.0, "JPY": 150.0, "EUR": 0.92, "INR": 83.0, "VND": 24500.0, "CNY": 7.2, "ETB": 57.0, "GBP": 0.79}
+
+_ROUTE_KIND = {"wb": "data", "fx": "data", "openai": "llm", "gemini": "llm", "anthropic": "llm"}
+
+
+class MockConfig:
+    def __init__(self, latency: str = "lognormal:60:0.4", llm_latency: str = "lognormal:1200:0.5",
+                 routes: Optional[Dict[str, str]] = None, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 slow_stream_rate: float = 0.0, stream_chunk_delay: float = 0.5, seed: Optional[int] = None):
+        self.latency = {
+            "data": LatencyModel(latency, seed=seed),
+            "llm": LatencyModel(llm_latency, seed=None if seed is None else seed + 1),
+        }
+        self.routes = {k: LatencyModel(v, seed=seed) for k, v in (routes or {}).items()}
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.slow_stream_rate = float(slow_stream_rate)
+        self.stream_chunk_delay = float(stream_chunk_delay)
+        self.rng = random.Random(seed)
+        self.stats: Counter = Counter()
+
+    def delay(self, route: str) -> float:
+        m = self.routes.get(route) or self.latency[_ROUTE_KIND.get(route, "data")]
+        return m.delay(0.0)
+
+
+# ---- 応答の中身 ----
+def _wb_meta(n: int) -> Dict[str, Any]:
+    return {"page": 1, "pages": 1, "per_page": max(1, n), "total": n}
+
+
+def _wb_country_row(iso3: str, c: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": iso3, "iso2Code": c["iso2"], "name": c["name"],
+            "region": {"id": "", "value": ""}, "incomeLevel": {"id": c["income"], "value": c["income"]}}
+
+
+def _wb(path: str) -> Tuple[int, Any]:
+    parts = [p for p in path.split("/") if p]   # ["v2", "country", ...]
+    if parts[:2] != ["v2", "country"]:
+        return 404, {"error": "not found"}
+    if len(parts) == 2:
+        rows = [_wb_country_row(k, c) for k, c in _COUNTRIES.items()]
+        return 200, [_wb_meta(len(rows)), rows]
+    iso3 = parts[2].upper()
+    c = _COUNTRIES.get(iso3)
+    if c is None:
+        return 200, [{"message": [{"id": "120", "key": "Invalid value"}]}]
+    if len(parts) == 3:
+        return 200, [_wb_meta(1), [_wb_country_row(iso3, c)]]
+    if len(parts) == 5 and parts[3] == "indicator":
+        rows = []
+        for code in parts[4].split(";") if ";" in parts[4] else parts[4].split(","):
+            field = _IND_FIELD.get(code)
+            for year in range(2023, 2013, -1):
+                v = None if field is None else c[field] * (1.0 - 0.01 * (2023 - year))
+                rows.append({"indicator": {"id": code, "value": code}, "country": {"id": c["iso2"], "value": c["name"]},
+                             "countryiso3code": iso3, "date": str(year), "value": v})
+        return 200, [_wb_meta(len(rows)), rows]
+    return 404, {"error": "not found"}
+
+
+_PROMPT_TEXT = re.compile(r"政策テキスト:\s*\n(.*?)(?:\n出力は JSON のみ。|\Z)", re.S)
+
+
+def _extract_json(prompt: str) -> str:
+    from providers.llm_local import extract_policies_local
+    m = _PROMPT_TEXT.search(prompt or "")
+    out = extract_policies_local(m.group(1) if m else (prompt or ""))
+    out.pop("_model_name", None)
+    out.setdefault("horizon_years", 5)
+    return json.dumps(out, ensure_ascii=False)
+
+
+def _openai(body: Dict[str, Any]) -> Tuple[int, Any]:
+    text = _extract_json(body.get("input") or "")
+    return 200, {"id": "resp_mock", "object": "response", "output_text": text,
+                 "output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}]}
+
+
+def _gemini(body: Dict[str, Any]) -> Tuple[int, Any]:
+    try:
+        prompt = body["contents"][0]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        return 400, {"error": {"code": 400, "message": "invalid contents"}}
+    return 200, {"candidates": [{"content": {"role": "model", "parts": [{"text": _extract_json(prompt)}]},
+                                 "finishReason": "STOP"}]}
+
+
+def _anthropic(body: Dict[str, Any]) -> Tuple[int, Any]:
+    try:
+        prompt = body["messages"][-1]["content"]
+    except (KeyError, IndexError, TypeError):
+        return 400, {"type": "error", "error": {"type": "invalid_request_error", "message": "messages required"}}
+    if isinstance(prompt, list):
+        prompt = "".join(b.get("text", "") for b in prompt if isinstance(b, dict))
+    return 200, {"id": "msg_mock", "type": "message", "role": "assistant",
+                 "content": [{"type": "text", "text": _extract_json(prompt)}], "stop_reason": "end_turn"}
+
+
+def _fx(query: Dict[str, list]) -> Tuple[int, Any]:
+    base = (query.get("base") or ["USD"])[0].upper()
+    b = _FX.get(base)
+    if b is None:
+        return 200, {"success": False, "error": {"info": f"unknown base {base}"}}
+    return 200, {"success": True, "base": base, "date": time.strftime("%Y-%m-%d"),
+                 "rates": {k: round(v / b, 6) for k, v in _FX.items()}}
+
+
+def _route(method: str, path: str) -> Optional[str]:
+    if path.startswith("/v2/country"):
+        return "wb"
+    if method == "POST" and path == "/v1/responses":
+        return "openai"
+    if method == "POST" and path == "/v1/messages":
+        return "anthropic"
+    if method == "POST" and path.startswith("/v1beta/models/") and path.endswith(":generateContent"):
+        return "gemini"
+    if path == "/latest":
+        return "fx"
+    return None
+
+
+# ---- ASGI ----
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        msg = await receive()
+        chunks.append(msg.get("body", b""))
+        if not msg.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send(send, status: int, obj: Any, headers=None, slow_delay: float = 0.0):
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())] + (headers or [])})
+    if slow_delay <= 0:
+        await send({"type": "http.response.body", "body": body})
+        return
+    # slow stream：8分割して間に遅延を挟む
+    step = max(1, len(body) // 8)
+    for i in range(0, len(body), step):
+        await send({"type": "http.response.body", "body": body[i:i + step], "more_body": i + step < len(body)})
+        if i + step < len(body):
+            await asyncio.sleep(slow_delay)
+
+
+def make_app(cfg: MockConfig):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        method, path = scope["method"], scope["path"]
+        if path == "/__stats":
+            await _send(send, 200, {f"{r}:{o}": n for (r, o), n in sorted(cfg.stats.items())})
+            return
+        if path == "/__reset" and method == "POST":
+            cfg.stats.clear()
+            await _send(send, 200, {"ok": True})
+            return
+
+        route = _route(method, path)
+        if route is None:
+            cfg.stats[("unknown", "404")] += 1
+            await _send(send, 404, {"error": "not found"})
+            return
+        raw = await _read_body(receive)
+
+        d = cfg.delay(route)
+        if d:
+            await asyncio.sleep(d)
+
+        x = cfg.rng.random()
+        if x < cfg.rate_limit_rate:
+            cfg.stats[(route, "429")] += 1
+            await _send(send, 429, {"error": {"message": "rate limited (mock)"}}, [(b"retry-after", b"1")])
+            return
+        if x < cfg.rate_limit_rate + cfg.error_rate:
+            cfg.stats[(route, "500")] += 1
+            await _send(send, 500, {"error": {"message": "internal error (mock)"}})
+            return
+
+        try:
+            if route == "wb":
+                status, obj = _wb(path)
+            elif route == "fx":
+                status, obj = _fx(parse_qs(scope.get("query_string", b"").decode()))
+            else:
+                body = json.loads(raw or b"{}")
+                status, obj = {"openai": _openai, "gemini": _gemini, "anthropic": _anthropic}[route](body)
+        except ValueError:
+            status, obj = 400, {"error": "invalid JSON"}
+
+        slow = cfg.stream_chunk_delay if cfg.rng.random() < cfg.slow_stream_rate else 0.0
+        cfg.stats[(route, "slow" if slow else str(status))] += 1
+        await _send(send, status, obj, slow_delay=slow)
+
+    return app
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="上流 API のローカルモック")
+    ap.add_argument("--host", default=os.getenv("MOCK_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("MOCK_PORT", "9100")))
+    ap.add_argument("--latency", default="lognormal:60:0.4", help="データ API（WB/FX）の遅延")
+    ap.add_argument("--llm-latency", default="lognormal:1200:0.5", help="LLM API の遅延")
+    ap.add_argument("--route", action="append", default=[], metavar="NAME=SPEC",
+                    help="ルート別の遅延（wb/fx/openai/gemini/anthropic）")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="500 を返す確率")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0, help="429 を返す確率")
+    ap.add_argument("--slow-stream-rate", type=float, default=0.0, help="ボディを少しずつ送る確率")
+    ap.add_argument("--stream-chunk-delay", type=float, default=0.5, help="slow stream のチャンク間隔（秒）")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    routes = dict(r.split("=", 1) for r in args.route if "=" in r)
+    cfg = MockConfig(args.latency, args.llm_latency, routes, args.error_rate, args.rate_limit_rate,
+                     args.slow_stream_rate, args.stream_chunk_delay, args.seed)
+    print(f"[mock] listening on {args.host}:{args.port}")
+    uvicorn.run(make_app(cfg), host=args.host, port=args.port, log_level="warning", lifespan="off",
+                access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench/run.py
+"""
+ベンチマークの実行とベースライン比較。
+
+  python -m bench.run --save bench_baseline.json              # 計測してベースラインとして保存
+  python -m bench.run --compare bench_baseline.json           # 計測してベースラインと比較（悪化で exit 1）
+  python -m bench.run --micro-only --only merge_outputs
+  python -m bench.run --load-only --concurrency 64 --requests 500 --llm-latency lognormal:1500:0.5
+
+結果は JSON（meta / micro / load）。比較対象:
+  micro: median_us が (1 + tolerance) 倍を超えたら悪化
+  load : p95_ms / p99_ms が (1 + tolerance) 倍を超える、または throughput_rps が (1 - tolerance) 倍を下回ったら悪化
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from bench import loadgen, micro
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], tolerance: float) -> List[Tuple[str, float, float, bool]]:
+    """(指標名, ベースライン, 今回, 悪化か) の一覧。片方にしか無い指標は比較しない"""
+    rows = []
+    for name, r in (cur.get("micro") or {}).items():
+        b = (base.get("micro") or {}).get(name)
+        if b:
+            rows.append((f"micro.{name}.median_us", b["median_us"], r["median_us"],
+                         r["median_us"] > b["median_us"] * (1 + tolerance)))
+    bl, cl = base.get("load") or {}, cur.get("load") or {}
+    if bl and cl:
+        for k in ("p95_ms", "p99_ms"):
+            rows.append((f"load.{k}", bl[k], cl[k], cl[k] > bl[k] * (1 + tolerance)))
+        rows.append(("load.throughput_rps", bl["throughput_rps"], cl["throughput_rps"],
+                     cl["throughput_rps"] < bl["throughput_rps"] * (1 - tolerance)))
+    return rows
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="予測パイプラインのベンチマーク")
+    ap.add_argument("--micro-only", action="store_true")
+    ap.add_argument("--load-only", action="store_true")
+    ap.add_argument("--only", action="append", default=None, help="実行するマイクロベンチ名（複数可）")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.2, help="1回の計測の最小秒数")
+    ap.add_argument("--concurrency", type=int, default=16, help="負荷生成の同時ユーザー数")
+    ap.add_argument("--requests", type=int, default=200, help="負荷生成の総リクエスト数")
+    ap.add_argument("--deadline", type=float, default=55.0, help="1件あたりの締め切り秒")
+    ap.add_argument("--guilds", type=int, default=4, help="ユーザーを分散させるギルド数")
+    ap.add_argument("--llm-latency", default="lognormal:800:0.5")
+    ap.add_argument("--data-latency", default="lognormal:80:0.4")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="スタブ LLM の失敗率")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--neardup", action="store_true",
+                    help="ほぼ同じテキストの再利用を有効のまま測る（既定は無効。結果の meta に記録）")
+    ap.add_argument("--save", metavar="PATH", help="結果を JSON で保存（ベースライン）")
+    ap.add_argument("--compare", metavar="PATH", help="ベースライン JSON と比較")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="悪化とみなす割合")
+    args = ap.parse_args(argv)
+
+    result: Dict[str, Any] = {"meta": {
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "neardup": args.neardup,
+    }}
+    if not args.load_only:
+        result["micro"] = micro.run(args.only, args.repeat, args.min_time, args.seed)
+        for name, line in micro.format_table(result["micro"]):
+            print(f"{name:<30}{line}")
+    if not args.micro_only:
+        result["load"] = loadgen.run(args.concurrency, args.requests, args.deadline, args.guilds,
+                                     args.llm_latency, args.data_latency, args.error_rate, args.seed,
+                                     args.neardup)
+        ld = result["load"]
+        print(f"load: {ld['completed']}/{ld['requests']} in {ld['wall_s']}s  {ld['throughput_rps']} req/s  "
+              f"p50={ld['p50_ms']}ms p95={ld['p95_ms']}ms p99={ld['p99_ms']}ms  {ld['outcomes']}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"saved: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        rows = compare(base, result, args.tolerance)
+        bad = [r for r in rows if r[3]]
+        print(f"--- compare with {args.compare} (git {base.get('meta', {}).get('git')}, tolerance {args.tolerance:.0%})")
+        for name, b, c, regressed in rows:
+            ratio = (c / b) if b else float("inf")
+            print(f"{'REGRESSION' if regressed else 'ok':<11}{name:<45}{b:>12.2f} -> {c:>12.2f}  ({ratio:.2f}x)")
+        return 1 if bad else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,23 @@
+import time
+_T_START = time.perf_counter()   # 起動時間の計測起点
+
+import asyncio
+import hashlib
+import inspect
+import io
 import json
-import os, asyncio, json
+import math
+import os
+from collections import Counter
 import discord
 from discord import app_commands
 from dotenv import load_dotenv
 
-from core.orchestrator import run_pipeline, set_overrides_for_channel, get_overrides_for_channel, get_last_explain_for_channel
+# core.orchestrator（プロバイダ・モデル・状態ストア）は重いので各コマンド内で遅延 import する。
+# 起動直後にバックグラウンドで温めておくので初回コマンドも待たない
+from core.context import request_context
+from core.metrics import Gauge, STAGE_SECONDS
+from core.scheduler import JobRejected, get_scheduler
 
 
 
@@ -12,23 +25,233 @@ load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "0")) 
 
+# 起動予算：プロセス開始から on_ready までの目標秒数（超えたら警告）
+STARTUP_BUDGET_SEC = float(os.getenv("STARTUP_BUDGET_SEC", "10"))
+STARTUP_SECONDS = Gauge("gdpbot_startup_seconds", "Seconds from process start to each startup phase")
+# スラッシュコマンド定義のフィンガープリント（変わったときだけ sync する）
+COMMAND_SYNC_STATE = os.getenv(
+    "COMMAND_SYNC_STATE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "command_sync.json"),
+)
+
+
+def _startup_mark(phase: str) -> float:
+    dt = time.perf_counter() - _T_START
+    STARTUP_SECONDS.set(dt, phase=phase)
+    print(f"[startup] {phase} +{dt:.2f}s")
+    return dt
+
+# シャーディング：SHARD_COUNT>1・SHARD_IDS・DISCORD_SHARDING=auto のいずれかで AutoShardedClient。
+# 複数プロセスに分けるときは各プロセスに SHARD_COUNT（全体数）と SHARD_IDS（担当範囲）、別々の PORT を渡す。
+# 状態ストア・キャッシュは SQLite（STATE_DB_PATH）で共有されるので、どのシャードもどのチャンネルを扱える
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip()]
+
 INTENTS = discord.Intents.default()
-client = discord.Client(intents=INTENTS)
+
+
+def _make_client() -> discord.Client:
+    if SHARD_IDS and SHARD_COUNT <= 0:
+        raise SystemExit("SHARD_IDS requires SHARD_COUNT")
+    if SHARD_IDS or SHARD_COUNT > 1 or os.getenv("DISCORD_SHARDING", "") == "auto":
+        print(f"[shard] auto-sharded client: count={SHARD_COUNT or 'auto'} ids={SHARD_IDS or 'all'}")
+        return discord.AutoShardedClient(intents=INTENTS, shard_ids=SHARD_IDS or None,
+                                         shard_count=SHARD_COUNT or None)
+    return discord.Client(intents=INTENTS)
+
+
+client = _make_client()
 tree = app_commands.CommandTree(client)
 
-@client.event
-async def on_ready():
-   try:
-        if GUILD_ID:
-            guild = discord.Object(id=GUILD_ID)
+
+def _owns_primary() -> bool:
+    """コマンド sync と JSON API はシャード 0 を持つプロセスだけが行う"""
+    return not SHARD_IDS or 0 in SHARD_IDS
+
+
+# シャードごとの接続イベント（切断回数・最後のイベント時刻）
+_shard_events: dict = {}
+
+
+def _shard_event(shard_id, kind: str):
+    ev = _shard_events.setdefault(shard_id or 0, {"last": None, "at": None, "disconnects": 0})
+    ev["last"], ev["at"] = kind, time.time()
+    if kind == "disconnect":
+        ev["disconnects"] += 1
+
+
+def _shard_status() -> list:
+    if isinstance(client, discord.AutoShardedClient):
+        infos = {sid: (not info.is_closed(), info.latency) for sid, info in list(client.shards.items())}
+        expected = SHARD_IDS or sorted(infos) or list(range(client.shard_count or 0))
+    else:
+        sid = client.shard_id or 0
+        infos = {sid: (client.is_ready() and not client.is_closed(), client.latency)}
+        expected = [sid]
+    guilds = Counter(g.shard_id for g in list(client.guilds))
+    out = []
+    for sid in expected:
+        up, lat = infos.get(sid, (False, float("nan")))
+        ev = _shard_events.get(sid) or {}
+        out.append({"id": sid, "connected": bool(up),
+                    "latency_ms": round(lat * 1000, 1) if math.isfinite(lat) else None,
+                    "guilds": guilds.get(sid, 0), "last_event": ev.get("last"), "last_event_at": ev.get("at"),
+                    "disconnects": ev.get("disconnects", 0)})
+    return out
+
+
+def shard_health() -> dict:
+    """keep_alive の /health 用。担当シャードが全部つながっていれば ok"""
+    shards = _shard_status()
+    return {"ok": bool(shards) and all(s["connected"] for s in shards), "pid": os.getpid(),
+            "shard_count": client.shard_count, "shards": shards}
+
+
+def _shard_gauge(field: str) -> dict:
+    vals = {}
+    for s in _shard_status():
+        if field == "up":
+            vals[(("shard", str(s["id"])),)] = 1.0 if s["connected"] else 0.0
+        elif s["latency_ms"] is not None:
+            vals[(("shard", str(s["id"])),)] = s["latency_ms"] / 1000.0
+    return vals
+
+
+SHARD_UP = Gauge("gdpbot_shard_up", "1 if the shard's gateway connection is open", fn=lambda: _shard_gauge("up"))
+SHARD_LATENCY = Gauge("gdpbot_shard_latency_seconds", "Gateway heartbeat latency per shard",
+                      fn=lambda: _shard_gauge("latency"))
+
+_api_task = None
+_ready_once = False
+
+
+def _command_fingerprint(guild) -> str:
+    """sync 対象のコマンド定義（Discord へ送る JSON と同じもの）のハッシュ"""
+    cmds = [c.to_dict(tree) for c in tree.get_commands(guild=guild)]
+    cmds.sort(key=lambda d: (d.get("type", 1), d.get("name", "")))
+    raw = json.dumps(cmds, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _load_sync_state() -> dict:
+    try:
+        with open(COMMAND_SYNC_STATE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_sync_state(state: dict):
+    os.makedirs(os.path.dirname(COMMAND_SYNC_STATE) or ".", exist_ok=True)
+    tmp = COMMAND_SYNC_STATE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, COMMAND_SYNC_STATE)
+
+
+async def sync_commands_if_changed():
+    """コマンド定義が前回 sync 時から変わったときだけ tree.sync() する
+    （グローバル sync は反映に時間がかかり、レート制限も消費するため）。FORCE_COMMAND_SYNC=1 で強制"""
+    guild = discord.Object(id=GUILD_ID) if GUILD_ID else None
+    scope = f"{client.application_id}:{GUILD_ID or 'global'}"
+    fp = _command_fingerprint(guild)
+    state = _load_sync_state()
+    if state.get(scope) == fp and os.getenv("FORCE_COMMAND_SYNC", "") not in ("1", "true"):
+        print(f"[slash] command tree unchanged ({fp[:12]}); skip sync")
+        return
+    try:
+        if guild is not None:
             synced = await tree.sync(guild=guild)
             print(f"[slash] synced to guild {GUILD_ID}: {len(synced)} commands")
         else:
             synced = await tree.sync()  # グローバル同期（時間がかかること有）
             print(f"[slash] synced globally: {len(synced)} commands")
-   except Exception as e:
-         print("[slash] sync error:", e)
+    except Exception as e:
+        print("[slash] sync error:", e)
+        return
+    state[scope] = fp
+    try:
+        _save_sync_state(state)
+    except OSError as e:
+        print("[slash] could not save sync state:", e)
+
+
+def _warm_imports():
+    # 初回コマンドで import 待ちが出ないよう、接続後に別スレッドで読み込んでおく
+    import core.orchestrator  # noqa: F401
+    import core.tiers
+    core.tiers.tables()
+    import core.snapshot
+    core.snapshot.get_store()   # スナップショットを mmap（無ければ何もしない）
+    import core.offload
+    core.offload.warm()         # POOL_WORKERS > 0 ならワーカーを起動して初期化まで済ませる
+
+
+def _log_warm_result(fut):
+    # 先読みは任意なので失敗しても起動は続けるが、初回コマンドが遅くなる理由はログに残す
+    if fut.cancelled():
+        return
+    e = fut.exception()
+    if e is not None:
+        print("[startup] warm failed:", repr(e))
+
+
+@client.event
+async def setup_hook():
+    _startup_mark("login")
+    # API_PORT が設定されていれば JSON API を同じイベントループで起動（キャッシュ・接続プールを共有）
+    global _api_task
+    if not _owns_primary():
+        # コマンド定義はアプリ全体で共通なので、シャード 0 のプロセスだけが sync する
+        print(f"[shard] shards {SHARD_IDS}: skip API server and command sync")
+        return
+    if os.getenv("API_PORT"):
+        from api_server import serve
+        _api_task = asyncio.create_task(serve())
+    # on_ready は再接続のたびに呼ばれるので、sync はプロセスごとに1回ここで行う
+    await sync_commands_if_changed()
+    _startup_mark("command_sync")
+
+@client.event
+async def on_ready():
+    global _ready_once
+    if _ready_once:
+        return
+    _ready_once = True
+    dt = _startup_mark("ready")
+    if dt > STARTUP_BUDGET_SEC:
+        print(f"[startup] ⚠️ ready took {dt:.2f}s (budget {STARTUP_BUDGET_SEC:.0f}s)")
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(None, _warm_imports)
+    fut.add_done_callback(_log_warm_result)
         
+@client.event
+async def on_shard_connect(shard_id):
+    _shard_event(shard_id, "connect")
+
+@client.event
+async def on_shard_ready(shard_id):
+    _shard_event(shard_id, "ready")
+
+@client.event
+async def on_shard_resumed(shard_id):
+    _shard_event(shard_id, "resumed")
+
+@client.event
+async def on_shard_disconnect(shard_id):
+    _shard_event(shard_id, "disconnect")
+    print(f"[shard] shard {shard_id} disconnected")
+
+@client.event
+async def on_disconnect():
+    if not isinstance(client, discord.AutoShardedClient):
+        _shard_event(client.shard_id, "disconnect")
+
+@client.event
+async def on_resumed():
+    if not isinstance(client, discord.AutoShardedClient):
+        _shard_event(client.shard_id, "resumed")
+
 @tree.command(name="ping", description="動作確認")
 async def ping(interaction: discord.Interaction):
     await interaction.response.send_message("Pong! 🏓 Bot is alive.")
@@ -36,6 +259,7 @@ async def ping(interaction: discord.Interaction):
 @tree.command(name="assume", description="国プロファイルの前提を上書き (例: investment_rate:0.30 inflation_recent:6)")
 @app_commands.describe(kv_pairs="スペース区切りで key:value を複数指定可")
 async def assume(interaction: discord.Interaction, kv_pairs: str):
+    from core.orchestrator import get_overrides_for_channel, set_overrides_for_channel
     ch = interaction.channel_id
     overrides = get_overrides_for_channel(ch)
     for kv in kv_pairs.split():
@@ -49,36 +273,70 @@ async def assume(interaction: discord.Interaction, kv_pairs: str):
     set_overrides_for_channel(ch, overrides)
     await interaction.response.send_message(f"✅ 上書き設定を保存しました: `{json.dumps(overrides, ensure_ascii=False)}`")
 
-from discord import app_commands
-import  traceback
-import asyncio, inspect
-# ★ 可能ならファイル先頭でimportしておく（関数内importで失敗しても返信は済ませられる）
-from core.orchestrator import set_last_explain_for_channel
+# /forecast の締め切り（秒）。60 秒の上限から Discord への応答編集分を残す
+FORECAST_DEADLINE = float(os.getenv("FORECAST_DEADLINE_SEC", "55"))
 
 @tree.command(name="assume_clear", description="このチャンネルのオーバーライドを全消去")
 async def assume_clear(interaction: discord.Interaction):
     await interaction.response.defer(thinking=True)
+    from core.orchestrator import set_overrides_for_channel
     set_overrides_for_channel(interaction.channel_id, {})
     await interaction.followup.send("Overrides cleared for this channel.")
 
 
+def _is_profile_admin(interaction: discord.Interaction) -> bool:
+    # サーバー管理者、または PROFILE_ADMIN_IDS（カンマ区切りのユーザーID）に含まれるユーザー
+    ids = {x.strip() for x in os.getenv("PROFILE_ADMIN_IDS", "").split(",") if x.strip()}
+    if str(interaction.user.id) in ids:
+        return True
+    perms = getattr(interaction, "permissions", None)
+    return bool(perms and perms.administrator)
+
+
 @tree.command(name="forecast", description="政策テキストからGDP成長率を推定")
-async def forecast_cmd(interaction: discord.Interaction, text: str, horizon: int = 5, country: str | None = None):
+@app_commands.rename(profile_run="profile")
+@app_commands.describe(profile_run="（管理者のみ）この1回をプロファイルして結果を添付")
+async def forecast_cmd(interaction: discord.Interaction, text: str, horizon: int = 5, country: str | None = None,
+                       profile_run: bool = False):
     await interaction.response.defer(thinking=True)
     try:
+        from core.orchestrator import run_pipeline, get_overrides_for_channel
         overrides = get_overrides_for_channel(interaction.channel_id)
 
+        # プロファイルは明示的に要求されたときだけ（core.profiling も import しない）
+        attach_profile = profile_run and _is_profile_admin(interaction)
+        prof = None
+        if attach_profile or (not profile_run and os.getenv("FORECAST_PROFILE")):
+            from core.profiling import ProfileSession, env_enabled
+            if attach_profile or env_enabled():
+                prof = ProfileSession()
+
         # ★ run_pipeline が async か sync かを判定して実行
-        if asyncio.iscoroutinefunction(run_pipeline):
-            result = await asyncio.wait_for(
-                run_pipeline(country=country, horizon=horizon, text=text, overrides=overrides),
-                timeout=60
-            )
-        else:
-            result = await asyncio.wait_for(
-                asyncio.to_thread(run_pipeline,country=country, horizon=horizon, text=text, overrides=overrides),
-                timeout=60
-            )
+        def _job():
+            if asyncio.iscoroutinefunction(run_pipeline):
+                aw = run_pipeline(country=country, horizon=horizon, text=text, overrides=overrides)
+            else:
+                aw = asyncio.to_thread(run_pipeline,country=country, horizon=horizon, text=text, overrides=overrides)
+            # 待ち行列の時間は含めず、パイプライン本体だけを測る
+            return prof.run(aw) if prof is not None else aw
+
+        # 待ち行列に入ったら順番と推定待ち時間を defer 応答に表示
+        async def _on_position(pos: int, est: float):
+            await interaction.edit_original_response(content=f"⏳ 順番待ち: {pos+1}番目（推定 {est:.0f} 秒）")
+
+        # ギルド/ユーザー単位の公平キュー経由で実行（全体の同時実行数に上限）
+        # 締め切りは待ち時間込みで FORECAST_DEADLINE 秒。残りが少なければ劣化した結果で返す
+        try:
+            with request_context(FORECAST_DEADLINE):
+                result = await asyncio.wait_for(
+                    get_scheduler().submit(_job, guild=interaction.guild_id or 0, user=interaction.user.id,
+                                           on_position=_on_position),
+                    timeout=60
+                )
+        except JobRejected as e:
+            await interaction.edit_original_response(
+                content=f"🚦 混雑しています（{e.reason}、推定待ち {e.estimated_wait:.0f} 秒）。少し時間をおいて再実行してください。")
+            return
 
         # ここからは必ず dict として扱えるようにガード
         if inspect.isawaitable(result):
@@ -93,8 +351,8 @@ async def forecast_cmd(interaction: discord.Interaction, text: str, horizon: int
         policies  = (result.get("policies_struct") or {}).get("policies", [])
         explain   = result.get("explain", "")
 
-        tp  = profile.get("tier_params") or {}
-        pot = tp.get("potential_g", 4.0)
+        tp  = profile.get("tier_params")
+        pot = getattr(tp, "potential_g", 4.0)
 
         def _fmt(x): return "?" if x is None else x
         infl  = profile.get("inflation_recent")
@@ -123,51 +381,52 @@ async def forecast_cmd(interaction: discord.Interaction, text: str, horizon: int
             lines.append(f"・{p.get('title','(no title)')}｜{lever}｜lag={p.get('lag_years')} {scale_txt}")
         if len(policies) > 8:
             lines.append(f"...and {len(policies)-8} more")
+        if result.get("degraded"):
+            lines.append("")
+            lines.append("⚠️ 時間内に揃わなかったデータがあるため簡易推定です（" + ", ".join(result["degraded"]) + "）")
+
+        files = []
+        if prof is not None:
+            s = prof.summary()
+            lines.append("")
+            lines.append(f"🔬 profile: {s['wall_s']}s / {s['samples']} samples / loop lag max {s['loop_lag']['max_ms']}ms")
+            name = f"profile-{result.get('id') or 'run'}"
+            if attach_profile:
+                files = [discord.File(io.BytesIO(prof.collapsed().encode("utf-8")), filename=f"{name}.folded"),
+                         discord.File(io.BytesIO(prof.summary_text().encode("utf-8")), filename=f"{name}.txt")]
+            else:
+                print("[profile] saved:", prof.save(name))
+        elif profile_run:
+            lines.append("")
+            lines.append("（profile は管理者のみ利用できます）")
 
         content = "\n".join(lines)
-        await interaction.edit_original_response(content=content)
-
-        # explain保存（失敗してもユーザ応答済み）
-        from core.orchestrator import set_last_explain_for_channel
-        set_last_explain_for_channel(interaction.channel_id, explain)
+        with STAGE_SECONDS.time(stage="discord_edit"):
+            if files:
+                await interaction.edit_original_response(content=content, attachments=files)
+            else:
+                await interaction.edit_original_response(content=content)
+
+        # explain保存（ユーザ応答済みなので、失敗してもログだけ残して応答は上書きしない）
+        try:
+            from core.orchestrator import set_last_explain_for_channel, save_run
+            set_last_explain_for_channel(interaction.channel_id, explain)
+            save_run(explain)
+        except Exception as e:
+            print("[explain] save failed:", repr(e))
 
     except Exception as e:
         await interaction.edit_original_response(content=f"❌ エラー: {type(e).__name__}: {e}")
-    lines.append("```\n" + json.dumps(result["policies_struct"], ensure_ascii=False, indent=2) + "\n```")
-
-   # .../forecast ハンドラ内、表示の最後に追記
-    pol = result.get("policies_struct") or {}
-    if isinstance(pol, list):
-     pol = {"policies": pol}
-    items = pol.get("policies") or []
-    items = pol.get("policies") or []
-    if not items:
-       lines.append("（政策が抽出できませんでした）")
-    else:
-       for p in items[:8]:
-           lever="/".join(p.get("lever",[]))
-           lag=p.get("lag_years")
-           sc = p.get("scale") or {}
-           val,unit = sc.get("value"), sc.get("unit","")
-           scale_txt = f"{val} {unit}" if val is not None else "(n/a)"
-           lines.append(f"・{p.get('title','(no title)')}｜{lever}｜lag={lag}｜{scale_txt}")
-
-# モデルの内訳（pol が 0.00 かどうか必ず見える）
-    lines.append("")
-    lines.append("```\n" + (result.get("explain") or "") + "\n```")
-
-# 必要なら JSON 丸ごと（デバッグ用）
-# lines.append("```\n" + json.dumps(pol, ensure_ascii=False, indent=2) + "\n```")
-
 
 @tree.command(name="policies", description="直近の政策テキストを抽出して構造化結果を表示")
 @app_commands.describe(text="政策テキスト（箇条書きOK）")
 async def policies_cmd(interaction: discord.Interaction, text: str):
     await interaction.response.defer(thinking=True)
     try:
+        from core.orchestrator import extract_policies
         data = await extract_policies(text)
         # 見やすく整形（上位8件だけ）
-        items = (data or {}).get("policies", [])
+        items = [p.to_dict() for p in (data or {}).get("policies", [])]
         head = items[:8]
         lines = [f"抽出ポリシー数: {len(items)}"]
         for i, p in enumerate(head, 1):
@@ -187,19 +446,37 @@ async def policies_cmd(interaction: discord.Interaction, text: str):
 
 
 @tree.command(name="explain", description="直近の推計の根拠・係数を表示")
-async def explain(interaction: discord.Interaction):
+@app_commands.describe(n="何件前の実行か（1=直近）")
+async def explain(interaction: discord.Interaction, n: int = 1):
+    from core.orchestrator import get_last_explain_for_channel, get_explain_history_for_channel
     ch = interaction.channel_id
-    exp = get_last_explain_for_channel(ch)
+    if n <= 1:
+        exp = get_last_explain_for_channel(ch)
+    else:
+        hist = get_explain_history_for_channel(ch)
+        exp = hist[n-1] if n <= len(hist) else None
     if not exp:
         await interaction.response.send_message("（まだ説明がありません。/forecast を実行してください）")
         return
-    await interaction.response.send_message(exp[:1900])  # Discord文字数制限回避（簡易）
+    # 整形はここで初めて行う（2000文字制限を超える分はページ分割して followup で送る）
+    from core.explain import render_pages
+    pages = render_pages(exp, limit=1900)
+    total = len(pages)
+    for i, page in enumerate(pages, 1):
+        body = page if total == 1 else f"({i}/{total})\n{page}"
+        if i == 1:
+            await interaction.response.send_message(body)
+        else:
+            await interaction.followup.send(body)
+
+_startup_mark("imports")
 
 if __name__ == "__main__":
-    from keep_alive import keep_alive
-    import os, time, socket
+    from keep_alive import keep_alive, register_health
+    import socket
 
-    keep_alive()  # 先にFlaskでPORTをlisten
+    register_health(shard_health)
+    keep_alive()  # 先にFlaskでPORTをlisten（/health でシャードごとの状態）
     port = int(os.getenv("PORT", "8080"))
     print(f"[keep_alive] trying to open port {port}")
     for _ in range(20):  # 最大10秒待ち
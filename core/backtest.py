@@ -0,0 +1,171 @@
+# core/backtest.py
+"""
+成長モデル（make_growth_paths の政策なしパス）の過去データによるバックテスト。
+
+- データ: providers.data_worldbank の過去パネル（WB_PANEL_STORE。ingest_data.py wb-panel で作る）
+- 基準年 y0 ごと・国ごとに「y0-1 年までに出ていた値」でプロファイルを作る
+    1人あたり GDP → ティア（ライブと同じ pick_tier_by_gdp_pc。閾値は今の名目 USD のまま）
+    投資率・開放度・インフレ率 → マクロ調整（STALE_YEARS 年より古い値は欠損扱い）
+  値は取り込み時点の改定済みの系列なので、当時の速報値ではない（疑似リアルタイム）
+- 予測: baseline_paths_batch で全 (国, 基準年) をティアごと・年ごとの列演算でまとめて計算する
+  （numpy は使わない。行ごとの関数呼び出しはマクロ調整の1回だけ）。t 年目（h = t+1）の予測を
+  実績の実質 GDP 成長率（NY.GDP.MKTP.KD.ZG）の y0+t 年と比べる
+- 指標（ティア × h ごと、"all" は全ティア）:
+    n / mae / rmse / bias（予測 − 実績の平均）/ coverage（実績が LOW–HIGH の帯に入った割合）
+    naive_mae（前年の成長率がそのまま続くとした場合の MAE）/ skill（1 − mae / naive_mae）
+- compare() で前回の結果と MAE を比べる（CI 的な劣化チェック）
+"""
+import math
+import time
+from array import array
+from typing import Any, Dict, List, Mapping, Sequence
+
+from .colstore import ColStore
+from .model import _band, baseline_paths_batch
+from .tiers import TierParams
+
+STALE_YEARS = 3   # as-of の値として使う最大の古さ（年）
+_NAN = math.nan
+
+
+def _asof(series, lag: int) -> array:
+    """i 番目 = 添字 i-lag 以前の最新の非欠損値（STALE_YEARS より古ければ NaN）"""
+    n = len(series)
+    out = array("d", [_NAN]) * n
+    last_i, last_v = -10**9, _NAN
+    for i in range(n):
+        j = i - lag
+        if j >= 0:
+            v = series[j]
+            if v == v:
+                last_i, last_v = j, v
+        if j - last_i < STALE_YEARS:
+            out[i] = last_v
+    return out
+
+
+def build_rows(panel: ColStore, origins: Sequence[int], horizon: int) -> Dict[str, Any]:
+    """(国, 基準年) ごとの as-of の入力と実績を列で返す。1人あたり GDP が無い行と、
+    h 年以内の実績が1つも無い行は除く"""
+    from .orchestrator import pick_tier_by_gdp_pc
+    y0, ny = panel.year0, len(panel.years)
+    cols: Dict[str, Any] = {"iso3": [], "year": array("i"), "tier": [], "invest": array("d"),
+                            "openness": array("d"), "inflation": array("d"), "naive": array("d"),
+                            "actual": [array("d") for _ in range(horizon)]}
+    idx = [y - y0 for y in origins if 0 <= y - y0 < ny]
+    nan_row = array("d", [_NAN]) * ny
+    for iso3 in panel.keys:
+        growth = panel.series(iso3, "growth")
+        if growth is None:
+            continue
+        asof = {f: _asof(panel.series(iso3, f) or nan_row, 1)
+                for f in ("gdp_pc", "invest", "openness", "inflation", "growth")}
+        for i in idx:
+            gdp_pc = asof["gdp_pc"][i]
+            if gdp_pc != gdp_pc:
+                continue
+            acts = [growth[i + t] if i + t < ny else _NAN for t in range(horizon)]
+            if all(a != a for a in acts):
+                continue
+            cols["iso3"].append(iso3)
+            cols["year"].append(y0 + i)
+            cols["tier"].append(pick_tier_by_gdp_pc(gdp_pc))
+            cols["invest"].append(asof["invest"][i] / 100.0)
+            cols["openness"].append(asof["openness"][i] / 100.0)
+            cols["inflation"].append(asof["inflation"][i])
+            cols["naive"].append(asof["growth"][i])
+            for t in range(horizon):
+                cols["actual"][t].append(acts[t])
+    return cols
+
+
+class _Acc:
+    __slots__ = ("n", "abs", "sq", "err", "cover", "naive_n", "naive_abs")
+
+    def __init__(self):
+        self.n = self.cover = self.naive_n = 0
+        self.abs = self.sq = self.err = self.naive_abs = 0.0
+
+    def result(self) -> Dict[str, Any]:
+        if not self.n:
+            return {"n": 0}
+        mae = self.abs / self.n
+        naive = self.naive_abs / self.naive_n if self.naive_n else None
+        return {"n": self.n, "mae": round(mae, 4), "rmse": round(math.sqrt(self.sq / self.n), 4),
+                "bias": round(self.err / self.n, 4), "coverage": round(self.cover / self.n, 4),
+                "naive_mae": round(naive, 4) if naive is not None else None,
+                "skill": round(1.0 - mae / naive, 4) if naive else None}
+
+
+def run(panel: ColStore, tables: Mapping[str, TierParams], start: int, end: int,
+        horizon: int = 5) -> Dict[str, Any]:
+    """基準年 start..end のバックテスト。戻り値の "metrics" は {ティア: {"h1": {...}, ...}}"""
+    horizon = max(1, min(10, int(horizon)))
+    t0 = time.perf_counter()
+    rows = build_rows(panel, range(start, end + 1), horizon)
+    n = len(rows["iso3"])
+    default = tables.get("middle_income") or next(iter(tables.values()))
+    tps = [tables.get(t) or default for t in rows["tier"]]
+    paths = baseline_paths_batch(tps, rows["invest"], rows["openness"], rows["inflation"], horizon)
+    t_model = time.perf_counter() - t0
+
+    accs: Dict[str, List[_Acc]] = {}
+    bands = {t: _band(t) for t in set(rows["tier"])}
+    for i in range(n):
+        tier = rows["tier"][i]
+        band = bands[tier]
+        naive = rows["naive"][i]
+        for key in (tier, "all"):
+            lst = accs.get(key)
+            if lst is None:
+                lst = accs[key] = [_Acc() for _ in range(horizon)]
+            for t in range(horizon):
+                act = rows["actual"][t][i]
+                if act != act:
+                    continue
+                a = lst[t]
+                e = paths[t][i] - act
+                a.n += 1
+                a.abs += abs(e)
+                a.sq += e * e
+                a.err += e
+                a.cover += abs(e) <= band
+                if naive == naive:
+                    a.naive_n += 1
+                    a.naive_abs += abs(naive - act)
+    metrics = {k: {f"h{t + 1}": a.result() for t, a in enumerate(lst)} for k, lst in sorted(accs.items())}
+    return {"origins": [start, end], "horizon": horizon, "rows": n,
+            "countries": len(set(rows["iso3"])), "metrics": metrics,
+            "panel": {k: panel.meta.get(k) for k in ("source", "files", "ingested")},
+            "seconds": {"model": round(t_model, 3), "total": round(time.perf_counter() - t0, 3)}}
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any], tolerance: float = 0.05,
+            min_n: int = 30) -> List[Dict[str, Any]]:
+    """前回の結果より MAE が tolerance（pp）を超えて悪化したセルの一覧（n が min_n 未満のセルは見ない）"""
+    worse = []
+    for tier, cells in (new.get("metrics") or {}).items():
+        for h, m in cells.items():
+            prev = ((old.get("metrics") or {}).get(tier) or {}).get(h) or {}
+            if m.get("n", 0) < min_n or prev.get("n", 0) < min_n:
+                continue
+            if m["mae"] > prev["mae"] + tolerance:
+                worse.append({"tier": tier, "h": h, "mae": m["mae"], "prev_mae": prev["mae"],
+                              "delta": round(m["mae"] - prev["mae"], 4)})
+    return worse
+
+
+def format_table(res: Dict[str, Any]) -> str:
+    """ティア × h の表（標準出力用）"""
+    lines = [f"origins {res['origins'][0]}-{res['origins'][1]}  rows={res['rows']}  "
+             f"countries={res['countries']}  model={res['seconds']['model']}s",
+             f"{'tier':<15}{'h':>4}{'n':>7}{'mae':>8}{'rmse':>8}{'bias':>8}{'cover':>7}{'naive':>8}{'skill':>8}"]
+    for tier, cells in res["metrics"].items():
+        for h, m in cells.items():
+            if not m.get("n"):
+                continue
+            naive = "-" if m["naive_mae"] is None else f"{m['naive_mae']:.2f}"
+            skill = "-" if m["skill"] is None else f"{m['skill']:.2f}"
+            lines.append(f"{tier:<15}{h[1:]:>4}{m['n']:>7}{m['mae']:>8.2f}{m['rmse']:>8.2f}{m['bias']:>8.2f}"
+                         f"{m['coverage']:>7.2f}{naive:>8}{skill:>8}")
+    return "\n".join(lines)
@@ -1,22 +1,80 @@
-
+import json
+import os
+import sqlite3
+import threading
 import time
+from .metrics import cache_lookup
 _cache = {}
 
 def cache_key(*parts):
     return ":".join([str(p) for p in parts])
 
-def get_cache():
-    return MemoryCache()
+def get_cache(name: str = "default"):
+    # シャードを別プロセスで動かすときは SQLite（状態ストアと同じファイル）で共有する
+    from .state import shared_from_env
+    if shared_from_env():
+        return SharedCache(name)
+    return MemoryCache(name)
 
 class MemoryCache:
+    def __init__(self, name: str = "default"):
+        self.name = name  # メトリクスのラベル
     def get(self, key):
         now = time.time()
         ent = _cache.get(key)
-        if not ent: return None
+        if not ent:
+            cache_lookup(self.name, False); return None
         value, exp = ent
         if exp is not None and exp < now:
-            _cache.pop(key, None); return None
+            _cache.pop(key, None); cache_lookup(self.name, False); return None
+        cache_lookup(self.name, True)
         return value
     def set(self, key, value, ttl=3600):
         exp = time.time() + ttl if ttl else None
         _cache[key] = (value, exp)
+
+
+# ---- プロセス間共有（値は JSON にできるものだけ） ----
+_db = None
+_db_lock = threading.Lock()
+
+def _shared_db():
+    global _db
+    if _db is None:
+        from .state import DEFAULT_DB_PATH
+        path = os.getenv("STATE_DB_PATH", DEFAULT_DB_PATH)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS shared_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+        _db = db
+    return _db
+
+class SharedCache(MemoryCache):
+    """プロセス内のメモリを前段に、SQLite の shared_cache 表を後段に持つ（他シャードが取得した値も使える）"""
+    def get(self, key):
+        now = time.time()
+        ent = _cache.get(key)
+        if ent and (ent[1] is None or ent[1] >= now):
+            cache_lookup(self.name, True)
+            return ent[0]
+        with _db_lock:
+            row = _shared_db().execute("SELECT value, expires FROM shared_cache WHERE key=?", (key,)).fetchone()
+        if not row or (row[1] is not None and row[1] < now):
+            _cache.pop(key, None); cache_lookup(self.name, False); return None
+        value = json.loads(row[0])
+        _cache[key] = (value, row[1])
+        cache_lookup(self.name, True)
+        return value
+    def set(self, key, value, ttl=3600):
+        super().set(key, value, ttl)
+        exp = _cache[key][1]
+        try:
+            raw = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return   # JSON にできない値はこのプロセスだけに置く
+        with _db_lock:
+            db = _shared_db()
+            db.execute("INSERT OR REPLACE INTO shared_cache(key, value, expires) VALUES (?,?,?)", (key, raw, exp))
+            db.execute("DELETE FROM shared_cache WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
@@ -0,0 +1,285 @@
+# core/cassette.py
+"""
+プロバイダ I/O の記録・再生（オフラインでの再現可能なベンチマーク/回帰確認用）。
+
+- record: 実際の通信を行い、リクエストとレスポンスをカセット（JSONL）へ追記する
+- replay: ネットワークに出ず、カセットから同じリクエストへの応答を返す
+  （同じキーが複数回記録されていれば記録順に返し、尽きたら最後の応答を使い回す）
+
+httpx のトランスポートとして差し込むので、プロバイダ側のコードは変更不要。
+core/http.py が HTTP_CASSETTE_MODE / HTTP_CASSETTE を見て有効化する。
+
+照合キーは「メソッド + URL（API キー等のクエリは伏せ字）+ リクエストボディの SHA-256」。
+リクエストヘッダ（Authorization / x-api-key）は記録しない。
+
+再生時の遅延（HTTP_CASSETTE_LATENCY）:
+  none                    遅延なし（既定）
+  recorded                記録時の所要時間
+  <ms>                    固定ミリ秒
+  lognormal:<中央値ms>:<sigma>   合成遅延（HTTP_CASSETTE_SEED で乱数固定）
+HTTP_CASSETTE_LATENCY_SCALE で倍率をかけられる。
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+# URL から伏せるクエリパラメータ（Gemini は key= で API キーを渡す）
+_SECRET_PARAMS = {"key", "api_key", "apikey", "access_key", "token"}
+# 記録するレスポンスヘッダ
+_KEEP_HEADERS = ("content-type", "retry-after")
+# 記録中に呼び出し側へ返すレスポンスから外すヘッダ（本体は展開済みなので、元の圧縮・長さの情報は合わない）
+_DECODED_DROP = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CassetteMiss(httpx.TransportError):
+    """replay 中にカセットに無いリクエストが来た（ネットワーク障害と同じ扱いでフォールバックさせる）"""
+
+
+def _redact_url(url: httpx.URL) -> str:
+    parts = urlsplit(str(url))
+    q = [(k, "***" if k.lower() in _SECRET_PARAMS else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(q)), ""))
+
+
+def request_key(request: httpx.Request) -> str:
+    body = request.content or b""
+    return f"{request.method} {_redact_url(request.url)} {hashlib.sha256(body).hexdigest()[:16]}"
+
+
+class LatencyModel:
+    def __init__(self, spec: str = "none", scale: float = 1.0, seed: Optional[int] = None):
+        self.spec = (spec or "none").strip().lower()
+        self.scale = float(scale)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._kind, self._args = self._parse(self.spec)
+
+    @staticmethod
+    def _parse(spec: str) -> Tuple[str, Tuple[float, ...]]:
+        if spec in ("", "none", "0"):
+            return "none", ()
+        if spec == "recorded":
+            return "recorded", ()
+        if spec.startswith("lognormal:"):
+            _, med, sigma = spec.split(":")
+            return "lognormal", (float(med) / 1000.0, float(sigma))
+        return "fixed", (float(spec) / 1000.0,)
+
+    def delay(self, recorded: float) -> float:
+        if self._kind == "none":
+            return 0.0
+        if self._kind == "recorded":
+            d = recorded
+        elif self._kind == "fixed":
+            d = self._args[0]
+        else:
+            med, sigma = self._args
+            with self._lock:
+                d = med * math.exp(self._rng.gauss(0.0, sigma))
+        return max(0.0, d * self.scale)
+
+
+class Cassette:
+    """JSONL 形式のカセット。1行 = 1往復"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+
+    # ---- 再生 ----
+    def load(self) -> "Cassette":
+        self._entries.clear()
+        self._cursor.clear()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        ent = json.loads(line)
+                    except ValueError:
+                        continue   # 記録中断で切れた最終行
+                    self._entries.setdefault(ent["key"], []).append(ent)
+        except FileNotFoundError:
+            pass
+        return self
+
+    def __len__(self):
+        return sum(len(v) for v in self._entries.values())
+
+    def next(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            ents = self._entries.get(key)
+            if not ents:
+                return None
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+            return ents[min(i, len(ents) - 1)]
+
+    # ---- 記録 ----
+    def append(self, request: httpx.Request, response: httpx.Response, content: bytes, elapsed: float):
+        ent = {
+            "key": request_key(request),
+            "method": request.method,
+            "url": _redact_url(request.url),
+            "status": response.status_code,
+            "headers": {k: response.headers[k] for k in _KEEP_HEADERS if k in response.headers},
+            "body_b64": base64.b64encode(content).decode("ascii"),
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(ent, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._entries.setdefault(ent["key"], []).append(ent)
+
+
+def _to_response(ent: Dict[str, Any], request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        ent["status"],
+        headers=ent.get("headers") or {},
+        content=base64.b64decode(ent.get("body_b64") or b""),
+        request=request,
+    )
+
+
+def _lookup(cassette: Cassette, request: httpx.Request) -> Dict[str, Any]:
+    request.read()
+    ent = cassette.next(request_key(request))
+    if ent is None:
+        raise CassetteMiss(f"no recorded response for {request.method} {_redact_url(request.url)}", request=request)
+    return ent
+
+
+def _decoded_headers(resp: httpx.Response) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in resp.headers.multi_items() if k.lower() not in _DECODED_DROP]
+
+
+# ---- トランスポート ----
+class ReplayTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, latency: Optional[LatencyModel] = None):
+        self.cassette = cassette
+        self.latency = latency or LatencyModel()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        ent = _lookup(self.cassette, request)
+        d = self.latency.delay(ent.get("elapsed", 0.0))
+        if d:
+            time.sleep(d)
+        return _to_response(ent, request)
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, latency: Optional[LatencyModel] = None):
+        self.cassette = cassette
+        self.latency = latency or LatencyModel()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        ent = _lookup(self.cassette, request)
+        d = self.latency.delay(ent.get("elapsed", 0.0))
+        if d:
+            await asyncio.sleep(d)
+        return _to_response(ent, request)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.BaseTransport] = None, **inner_kw):
+        self.cassette = cassette
+        self.inner = inner or httpx.HTTPTransport(**inner_kw)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        request.read()
+        resp = self.inner.handle_request(request)
+        try:
+            content = resp.read()
+        finally:
+            resp.close()
+        self.cassette.append(request, resp, content, time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=_decoded_headers(resp), content=content, request=request,
+                              extensions=resp.extensions)
+
+    def close(self):
+        self.inner.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.AsyncBaseTransport] = None, **inner_kw):
+        self.cassette = cassette
+        self.inner = inner or httpx.AsyncHTTPTransport(**inner_kw)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        await request.aread()
+        resp = await self.inner.handle_async_request(request)
+        try:
+            content = await resp.aread()
+        finally:
+            await resp.aclose()
+        self.cassette.append(request, resp, content, time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=_decoded_headers(resp), content=content, request=request,
+                              extensions=resp.extensions)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+# ---- 環境変数からの構成（core/http.py から使う） ----
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "data", "cassettes", "providers.jsonl")
+
+_shared: Dict[str, Cassette] = {}
+_shared_lock = threading.Lock()
+
+
+def _cassette(path: str) -> Cassette:
+    # sync/async クライアントで同じカセット（再生位置・記録）を共有する
+    with _shared_lock:
+        c = _shared.get(path)
+        if c is None:
+            c = _shared[path] = Cassette(path).load()
+        return c
+
+
+def mode_from_env() -> str:
+    return (os.getenv("HTTP_CASSETTE_MODE") or "off").strip().lower()
+
+
+def latency_from_env() -> LatencyModel:
+    seed = os.getenv("HTTP_CASSETTE_SEED")
+    return LatencyModel(os.getenv("HTTP_CASSETTE_LATENCY", "none"),
+                        float(os.getenv("HTTP_CASSETTE_LATENCY_SCALE", "1.0")),
+                        int(seed) if seed else None)
+
+
+def transport_from_env(is_async: bool, **inner_kw):
+    """HTTP_CASSETTE_MODE=record|replay のときのトランスポート（off なら None）"""
+    mode = mode_from_env()
+    if mode not in ("record", "replay"):
+        return None
+    cas = _cassette(os.getenv("HTTP_CASSETTE") or DEFAULT_CASSETTE)
+    if mode == "replay":
+        lat = latency_from_env()
+        return AsyncReplayTransport(cas, lat) if is_async else ReplayTransport(cas, lat)
+    return AsyncRecordingTransport(cas, **inner_kw) if is_async else RecordingTransport(cas, **inner_kw)
+
+
+def reset():
+    """読み込み済みカセットを捨てる（モード・パスを切り替えたあとに）"""
+    with _shared_lock:
+        _shared.clear()
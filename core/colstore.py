@@ -0,0 +1,182 @@
+# core/colstore.py
+"""
+読み取り専用の列指向データセット（mmap）。軸は (キー, 項目, 年) の3つ。
+
+ファイル形式（リトルエンディアン）:
+  b"GDPCOLS1" | uint32 ヘッダ長 | ヘッダ JSON | 8バイト境界までのパディング | float64 本体
+  ヘッダ: {"version": 1, "keys": [...], "fields": [...], "years": [開始, 終了], "meta": {...}}
+  本体は keys × fields × years の密な配列（キー優先）。欠損は NaN。
+  1つの (キー, 項目) の年次系列は連続した領域になるので、series() はコピー無しの memoryview を返す。
+
+書き出しは ColStoreBuilder（年の範囲を先に決め、値を流し込んでから write）。
+一時ファイルに書いてから置き換えるので、読んでいるプロセスの mmap は壊れない。
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"GDPCOLS1"
+VERSION = 1
+_NAN = math.nan
+
+
+class ColStoreError(Exception):
+    pass
+
+
+class ColStore:
+    def __init__(self, path: str):
+        self.path = path
+        if sys.byteorder != "little":
+            raise ColStoreError("column store requires a little-endian host")
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mm[:8] != MAGIC:
+                raise ColStoreError(f"not a column store: {path}")
+            (hlen,) = struct.unpack_from("<I", self._mm, 8)
+            head = json.loads(self._mm[12:12 + hlen].decode("utf-8"))
+            if head.get("version") != VERSION:
+                raise ColStoreError(f"unsupported version {head.get('version')}: {path}")
+        except Exception:
+            self._mm.close()
+            raise
+        off = _align(12 + hlen)
+        self.keys: List[str] = head["keys"]
+        self.fields: List[str] = head["fields"]
+        self.year0, self.year1 = head["years"]
+        self.meta: Dict[str, Any] = head.get("meta") or {}
+        self.mtime = os.stat(path).st_mtime
+        self._ki = {k: i for i, k in enumerate(self.keys)}
+        self._fi = {f: i for i, f in enumerate(self.fields)}
+        self._ny = self.year1 - self.year0 + 1
+        n = len(self.keys) * len(self.fields) * self._ny
+        if len(self._mm) < off + 8 * n:
+            self._mm.close()
+            raise ColStoreError(f"truncated column store: {path}")
+        self._data = memoryview(self._mm)[off:off + 8 * n].cast("d")
+
+    @property
+    def years(self) -> range:
+        return range(self.year0, self.year1 + 1)
+
+    def has(self, key: str) -> bool:
+        return key in self._ki
+
+    def _base(self, key: str, field: str) -> Optional[int]:
+        ki, fi = self._ki.get(key), self._fi.get(field)
+        if ki is None or fi is None:
+            return None
+        return (ki * len(self.fields) + fi) * self._ny
+
+    def get(self, key: str, field: str, year: int) -> Optional[float]:
+        b = self._base(key, field)
+        if b is None or not (self.year0 <= year <= self.year1):
+            return None
+        v = self._data[b + year - self.year0]
+        return None if v != v else v
+
+    def series(self, key: str, field: str) -> Optional[memoryview]:
+        """年次系列（year0..year1、欠損は NaN）。コピーしない"""
+        b = self._base(key, field)
+        return None if b is None else self._data[b:b + self._ny]
+
+    def latest(self, key: str, field: str, upto: Optional[int] = None) -> Optional[Tuple[int, float]]:
+        """upto 年以前で最後の非欠損値 (年, 値)"""
+        b = self._base(key, field)
+        if b is None:
+            return None
+        last = self._ny - 1 if upto is None else min(self._ny - 1, upto - self.year0)
+        for i in range(last, -1, -1):
+            v = self._data[b + i]
+            if v == v:
+                return self.year0 + i, v
+        return None
+
+    def row(self, key: str, year: Optional[int] = None) -> Dict[str, float]:
+        """1キーの全項目（year 省略時は最終年）。欠損項目は含めない"""
+        out: Dict[str, float] = {}
+        y = self.year1 if year is None else year
+        for f in self.fields:
+            v = self.get(key, f, y)
+            if v is not None:
+                out[f] = v
+        return out
+
+    def close(self):
+        self._data.release()
+        self._mm.close()
+
+
+class ColStoreBuilder:
+    def __init__(self, years: Iterable[int], meta: Optional[Dict[str, Any]] = None):
+        ys = list(years)
+        if not ys:
+            raise ValueError("years must not be empty")
+        self.year0, self.year1 = min(ys), max(ys)
+        self.meta: Dict[str, Any] = dict(meta or {})
+        self._ny = self.year1 - self.year0 + 1
+        self._series: Dict[Tuple[str, str], array] = {}
+
+    def _arr(self, key: str, field: str) -> array:
+        a = self._series.get((key, field))
+        if a is None:
+            a = self._series[(key, field)] = array("d", [_NAN]) * self._ny
+        return a
+
+    def set(self, key: str, field: str, year: int, value: Optional[float]):
+        if value is None or not (self.year0 <= year <= self.year1):
+            return
+        self._arr(key, field)[year - self.year0] = float(value)
+
+    def set_series(self, key: str, field: str, values: Dict[int, Optional[float]]):
+        for y, v in values.items():
+            self.set(key, field, y, v)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def write(self, path: str) -> str:
+        keys = sorted({k for k, _ in self._series})
+        fields = sorted({f for _, f in self._series})
+        head = json.dumps({"version": VERSION, "keys": keys, "fields": fields,
+                           "years": [self.year0, self.year1], "meta": self.meta},
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        empty = array("d", [_NAN]) * self._ny
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(head)))
+            f.write(head)
+            f.write(b"\0" * (_align(12 + len(head)) - 12 - len(head)))
+            for k in keys:
+                for fld in fields:
+                    a = self._series.get((k, fld), empty)
+                    if sys.byteorder != "little":
+                        a = array("d", a)
+                        a.byteswap()
+                    a.tofile(f)
+        os.replace(tmp, path)
+        return path
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def open_store(path: str) -> Optional[ColStore]:
+    """ファイルが無い・壊れているときは None（呼び出し側はネットワーク / 既定値にフォールバック）"""
+    try:
+        return ColStore(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, ColStoreError) as e:
+        print(f"[colstore] cannot open {path}: {e!r}")
+        return None
@@ -0,0 +1,68 @@
+# core/context.py
+"""
+リクエスト単位のコンテキスト（締め切り・劣化フラグ）。
+
+contextvars で保持するので、run_pipeline → extract_policies / build_country_profile →
+各プロバイダ（asyncio タスク・to_thread 先も含む）まで引数を増やさずに伝わる。
+各段は budget() / RequestContext.timeout() で「残り時間」からタイムアウトを決め、
+締め切り前に劣化した（ローカル抽出・キャッシュ/既定プロファイル）結果を返す。
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+_current: contextvars.ContextVar[Optional["RequestContext"]] = contextvars.ContextVar("request_context", default=None)
+
+
+class RequestContext:
+    __slots__ = ("deadline", "started", "degraded")
+
+    def __init__(self, budget_sec: float):
+        self.started = time.monotonic()
+        self.deadline = self.started + float(budget_sec)
+        self.degraded: List[str] = []
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0, floor: float = 0.05) -> float:
+        """残り時間から reserve を引いた値（cap で上限）。下限 floor"""
+        t = self.remaining() - reserve
+        if cap is not None:
+            t = min(cap, t)
+        return max(floor, t)
+
+    def degrade(self, reason: str):
+        if reason not in self.degraded:
+            self.degraded.append(reason)
+
+
+def current() -> Optional[RequestContext]:
+    return _current.get()
+
+
+@contextmanager
+def request_context(budget_sec: float):
+    """この with 内（と、ここで生成されたタスク・スレッド）に締め切りを設定する。
+    既にコンテキストがあれば、より早い締め切りの方を使う"""
+    outer = _current.get()
+    ctx = RequestContext(budget_sec)
+    if outer is not None and outer.deadline < ctx.deadline:
+        ctx.deadline = outer.deadline
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+
+
+def budget(cap: float, reserve: float = 0.0) -> float:
+    """プロバイダ用：固定タイムアウト cap を残り時間で切り詰める（コンテキストが無ければ cap）"""
+    ctx = _current.get()
+    if ctx is None:
+        return cap
+    return ctx.timeout(cap, reserve)
@@ -1,43 +1,55 @@
-
 # core/ensemble.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+from collections import Counter
 import difflib
-from .utils import normalize_title, jaccard
+from .policy import Policy, CONF_CODE, UNIT_PRIORITY, Unit, iter_lever_indices
 
 BASE_WEIGHTS = {"openai":0.4, "claude":0.35, "gemini":0.25, "local":0.15}
 CONF_W = {"S":1.0,"A":0.9,"B":0.7,"C":0.5,"D":0.3}
+# Policy.confidence（int）→ 重み。-1（不明）は 0.5
+_CONF_W_BY_CODE = {CONF_CODE[k]: w for k, w in CONF_W.items()}
 
 def _title_sim(a: str, b: str) -> float:
-    a_tokens = " ".join(sorted(a.split()))
-    b_tokens = " ".join(sorted(b.split()))
-    return difflib.SequenceMatcher(None, a_tokens, b_tokens).ratio()
+    # a/b は Policy.title_key（正規化・トークンソート済み）
+    return difflib.SequenceMatcher(None, a, b).ratio()
 
-def cluster_policies(outputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    items = []
-    for o in outputs:
-        model_name = o.get("_model_name", "unknown")
-        for pol in o.get("policies", []):
-            items.append({"model": model_name, "policy": pol})
+def _lever_sim(a: int, b: int) -> float:
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return (a & b).bit_count() / (a | b).bit_count()
 
-    clusters = []
-    used = [False]*len(items)
-    for i, it in enumerate(items):
+def cluster_indices(title_keys: List[str], levers: List[int]) -> List[List[int]]:
+    """正規化タイトルとレバーだけでクラスタ（添字のグループ）を作る（プロセスプールに渡せる形）"""
+    groups = []
+    used = [False]*len(title_keys)
+    for i, base_key in enumerate(title_keys):
         if used[i]: continue
-        base_title = normalize_title(it["policy"].get("title",""))
-        base_lever = set(it["policy"].get("lever") or [])
         group = [i]
         used[i] = True
-        for j in range(i+1, len(items)):
+        for j in range(i+1, len(title_keys)):
             if used[j]: continue
-            jt = normalize_title(items[j]["policy"].get("title",""))
-            jl = set(items[j]["policy"].get("lever") or [])
-            title_sim = _title_sim(base_title, jt)
-            lever_sim = jaccard(base_lever, jl)
+            title_sim = _title_sim(base_key, title_keys[j])
+            lever_sim = _lever_sim(levers[i], levers[j])
             if 0.5*title_sim + 0.5*lever_sim >= 0.75:
                 used[j] = True
                 group.append(j)
-        clusters.append({"members":[items[k] for k in group]})
-    return clusters
+        groups.append(group)
+    return groups
+
+def cluster_policies(outputs: List[Dict[str, Any]], groups: List[List[int]] | None = None) -> List[Dict[str, Any]]:
+    """outputs: [{"_model_name": str, "policies": [Policy, ...]}, ...]
+    groups: 計算済みのクラスタ（core.offload.cluster の結果）。None ならここで計算"""
+    items: List[Tuple[str, Policy]] = []
+    for o in outputs:
+        model_name = o.get("_model_name", "unknown")
+        for pol in o.get("policies", []):
+            items.append((model_name, pol))
+
+    if groups is None:
+        groups = cluster_indices([p.title_key for _, p in items], [p.levers for _, p in items])
+    return [{"members":[{"model": items[k][0], "policy": items[k][1]} for k in group]} for group in groups]
 
 def level_from_score(score: float) -> str:
     if score >= 0.85: return "S"
@@ -46,56 +58,48 @@ def level_from_score(score: float) -> str:
     if score >= 0.4:  return "C"
     return "D"
 
-def merge_outputs(outputs: List[Dict[str, Any]]) -> Dict[str, Any]:
-    clusters = cluster_policies(outputs)
-    merged_policies = []
+def merge_outputs(outputs: List[Dict[str, Any]], groups: List[List[int]] | None = None,
+                  weights: Dict[str, float] | None = None) -> Dict[str, Any]:
+    """weights: プロバイダごとの重み（core.router の学習値）。None なら BASE_WEIGHTS
+    戻り値の clusters はクラスタごと（採用しなかったものも含む）のプロバイダ名（ルーターの一致率の計算用）"""
+    w = BASE_WEIGHTS if weights is None else weights
+    clusters = cluster_policies(outputs, groups)
+    merged_policies: List[Policy] = []
     for cl in clusters:
-        votes = []
-        for m in cl["members"]:
-            model = m["model"]
-            pol = m["policy"]
-            w_model = BASE_WEIGHTS.get(model, 0.2)
-            w_conf = CONF_W.get((pol.get("confidence") or "B"), 0.5)
-            votes.append(w_model * w_conf)
-        score = sum(votes)
+        members = [m["policy"] for m in cl["members"]]
+        score = sum(w.get(m["model"], 0.2) * _CONF_W_BY_CODE.get(m["policy"].confidence, 0.5)
+                    for m in cl["members"])
         if score < 0.5:
             continue
 
-        titles = [m["policy"].get("title") for m in cl["members"] if m["policy"].get("title")]
+        titles = [p.title for p in members if p.title]
         title = max(titles, key=len) if titles else "(untitled)"
 
-        from collections import Counter
-        levs = []
-        for m in cl["members"]:
-            levs += (m["policy"].get("lever") or [])
-        lever_counts = Counter(levs)
-        lever = [x for x,_ in lever_counts.most_common(3)]
+        lever_counts = Counter(i for p in members for i in iter_lever_indices(p.levers))
+        lever = 0
+        for i, _ in lever_counts.most_common(3):
+            lever |= 1 << i
 
-        dirs = []
-        for m in cl["members"]:
-            dirs += (m["policy"].get("direction") or [])
-        dir_counts = Counter(dirs)
-        direction = [x for x,_ in dir_counts.most_common(3)]
+        dir_counts = Counter(d for p in members for d in p.direction)
+        direction = tuple(x for x,_ in dir_counts.most_common(3))
 
-        lags = [m["policy"].get("lag_years") for m in cl["members"] if m["policy"].get("lag_years") is not None]
-        lag = int(sorted(lags)[len(lags)//2]) if lags else None
+        lags = sorted(p.lag for p in members if p.lag is not None)
+        lag = int(lags[len(lags)//2]) if lags else None
 
-        priority = {"%GDP":3,"USD":2,"LCU":1,"qty":0,"unknown":-1}
-        scales = [m["policy"].get("scale") for m in cl["members"] if m["policy"].get("scale") is not None]
-        scales = [s for s in scales if isinstance(s, dict) and s.get("unit") is not None]
-        scale = None
-        if scales:
-            scales.sort(key=lambda s: priority.get(s.get("unit"), -1), reverse=True)
-            scale = {"value": scales[0].get("value"), "unit": scales[0].get("unit")}
+        scaled = [p for p in members if p.scale_unit != Unit.NONE]
+        best = max(scaled, key=lambda p: UNIT_PRIORITY.get(p.scale_unit, -1)) if scaled else None
 
-        merged_policies.append({
-            "title": title,
-            "lever": lever,
-            "direction": direction[:3],
-            "lag_years": lag,
-            "scale": scale,
-            "confidence": level_from_score(score)
-        })
+        merged_policies.append(Policy(
+            title=title,
+            levers=lever,
+            direction=direction,
+            lag=lag,
+            scale_value=best.scale_value if best else None,
+            scale_unit=best.scale_unit if best else Unit.NONE,
+            currency=best.currency if best else None,
+            confidence=CONF_CODE[level_from_score(score)],
+        ))
 
     horizon = max([int(o.get("horizon_years", 5)) for o in outputs] + [5])
-    return {"horizon_years": horizon, "policies": merged_policies}
+    return {"horizon_years": horizon, "policies": merged_policies,
+            "clusters": [[m["model"] for m in cl["members"]] for cl in clusters]}
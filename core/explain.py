@@ -0,0 +1,87 @@
+# core/explain.py
+"""
+/explain 用の構造化レコード。
+
+run_pipeline ではモデル入力・政策ごとの寄与・プロファイルだけを小さな dict として保持し、
+文字列への整形は /explain が呼ばれた時にだけ行う（大半の実行では整形コストを払わない）。
+"""
+from typing import Any, Dict, List
+
+EXPLAIN_VERSION = 1
+
+# プロファイルのうち説明に残すスカラー項目（tier_params はティア名から再現できるので持たない）
+_PROFILE_KEYS = ("display_name", "iso3", "income_tier", "baseline_gdp_usd",
+                 "inflation_recent", "openness_ratio", "investment_rate",
+                 "labor_growth", "debt_to_gdp", "gdp_per_capita", "inflation_forecast",
+                 "trade_partner_hhi", "trade_top_partner_share", "export_sector_hhi", "currency",
+                 "snapshot_version")
+
+# 政策ごとの寄与行の並び（タプル/リストで持つ）
+CONTRIB_FIELDS = ("title", "lever", "lag", "intensity", "tfp_pp", "demand_imp")
+
+
+def make_record(model: Dict[str, Any], profile: Dict[str, Any] | None, horizon: int) -> Dict[str, Any]:
+    """model（forecast の戻り値3つ目）とプロファイルから保存用レコードを作る"""
+    prof = profile or {}
+    return {
+        "v": EXPLAIN_VERSION,
+        "horizon": horizon,
+        "inputs": (model or {}).get("inputs") or {},
+        "policies": (model or {}).get("policies") or [],
+        "profile": {k: prof[k] for k in _PROFILE_KEYS if prof.get(k) is not None},
+    }
+
+
+def _fmt_num(v: Any, spec: str) -> str:
+    try:
+        return format(float(v), spec)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def render_lines(record: Dict[str, Any]) -> List[str]:
+    """レコード → 表示行（旧 explain 文字列と同じ書式）"""
+    if not isinstance(record, dict):
+        # 旧形式（文字列）の互換
+        return str(record or "").splitlines()
+    inp = record.get("inputs") or {}
+    lines = [
+        f"[Tier] potential_g={inp.get('potential_g')} target_infl={inp.get('target')} "
+        f"mult={inp.get('mult')} trade_elast={inp.get('trade_elast')}"
+        + (f" trade_exposure={_fmt_num(inp['trade_exposure'], '.2f')}" if inp.get("trade_exposure", 1.0) != 1.0 else ""),
+        f"[Profile] invest_rate={inp.get('invest_rate')} openness={inp.get('openness')} "
+        f"inflation_recent={inp.get('inflation_recent')} baseline_gdp={_fmt_num(inp.get('baseline_gdp'), '.3e')}",
+    ]
+    if inp.get("currency") or inp.get("fx"):
+        lines.append(f"[FX] currency={inp.get('currency')} rates={inp.get('fx')}")
+    for row in record.get("policies") or []:
+        title, lever, lag, intensity, tfp_pp, demand_imp = row
+        lines.append(
+            f"[Policy] {title} lever={lever} lag={lag} intensity(%GDP)={_fmt_num(intensity, '.2f')} "
+            f"tfp_pp/yr~{_fmt_num(tfp_pp, '.2f')} demand_imp~{_fmt_num(demand_imp, '.2f')}"
+        )
+    prof = record.get("profile") or {}
+    if prof:
+        lines.append("[ProfileResolved] " + ", ".join(f"{k}={v}" for k, v in prof.items()))
+    return lines
+
+
+def render_pages(record: Dict[str, Any], limit: int = 1900) -> List[str]:
+    """Discord の 2000 文字制限に収まるよう行単位でページ分割する"""
+    pages: List[str] = []
+    buf: List[str] = []
+    size = 0
+    for line in render_lines(record):
+        # 1行が長すぎる場合は強制的に切る
+        while len(line) > limit:
+            if buf:
+                pages.append("\n".join(buf)); buf, size = [], 0
+            pages.append(line[:limit])
+            line = line[limit:]
+        if size + len(line) + 1 > limit and buf:
+            pages.append("\n".join(buf)); buf, size = [], 0
+        buf.append(line)
+        size += len(line) + 1
+    if buf:
+        pages.append("\n".join(buf))
+    return pages
@@ -0,0 +1,135 @@
+# core/fx.py
+"""
+為替表（全リクエストで共有・更新間隔ごとに1回だけ取得）と ISO3 → 通貨の対応。
+
+- レートは CURRENCIES の並びの array('d')（1通貨単位あたりの USD）。未知は NaN
+- 取得は FX_REFRESH_SEC（既定 12 時間）ごとに1回。同時に期限切れを見たリクエストは
+  同じ取得を待つ（single-flight）。失敗時は前回の表、それも無ければ静的な概算レート
+- 政策規模の %GDP 換算は model._intensities が列単位で一括して行う（ここは係数を渡すだけ）
+"""
+import asyncio
+import math
+import os
+import time
+from array import array
+from typing import Dict, Iterable, Optional
+
+CURRENCIES = (
+    "USD", "EUR", "JPY", "GBP", "CNY", "INR", "KRW", "VND", "IDR", "THB", "MYR", "PHP", "SGD", "HKD", "TWD",
+    "AUD", "NZD", "CAD", "MXN", "BRL", "ARS", "CLP", "COP", "PEN", "CHF", "SEK", "NOK", "DKK", "PLN", "CZK",
+    "HUF", "TRY", "RUB", "ZAR", "NGN", "EGP", "KES", "ETB", "SAR", "AED", "ILS", "PKR", "BDT", "LKR",
+)
+CCY_INDEX: Dict[str, int] = {c: i for i, c in enumerate(CURRENCIES)}
+
+# ISO3 → 自国通貨
+ISO3_CCY: Dict[str, str] = {
+    "USA": "USD", "JPN": "JPY", "GBR": "GBP", "CHN": "CNY", "IND": "INR", "KOR": "KRW", "VNM": "VND",
+    "IDN": "IDR", "THA": "THB", "MYS": "MYR", "PHL": "PHP", "SGP": "SGD", "HKG": "HKD", "TWN": "TWD",
+    "AUS": "AUD", "NZL": "NZD", "CAN": "CAD", "MEX": "MXN", "BRA": "BRL", "ARG": "ARS", "CHL": "CLP",
+    "COL": "COP", "PER": "PEN", "CHE": "CHF", "SWE": "SEK", "NOR": "NOK", "DNK": "DKK", "POL": "PLN",
+    "CZE": "CZK", "HUN": "HUF", "TUR": "TRY", "RUS": "RUB", "ZAF": "ZAR", "NGA": "NGN", "EGY": "EGP",
+    "KEN": "KES", "ETH": "ETB", "SAU": "SAR", "ARE": "AED", "ISR": "ILS", "PAK": "PKR", "BGD": "BDT",
+    "LKA": "LKR",
+    # ユーロ圏
+    "DEU": "EUR", "FRA": "EUR", "ITA": "EUR", "ESP": "EUR", "NLD": "EUR", "BEL": "EUR", "AUT": "EUR",
+    "PRT": "EUR", "FIN": "EUR", "IRL": "EUR", "GRC": "EUR", "SVK": "EUR", "SVN": "EUR", "LTU": "EUR",
+    "LVA": "EUR", "EST": "EUR", "LUX": "EUR", "HRV": "EUR", "CYP": "EUR", "MLT": "EUR",
+}
+
+# 取得できないとき用の概算（1 USD あたりの通貨量）
+_STATIC_PER_USD = {
+    "USD": 1.0, "EUR": 0.92, "JPY": 150.0, "GBP": 0.79, "CNY": 7.2, "INR": 83.0, "KRW": 1350.0, "VND": 24500.0,
+    "IDR": 15700.0, "THB": 36.0, "MYR": 4.7, "PHP": 56.0, "SGD": 1.35, "HKD": 7.8, "TWD": 32.0, "AUD": 1.52,
+    "NZD": 1.65, "CAD": 1.36, "MXN": 17.0, "BRL": 5.0, "ARS": 850.0, "CLP": 930.0, "COP": 3900.0, "PEN": 3.7,
+    "CHF": 0.88, "SEK": 10.5, "NOK": 10.7, "DKK": 6.9, "PLN": 4.0, "CZK": 23.0, "HUF": 360.0, "TRY": 32.0,
+    "RUB": 92.0, "ZAR": 18.5, "NGN": 1400.0, "EGP": 47.0, "KES": 130.0, "ETB": 57.0, "SAR": 3.75, "AED": 3.67,
+    "ILS": 3.7, "PKR": 280.0, "BDT": 110.0, "LKR": 300.0,
+}
+
+REFRESH_SEC = float(os.getenv("FX_REFRESH_SEC", "43200"))
+
+
+class FxTable:
+    __slots__ = ("usd_per", "asof", "source", "fetched")
+
+    def __init__(self, usd_per: array, asof: Optional[str], source: str, fetched: float):
+        self.usd_per = usd_per    # array('d')：CURRENCIES[i] 1単位あたりの USD
+        self.asof = asof
+        self.source = source      # "live" / "static"
+        self.fetched = fetched
+
+    @classmethod
+    def from_rates(cls, per_usd: Dict[str, float], asof: Optional[str] = None, source: str = "live") -> "FxTable":
+        """{"JPY": 150.0, ...}（1 USD あたり）から作る"""
+        vals = array("d", [math.nan] * len(CURRENCIES))
+        for code, r in (per_usd or {}).items():
+            i = CCY_INDEX.get(str(code).upper())
+            try:
+                r = float(r)
+            except (TypeError, ValueError):
+                continue
+            if i is not None and r > 0:
+                vals[i] = 1.0 / r
+        vals[CCY_INDEX["USD"]] = 1.0
+        return cls(vals, asof, source, time.time())
+
+    def usd_per_unit(self, code: Optional[str]) -> float:
+        i = CCY_INDEX.get((code or "").upper())
+        return math.nan if i is None else self.usd_per[i]
+
+    def factors(self, codes: Iterable[Optional[str]]) -> array:
+        """通貨コード列 → USD 換算係数の列（未知は NaN）"""
+        idx, rates = CCY_INDEX, self.usd_per
+        return array("d", [rates[idx[c]] if c in idx else math.nan for c in codes])
+
+    def as_dict(self):
+        return {"asof": self.asof, "source": self.source}
+
+    def __reduce__(self):
+        return (FxTable, (self.usd_per, self.asof, self.source, self.fetched))
+
+
+STATIC_TABLE = FxTable.from_rates(_STATIC_PER_USD, None, "static")
+
+_table: Optional[FxTable] = None
+_inflight: Optional[asyncio.Future] = None
+
+
+def currency_for(iso3: Optional[str]) -> Optional[str]:
+    return ISO3_CCY.get((iso3 or "").upper())
+
+
+def current() -> FxTable:
+    """取得済みの表（無ければ静的な概算）。ネットワークには出ない"""
+    return _table or STATIC_TABLE
+
+
+async def _refresh() -> FxTable:
+    global _table
+    from providers.fx_exchangerate import fetch_fx
+    try:
+        js = await fetch_fx("USD")
+    except Exception as e:
+        js = None
+        print("[fx] fetch error:", repr(e))
+    rates = (js or {}).get("rates") or {}
+    if len(rates) >= 2:
+        _table = FxTable.from_rates(rates, (js or {}).get("date"), "live")
+    else:
+        # 失敗：前回の表（無ければ静的な概算）を使い続け、間隔の 1/10 後に再試行
+        if _table is None:
+            _table = FxTable(array("d", STATIC_TABLE.usd_per), None, "static", 0.0)
+        _table.fetched = time.time() - REFRESH_SEC * 0.9
+    return current()
+
+
+async def get_table() -> FxTable:
+    """更新間隔内なら共有の表をそのまま返し、期限切れなら1回だけ取得する"""
+    global _inflight
+    t = _table
+    if t is not None and time.time() - t.fetched < REFRESH_SEC:
+        return t
+    if _inflight is None or _inflight.done() or _inflight.get_loop() is not asyncio.get_running_loop():
+        _inflight = asyncio.ensure_future(_refresh())
+    # 待っている側のキャンセル（締め切り）で取得自体は止めない
+    return await asyncio.shield(_inflight)
@@ -0,0 +1,72 @@
+# core/http.py
+"""
+プロバイダ共通の HTTP クライアント（接続プール共有）。
+
+- async_client(): 実行中のイベントループごとに 1 つの httpx.AsyncClient を使い回す
+  （Discord ボットと JSON API が同じループ上で同じプールを共有する）
+- sync_client(): スレッド実行する同期プロバイダ（World Bank）用の共有 httpx.Client
+タイムアウトは呼び出し側がリクエストごとに指定する。
+
+HTTP_CASSETTE_MODE=record|replay でカセット（core/cassette.py）のトランスポートに差し替える。
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=30.0,
+)
+_DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+
+
+def _transport(is_async: bool):
+    if (os.getenv("HTTP_CASSETTE_MODE") or "off").lower() in ("", "off"):
+        return None
+    from .cassette import transport_from_env
+    return transport_from_env(is_async, limits=_LIMITS)
+
+
+def async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_LIMITS, timeout=_DEFAULT_TIMEOUT, transport=_transport(True))
+        _async_clients[loop] = client
+    return client
+
+
+def sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _sync_lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(limits=_LIMITS, timeout=_DEFAULT_TIMEOUT, transport=_transport(False))
+    return _sync_client
+
+
+def reset_clients():
+    """共有クライアントを作り直させる（カセットのモード切り替え時など）。
+    古いクライアントは参照が切れた時点で破棄される"""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+    _async_clients.clear()
+
+
+async def aclose():
+    """現在のループのクライアントを閉じる（シャットダウン時）"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,58 @@
+# core/jsonutil.py
+"""
+JSON エンコード/デコード。orjson があればそれを使い、無ければ標準 json にフォールバック。
+"""
+import json
+import re
+from typing import Any
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - orjson は任意
+    _orjson = None
+
+
+if _orjson is not None:
+    def loads(s: str | bytes) -> Any:
+        return _orjson.loads(s)
+
+    def dumps(obj: Any, indent: bool = False) -> str:
+        opt = _orjson.OPT_INDENT_2 if indent else 0
+        return _orjson.dumps(obj, option=opt | _orjson.OPT_NON_STR_KEYS, default=_default).decode("utf-8")
+else:
+    def loads(s: str | bytes) -> Any:
+        return json.loads(s)
+
+    def dumps(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, default=_default)
+
+
+def _default(o: Any):
+    # Policy / TierParams などは辞書表現で出す
+    for attr in ("to_dict", "as_dict"):
+        f = getattr(o, attr, None)
+        if callable(f):
+            return f()
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.S)
+
+
+def loads_llm(text: str) -> Any:
+    """LLM の応答テキストを JSON として読む（```json フェンスや前後の文章を許容）"""
+    if not isinstance(text, str):
+        return text
+    try:
+        return loads(text)
+    except ValueError:
+        pass
+    m = _FENCE.match(text)
+    if m:
+        return loads(m.group(1))
+    a, b = text.find("{"), text.rfind("}")
+    if 0 <= a < b:
+        return loads(text[a:b + 1])
+    raise ValueError("response is not JSON")
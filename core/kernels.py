@@ -0,0 +1,141 @@
+# core/kernels.py
+"""
+政策の効果の時間分布（ラグ・カーネル）。tiers.yml の lag_kernels でレバーごとに指定する。
+
+カーネルは「効果が出始めた年（ラグ）から t 年目に、政策の大きさの何倍が効くか」の列 k[t]:
+    step      k[t] = 1（ラグ以降ずっと。従来の潜在成長率の扱い）
+    gamma     ガンマ分布の累積分布 P(shape, (t+1)/scale)。0 から 1 へなだらかに立ち上がる
+    hump      ガンマ分布の密度を離散化して合計 1 に正規化（長い裾も含めて 1。期間内の合計は 1 以下）
+    decay     k[t] = rho**t。最初の年が最大で、その後減衰する
+    linear    k[t] = min(cap, start + slope*t)
+    weights   明示した列（例: [0.6, 0.4] = 従来の需要効果の 6:4 配分）
+どれも gain（既定 1）を掛けられる。
+
+経路は「(ラグ, 大きさ) のインパルス列」とカーネルの畳み込み。政策ごとには同じカーネルを持つ
+インパルス列のラグの位置に足し込むだけで、年次の展開はカーネルの種類ごとに1回の畳み込み
+（convolve_rows）で済む（政策数が増えても政策×年の二重ループにならない）。
+カーネルの列は (仕様, 長さ) ごとにメモ化する。
+"""
+import math
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+# 仕様は ("種類", パラメータ...) の不変タプル（TierParams に入れて pickle できる）
+Spec = Tuple[Any, ...]
+
+STEP: Spec = ("step", 1.0)
+DEMAND_SPLIT: Spec = ("weights", 1.0, (0.6, 0.4))
+PATH_RAMP: Spec = ("linear", 1.0, 0.7, 0.15, 1.0)
+
+_HUMP_SUPPORT = 60   # hump の正規化に使う年数
+
+
+def compile_spec(raw: Any, default: Spec) -> Spec:
+    """tiers.yml の {type: ..., ...}（または種類名の文字列・数値の列）を仕様タプルにする"""
+    if raw is None:
+        return default
+    if isinstance(raw, str):
+        raw = {"type": raw}
+    elif isinstance(raw, (list, tuple)):
+        raw = {"type": "weights", "weights": raw}
+    if not isinstance(raw, dict):
+        raise ValueError(f"lag kernel must be a mapping, got {raw!r}")
+    kind = str(raw.get("type", "step")).lower()
+    gain = float(raw.get("gain", 1.0))
+    if kind == "step":
+        return ("step", gain)
+    if kind in ("gamma", "hump"):
+        shape, scale = float(raw.get("shape", 2.0)), float(raw.get("scale", 1.0))
+        if shape <= 0 or scale <= 0:
+            raise ValueError(f"{kind} kernel needs shape > 0 and scale > 0")
+        return (kind, gain, shape, scale)
+    if kind == "decay":
+        rho = float(raw.get("rho", 0.7))
+        if not 0.0 <= rho <= 1.0:
+            raise ValueError("decay kernel needs 0 <= rho <= 1")
+        return ("decay", gain, rho)
+    if kind == "linear":
+        return ("linear", gain, float(raw.get("start", 0.0)), float(raw.get("slope", 0.25)),
+                float(raw.get("cap", 1.0)))
+    if kind == "weights":
+        ws = tuple(float(w) for w in (raw.get("weights") or ()))
+        if not ws:
+            raise ValueError("weights kernel needs a non-empty 'weights' list")
+        return ("weights", gain, ws)
+    raise ValueError(f"unknown lag kernel type: {kind!r}")
+
+
+def describe(spec: Spec) -> Dict[str, Any]:
+    """表示用（tiers.yml と同じ形）"""
+    kind, gain = spec[0], spec[1]
+    out: Dict[str, Any] = {"type": kind}
+    if kind in ("gamma", "hump"):
+        out.update(shape=spec[2], scale=spec[3])
+    elif kind == "decay":
+        out["rho"] = spec[2]
+    elif kind == "linear":
+        out.update(start=spec[2], slope=spec[3], cap=spec[4])
+    elif kind == "weights":
+        out["weights"] = list(spec[2])
+    if gain != 1.0:
+        out["gain"] = gain
+    return out
+
+
+def _gamma_cdf(a: float, x: float) -> float:
+    """正則化下側不完全ガンマ関数 P(a, x)（級数展開。ここで使う x は高々数十）"""
+    if x <= 0:
+        return 0.0
+    term = total = 1.0 / a
+    n = 1
+    while n < 500:
+        term *= x / (a + n)
+        total += term
+        if term < total * 1e-12:
+            break
+        n += 1
+    return min(1.0, total * math.exp(a * math.log(x) - x - math.lgamma(a)))
+
+
+@lru_cache(maxsize=256)
+def vector(spec: Spec, n: int) -> Tuple[float, ...]:
+    """カーネルの最初の n 年分"""
+    kind, gain = spec[0], spec[1]
+    if kind == "step":
+        k = [1.0] * n
+    elif kind == "gamma":
+        k = [_gamma_cdf(spec[2], (t + 1) / spec[3]) for t in range(n)]
+    elif kind == "hump":
+        shape, scale = spec[2], spec[3]
+        dens = [(t + 1) ** (shape - 1) * math.exp(-(t + 1) / scale) for t in range(max(n, _HUMP_SUPPORT))]
+        tot = sum(dens)
+        k = [d / tot for d in dens[:n]]
+    elif kind == "decay":
+        k = [spec[2] ** t for t in range(n)]
+    elif kind == "linear":
+        k = [min(spec[4], spec[2] + spec[3] * t) for t in range(n)]
+    elif kind == "weights":
+        ws = spec[2]
+        k = [ws[t] if t < len(ws) else 0.0 for t in range(n)]
+    else:
+        raise ValueError(f"unknown lag kernel type: {kind!r}")
+    return tuple(gain * v for v in k) if gain != 1.0 else tuple(k)
+
+
+def convolve_rows(rows: Dict[Spec, Sequence[float]], horizon: int) -> List[float]:
+    """{カーネル: インパルス列} → 全カーネル分を畳み込んで足した長さ horizon の経路。
+    計算量はカーネルの種類数 × horizon² で、政策数によらない"""
+    out = [0.0] * horizon
+    for spec, imp in rows.items():
+        k = vector(spec, horizon)
+        for s, a in enumerate(imp[:horizon]):
+            if a == 0.0:
+                continue
+            for t in range(s, horizon):
+                out[t] += a * k[t - s]
+    return out
+
+
+def convolve(impulses: Sequence[float], spec: Spec) -> List[float]:
+    """1本のインパルス列とカーネルの畳み込み（長さはインパルス列と同じ）"""
+    return convolve_rows({spec: impulses}, len(impulses))
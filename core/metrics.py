@@ -0,0 +1,221 @@
+# core/metrics.py
+"""
+プロセス内の軽量メトリクス（Prometheus テキスト形式で出力）。
+
+keep_alive.py の /metrics から render() を返す。外部依存なし・スレッドセーフ
+（Flask は別スレッドで動くため）。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# 秒単位の既定バケット（LLM 呼び出しの数十秒まで）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_REGISTRY: List["_Metric"] = []
+_reg_lock = threading.Lock()
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._lock = threading.Lock()
+        with _reg_lock:
+            _REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines += self.samples()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        super().__init__(name, doc)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, n: float = 1.0, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + n
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], Dict[LabelKey, float]] | None = None):
+        super().__init__(name, doc)
+        self._values: Dict[LabelKey, float] = {}
+        self._fn = fn   # 出力時に値を計算するコールバック（任意）
+
+    def set(self, v: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = float(v)
+
+    def inc(self, n: float = 1.0, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + n
+
+    def dec(self, n: float = 1.0, **labels):
+        self.inc(-n, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        self.inc(1, **labels)
+        try:
+            yield
+        finally:
+            self.dec(1, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = dict(self._values)
+        if self._fn is not None:
+            try:
+                items.update(self._fn())
+            except Exception:
+                pass
+        return [f"{self.name}{_fmt_labels(k)} {_fmt_num(v)}" for k, v in items.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, list] = {}   # key -> [bucket_counts..., sum, count]
+
+    def observe(self, v: float, **labels):
+        k = _key(labels)
+        n = len(self.buckets)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [0] * n + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if v <= b:
+                    s[i] += 1
+                    break
+            s[n] += v
+            s[n + 1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self):
+        n = len(self.buckets)
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        out = []
+        for k, s in items:
+            acc = 0
+            for i, b in enumerate(self.buckets):
+                acc += s[i]
+                out.append(f"{self.name}_bucket{_fmt_labels(k, [('le', _fmt_num(b))])} {acc}")
+            out.append(f"{self.name}_bucket{_fmt_labels(k, [('le', '+Inf')])} {s[n + 1]}")
+            out.append(f"{self.name}_sum{_fmt_labels(k)} {_fmt_num(s[n])}")
+            out.append(f"{self.name}_count{_fmt_labels(k)} {s[n + 1]}")
+        return out
+
+
+def render() -> str:
+    with _reg_lock:
+        metrics = list(_REGISTRY)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# ---- アプリ共通のメトリクス ----
+STAGE_SECONDS = Histogram("gdpbot_stage_seconds", "Latency of pipeline stages in seconds")
+PROVIDER_SECONDS = Histogram("gdpbot_provider_seconds", "Latency of provider calls in seconds")
+PROVIDER_CALLS = Counter("gdpbot_provider_calls_total", "Provider calls by outcome")
+CACHE_REQUESTS = Counter("gdpbot_cache_requests_total", "Cache lookups by result")
+INFLIGHT = Gauge("gdpbot_inflight_requests", "Requests currently being processed")
+
+
+def _cache_ratios() -> Dict[LabelKey, float]:
+    caches = {}
+    for k, v in list(CACHE_REQUESTS._values.items()):
+        d = dict(k)
+        c = caches.setdefault(d.get("cache", ""), [0.0, 0.0])
+        c[0 if d.get("result") == "hit" else 1] += v
+    return {_key({"cache": name}): (h / (h + m) if h + m else 0.0) for name, (h, m) in caches.items()}
+
+
+def _provider_error_rates() -> Dict[LabelKey, float]:
+    prov = {}
+    for k, v in list(PROVIDER_CALLS._values.items()):
+        d = dict(k)
+        c = prov.setdefault(d.get("provider", ""), [0.0, 0.0])
+        c[0 if d.get("outcome") == "ok" else 1] += v
+    return {_key({"provider": name}): (e / (ok + e) if ok + e else 0.0) for name, (ok, e) in prov.items()}
+
+
+CACHE_HIT_RATIO = Gauge("gdpbot_cache_hit_ratio", "Cache hit ratio since start", fn=_cache_ratios)
+PROVIDER_ERROR_RATE = Gauge("gdpbot_provider_error_rate", "Provider error rate since start", fn=_provider_error_rates)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+async def timed_provider(name: str, aw):
+    """プロバイダ呼び出し（awaitable）を計測して結果をそのまま返す"""
+    t0 = time.perf_counter()
+    try:
+        res = await aw
+    except BaseException:
+        PROVIDER_SECONDS.observe(time.perf_counter() - t0, provider=name)
+        PROVIDER_CALLS.inc(provider=name, outcome="error")
+        raise
+    PROVIDER_SECONDS.observe(time.perf_counter() - t0, provider=name)
+    PROVIDER_CALLS.inc(provider=name, outcome="ok")
+    return res
+
+
+async def timed_stage(stage: str, aw):
+    with STAGE_SECONDS.time(stage=stage):
+        return await aw
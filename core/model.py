@@ -1,127 +1,96 @@
 
+import math
+from array import array
+from functools import lru_cache
 from typing import Dict, Any, List, Tuple
 from .utils import clamp
-
-def _lever_to_tfp_keys(lever: List[str]) -> List[str]:
-    mapping = {
-        "logistics": "logistics",
-        "infrastructure": "infrastructure",
-        "education": "education",
-        "regulation": "regulation",
-        "governance": "governance",
-        "energy": "energy",
-        "trade": "trade",
-        "industry": "industry",
-        "finance": "finance",
-        "security": "security",
-        "automation": "automation"
-    }
-    return [mapping.get(x, x) for x in lever or []]
-
-# core/model.py
-
-def clamp(x, lo, hi):
-    return max(lo, min(hi, x))
-
-# core/model.py
-
-from typing import Dict, Any, List
-import math
-
-def _policy_gain(profile: Dict[str, Any], policies: List[Dict[str, Any]]) -> float:
+from . import tiers as tier_tables
+from . import fx as fx_tables
+from . import kernels
+from .tiers import TierParams
+from .policy import Lever, Policy, PolicyBatch, Unit, iter_lever_indices, lever_names
+
+def _tier_of(profile: Dict[str, Any]) -> TierParams:
+    """profile の tier_params（コンパイル済みレコード）を返す。無ければティア名から引く"""
+    tp = profile.get("tier_params")
+    if isinstance(tp, TierParams):
+        return tp
+    return tier_tables.get(profile.get("income_tier") or tier_tables.DEFAULT_TIER)
+
+# レバー群（旧実装の部分文字列判定を正規化済みビットマスクで置き換えたもの）
+_M_INFRA    = Lever.INFRASTRUCTURE | Lever.LOGISTICS
+_M_EDU      = Lever.EDUCATION
+_M_REG      = Lever.REGULATION | Lever.GOVERNANCE
+_M_INDUSTRY = Lever.INDUSTRY
+_M_TRADE    = Lever.TRADE
+_M_CAPEX    = Lever.INFRASTRUCTURE | Lever.INDUSTRY | Lever.ENERGY | Lever.LOGISTICS
+_M_CURRENT  = Lever.FINANCE | Lever.GOVERNANCE | Lever.REGULATION
+
+def _policy_gain(profile: Dict[str, Any], policies: List[Policy]) -> float:
     # --- ここはあなたの最新版があるならそれでOK。無ければ簡易版 ---
     if not policies:
         return 0.0
     tier = (profile.get("income_tier") or "middle_income").lower()
     tfp_k, capex_k = (0.10, 0.08) if "high" in tier else ((0.15, 0.10) if "middle" in tier else (0.20, 0.12))
+    # 強度は forecast と同じ _intensities（GDP が推定値・不明なら金額は換算しない）
+    intensities = _intensities(PolicyBatch.from_policies(policies), profile)
     bonus = 0.0
-    for p in policies:
-        lev = " / ".join((p.get("lever") or [])).lower()
-        scale = (p.get("scale") or {}).get("value"); base = 0.02 if scale is None else min(0.005*float(scale), 0.5)
-        if any(k in lev for k in ["infrastructure","infra","port","rail","grid","logistics","インフラ","港","鉄道","送電","物流","ロジ"]):
+    for p, inten in zip(policies, intensities):
+        lev = p.levers
+        base = 0.02 if p.scale_unit == Unit.NONE else min(0.005*inten, 0.5)
+        if lev & _M_INFRA:
             gain = capex_k * base
-        elif any(k in lev for k in ["education","human capital","reskilling","教育","人材","職業訓練","リスキリング"]):
+        elif lev & _M_EDU:
             gain = tfp_k * base * 0.8
-        elif any(k in lev for k in ["regulation","deregulation","governance","business","規制","規制改革","ガバナンス","ビジネス"]):
+        elif lev & _M_REG:
             gain = tfp_k * base
-        elif any(k in lev for k in ["tax","subsidy","industry","semiconductor","manufacturing","税","減税","補助","補助金","産業","半導体","製造"]):
+        elif lev & _M_INDUSTRY:
             gain = 0.5*(tfp_k+capex_k)*base
-        elif any(k in lev for k in ["trade","fta","貿易","通商"]):
+        elif lev & _M_TRADE:
             gain = tfp_k * base * 0.7
         else:
             gain = 0.5*(tfp_k+capex_k)*(base*0.5)
-        lag = p.get("lag_years") or 0
+        lag = p.lag or 0
         gain *= (1.0 - min(max(lag,0),4)*0.1)
         bonus += gain
     return max(-1.0, min(bonus, 1.5))
 
-def make_growth_paths(profile: Dict[str, Any], policies: List[Dict[str, Any]], horizon: int):
-    horizon = max(1, min(10, int(horizon or 5)))
-    tp = (profile.get("tier_params") or {})
-    base_g = float(tp.get("potential_g", 3.0))
-    invest = profile.get("investment_rate"); open_ = profile.get("openness_ratio")
-    infl = profile.get("inflation_recent"); target = float(tp.get("inflation_target", 3.0))
-
+def _macro_adj(invest, open_, infl, target: float) -> float:
+    """マクロ状況による潜在成長率の微調整（pp）。数値でない（None・NaN）項目は使わない"""
     adj = 0.0
-    if isinstance(invest,(int,float)): adj += 0.5 * ((float(invest)-0.25)/0.10)
-    if isinstance(open_, (int,float)): adj += 0.3 * ((float(open_)-0.8)/0.20)
-    if isinstance(infl,  (int,float)): adj -= 0.15 * min(abs(float(infl)-target), 5.0)
-
-    pol = _policy_gain(profile, policies)
-    g0 = base_g + adj + pol
-
-    inc = (profile.get("income_tier") or "").lower()
-    band = 0.8 if "high" in inc else (1.0 if "middle" in inc else 1.2)
-
-    base_path = [max(-3.0, min(g0, 10.0))]
-    low_path  = [base_path[0] - band]
-    high_path = [base_path[0] + band]
-
-    for t in range(1, horizon):
-        decay = 0.5
-        pol_rt = min(1.0, 0.7 + 0.15*t)
-        g_t = (base_g + adj)*(1-pol_rt) + (base_g + adj + pol)*pol_rt
-        next_b = base_path[-1] + decay*(g_t - base_path[-1])
-        base_path.append(max(-3.0, min(next_b, 10.0)))
-        low_path.append(base_path[-1] - band)
-        high_path.append(base_path[-1] + band)
+    if isinstance(invest, (int,float)) and invest == invest:
+        # 投資率25%を基準、±10%ptで ±0.5pp 程度
+        adj += 0.5 * ((float(invest) - 0.25) / 0.10)
+    if isinstance(open_, (int,float)) and open_ == open_:
+        # 開放度80%を基準、±20%ptで ±0.3pp 程度
+        adj += 0.3 * ((float(open_) - 0.8) / 0.20)
+    if isinstance(infl, (int,float)) and infl == infl:
+        # インフレ目標からの乖離で成長減衰（過熱/デフレともにマイナス）
+        gap = abs(float(infl) - target)
+        adj -= 0.15 * min(gap, 5.0)  # 最大 -0.75pp
+    return adj
 
-    explain = (
-        f"[Model] base_g={base_g:.2f}, adj={adj:.2f}, pol={pol:.2f}, "
-        f"tier={profile.get('income_tier')}, invest={invest}, open={open_}, infl={infl}, target={target}"
-    )
-    return {"base": base_path, "low": low_path, "high": high_path}, None, explain
+def _band(income_tier: str | None) -> float:
+    inc = (income_tier or "").lower()
+    return 0.8 if "high" in inc else (1.0 if "middle" in inc else 1.2)
 
-# ★ これが呼ばれる前提で（古い固定版を完全に上書き）
-def forecast(profile: Dict[str, Any], policies: List[Dict[str, Any]], horizon: int):
-    return make_growth_paths(profile, policies, horizon)
-def make_growth_paths(profile: Dict[str, Any], policies: List[Dict[str, Any]], horizon: int):
+def make_growth_paths(profile: Dict[str, Any], policies: List[Policy], horizon: int):
     """
     profile["tier_params"]["potential_g"] をベースに、政策ボーナス/マクロ状態で調整して
     BASE/LOW/HIGH の年次パスを返す。
     戻り値: {"base":[...], "low":[...], "high":[...]}
     """
     horizon = max(1, min(10, int(horizon or 5)))
-    tp = (profile.get("tier_params") or {})
-    base_g = float(tp.get("potential_g", 3.0))  # ← ここが「国ごとに違う」肝
+    tp = _tier_of(profile)
+    base_g = tp.potential_g  # ← ここが「国ごとに違う」肝
 
     # マクロ状況で微調整：投資率・開放度・インフレ乖離
     invest = profile.get("investment_rate")
     open_  = profile.get("openness_ratio")
     infl   = profile.get("inflation_recent")
-    target = float(tp.get("inflation_target", 3.0))
+    target = tp.inflation_target
 
-    adj = 0.0
-    if isinstance(invest, (int,float)):
-        # 投資率25%を基準、±10%ptで ±0.5pp 程度
-        adj += 0.5 * ((float(invest) - 0.25) / 0.10)
-    if isinstance(open_, (int,float)):
-        # 開放度80%を基準、±20%ptで ±0.3pp 程度
-        adj += 0.3 * ((float(open_) - 0.8) / 0.20)
-    if isinstance(infl, (int,float)):
-        # インフレ目標からの乖離で成長減衰（過熱/デフレともにマイナス）
-        gap = abs(float(infl) - target)
-        adj -= 0.15 * min(gap, 5.0)  # 最大 -0.75pp
+    adj = _macro_adj(invest, open_, infl, target)
 
     # 政策ボーナス
     pol = _policy_gain(profile, policies)
@@ -129,20 +98,17 @@ def make_growth_paths(profile: Dict[str, Any], policies: List[Dict[str, Any]], h
     # ベース成長率
     g0 = base_g + adj + pol
     # LOW/HIGH バンド幅（ティアに応じて）
-    if tp is None:
-        band = 0.8
-    else:
-        inc = (profile.get("income_tier") or "").lower()
-        band = 0.8 if "high" in inc else (1.0 if "middle" in inc else 1.2)
+    band = _band(profile.get("income_tier"))
 
     base_path = [max(-3.0, min(g0, 10.0))]
     low_path  = [base_path[0] - band]
     high_path = [base_path[0] + band]
 
-    # 2年目以降は徐々に潜在へ回帰（±50%収斂/年）、政策は3年で7割発現
+    # 2年目以降は徐々に潜在へ回帰（±50%収斂/年）、政策の発現率は tiers.yml の lag_kernels.path
+    ramp = kernels.vector(tp.path_kernel, horizon)
     for t in range(1, horizon):
         decay = 0.5
-        pol_rt = min(1.0, 0.7 + 0.15*t)
+        pol_rt = ramp[t]
         g_t = (base_g + adj) * (1 - pol_rt) + (base_g + adj + pol) * pol_rt
         prev_b = base_path[-1]
         next_b = prev_b + decay*(g_t - prev_b)
@@ -156,89 +122,200 @@ def make_growth_paths(profile: Dict[str, Any], policies: List[Dict[str, Any]], h
 
 
 
-def _scale_to_intensity(scale: Dict[str, Any] | None, baseline_gdp: float) -> float:
-    if not scale or scale.get("unit") is None:
+def baseline_paths_batch(tps: List[TierParams], invest, open_, infl, horizon: int) -> List[array]:
+    """make_growth_paths（政策なし）を多数の (国, 基準年) について列単位で計算する（バックテスト用）。
+    invest / open_ / infl は行ごとの値の列（欠損は NaN）。
+    行をティアごとにまとめ、潜在成長率・インフレ目標・発現率の列はティアごとに1回だけ引く。
+    年ごとの更新はティア内の全行に対する1回の列演算（zip した列の内包表記）。
+    戻り値: 年ごとの base パスの列 [array('d')（行数ぶん）× horizon]。各行は make_growth_paths と同じ値"""
+    n = len(tps)
+    out = [array("d", bytes(8 * n)) for _ in range(horizon)]
+    groups: Dict[TierParams, List[int]] = {}
+    for i, tp in enumerate(tps):
+        groups.setdefault(tp, []).append(i)
+    for tp, rows in groups.items():
+        base_g, target = tp.potential_g, tp.inflation_target
+        ramp = kernels.vector(tp.path_kernel, horizon)
+        # 政策なしなので政策込みの成長率（base_g + adj + pol）も base_g + adj と同じ列
+        nat = [base_g + _macro_adj(invest[i], open_[i], infl[i], target) for i in rows]
+        cur = [max(-3.0, min(g, 10.0)) for g in nat]
+        col = out[0]
+        for i, v in zip(rows, cur):
+            col[i] = v
+        for t in range(1, horizon):
+            r = ramp[t]
+            q = 1 - r
+            cur = [max(-3.0, min(b + 0.5*((g*q + g*r) - b), 10.0)) for b, g in zip(cur, nat)]
+            col = out[t]
+            for i, v in zip(rows, cur):
+                col[i] = v
+    return out
+
+
+def _scale_to_intensity(unit: int, val: float | None, baseline_gdp: float, usd_per_unit: float = math.nan) -> float:
+    """規模 → 強度（%GDP）。金額は usd_per_unit（1通貨単位あたりの USD）で換算。換算できなければ 1.0"""
+    if unit == Unit.NONE:
         return 1.0
-    unit = scale.get("unit")
-    val = scale.get("value", 0) or 0
-    try:
-        val = float(val)
-    except:
-        val = 0.0
-    if unit == "%GDP":
+    val = val or 0.0
+    if unit == Unit.PCT_GDP:
         return clamp(val, 0.0, 100.0)
-    if unit == "USD" and baseline_gdp > 0:
-        return clamp(100.0 * val / baseline_gdp, 0.0, 100.0)
+    if unit == Unit.USD:
+        usd_per_unit = 1.0
+    if unit in (Unit.USD, Unit.LCU, Unit.CCY) and baseline_gdp > 0 and usd_per_unit == usd_per_unit:
+        return clamp(100.0 * val * usd_per_unit / baseline_gdp, 0.0, 100.0)
     return 1.0
 
-def _confidence_weight(conf: str) -> float:
-    table = {"S":1.0,"A":0.9,"B":0.7,"C":0.5,"D":0.3}
-    return table.get(conf, 0.6)
+def _usd_factors(batch: PolicyBatch, profile: Dict[str, Any]) -> array:
+    """各政策の規模 1 単位あたりの USD（USD=1、LCU=自国通貨、CCY=指定通貨、それ以外は NaN）"""
+    fx = profile.get("fx")
+    if not isinstance(fx, fx_tables.FxTable):
+        fx = fx_tables.current()
+    f = fx.factors(batch.currencies)
+    home = fx.usd_per_unit(profile.get("currency"))
+    for i, u in enumerate(batch.scale_units):
+        if u == Unit.USD:
+            f[i] = 1.0
+        elif u == Unit.LCU:
+            f[i] = home
+    return f
+
+def _intensities(batch: PolicyBatch, profile: Dict[str, Any]) -> List[float]:
+    """規模 → 強度（%GDP）を列単位で一括計算（通貨建ては共有の為替表で USD に換算してから baseline_gdp_usd で割る）。
+    forecast と make_growth_paths（_policy_gain）の両方がここを通る"""
+    # GDP が既定値（不明）のときは金額の換算をしない
+    baseline_gdp = 0.0 if profile.get("baseline_gdp_estimated") else float(profile.get("baseline_gdp_usd") or 0.0)
+    return [_scale_to_intensity(u, 0.0 if v != v else v, baseline_gdp, f)
+            for u, v, f in zip(batch.scale_units, batch.scale_values, _usd_factors(batch, profile))]
+
+# Policy.confidence（S..D = 4..0）→ 重み。不明(-1)は 0.6
+_CONF_WEIGHT = (0.3, 0.5, 0.7, 0.9, 1.0)
+
+def _confidence_weight(conf: int) -> float:
+    return _CONF_WEIGHT[conf] if 0 <= conf < len(_CONF_WEIGHT) else 0.6
+
+# 貿易レバーの需要効果の補正：輸出先・輸出品目が集中している国ほど、
+# 市場アクセス・多角化の政策の効き目が大きいとみなす（指標が無ければ 1.0 = 従来どおり）
+_HHI_REF_PARTNER = 0.10
+_HHI_REF_SECTOR = 0.25
+
+def _trade_exposure(profile: Dict[str, Any]) -> float:
+    p_hhi = profile.get("trade_partner_hhi")
+    s_hhi = profile.get("export_sector_hhi")
+    if p_hhi is None and s_hhi is None:
+        return 1.0
+    x = 1.0
+    if p_hhi is not None:
+        x += 0.5 * (float(p_hhi) - _HHI_REF_PARTNER)
+    if s_hhi is not None:
+        x += 0.3 * (float(s_hhi) - _HHI_REF_SECTOR)
+    return clamp(x, 0.8, 1.3)
+
+# 需要効果の種類（_lever_plan の戻り値）
+_D_NONE, _D_CAPEX, _D_CURRENT, _D_TRADE = 0, 1, 2, 3
+
+@lru_cache(maxsize=4096)
+def _lever_plan(tier: TierParams, lever: int) -> Tuple[float, Tuple[Tuple[tuple, float], ...], int, tuple | None]:
+    """レバーのビット列 → (TFP 係数の合計, ((カーネル, 係数), ...), 需要効果の種類, 需要効果のカーネル)。
+    TFP 係数はカーネルが同じレバーどうしで合算する（既定の step だけなら1組）。
+    需要効果のカーネルは、効果を決めたレバー群のうち先頭のレバーのもの"""
+    coeff = 0.0
+    parts: Dict[tuple, float] = {}
+    for idx in iter_lever_indices(lever):
+        coeff += tier.tfp[idx]
+        spec = tier.tfp_kernels[idx]
+        parts[spec] = parts.get(spec, 0.0) + tier.tfp[idx]
+    if lever & _M_CAPEX:
+        kind, group = _D_CAPEX, lever & _M_CAPEX
+    elif lever & _M_CURRENT:
+        kind, group = _D_CURRENT, lever & _M_CURRENT
+    elif lever & _M_TRADE:
+        kind, group = _D_TRADE, _M_TRADE
+    else:
+        kind, group = _D_NONE, 0
+    demand_spec = tier.demand_kernels[next(iter_lever_indices(group))] if group else None
+    return coeff, tuple(parts.items()), kind, demand_spec
 
 def _inflation_penalty(inflation_recent: float, target: float, t: int) -> float:
     gap = max(0.0, (inflation_recent or target) - target)
     decay = max(0.2, 1.0 - 0.2 * t)
     return 0.15 * gap * decay / 10.0
 
-def forecast(profile: Dict[str, Any], extract: Dict[str, Any], horizon: int) -> Tuple[Dict[str,List[float]], List[float], str]:
-    tier = profile["tier_params"]
-    potential_g = float(tier["potential_g"])
-    target = float(tier.get("inflation_target", 4.0))
+def forecast(profile: Dict[str, Any], extract: Dict[str, Any], horizon: int) -> Tuple[Dict[str,List[float]], List[float], Dict[str, Any]]:
+    tier = _tier_of(profile)
+    potential_g = tier.potential_g
+    target = tier.inflation_target
     baseline_gdp = float(profile.get("baseline_gdp_usd", 1e9))
     invest_rate = float(profile.get("investment_rate", 0.25))
     openness = float(profile.get("openness_ratio", 0.8))
     inflation_recent = float(profile.get("inflation_recent", target))
 
-    tfp_coeff = tier.get("tfp_coeff", {})
-    fiscal_mult = tier.get("fiscal_multiplier", {"capex":1.0, "current":0.5})
-    trade_elast = float(tier.get("trade_elasticity", 0.3))
-
-    years = list(range(horizon))
-    g_pot = [potential_g]*horizon
-    demand = [0.0]*horizon
-
-    explain_lines = []
-    explain_lines.append(f"[Tier] potential_g={potential_g} target_infl={target} mult={fiscal_mult} trade_elast={trade_elast}")
-    explain_lines.append(f"[Profile] invest_rate={invest_rate} openness={openness} inflation_recent={inflation_recent} baseline_gdp={baseline_gdp:.3e}")
-
-    for p in extract.get("policies", []):
-        lever = p.get("lever", [])
-        lag = p.get("lag_years", None)
+    tfp = tier.tfp
+    capex_mult, current_mult = tier.capex_mult, tier.current_mult
+    fiscal_mult = tier.fiscal_multiplier
+    trade_elast = tier.trade_elasticity
+    trade_exposure = _trade_exposure(profile)
+
+    # 政策はカーネルごとのインパルス列（ラグの位置に大きさ）に足し込み、最後に1回ずつ畳み込む
+    tfp_rows: Dict[tuple, List[float]] = {}
+    demand_rows: Dict[tuple, List[float]] = {}
+
+    fx = profile.get("fx")
+
+    # explain は文字列にせず構造のまま返す（整形は core/explain.py で /explain 時のみ）
+    inputs = {"potential_g": potential_g, "target": target, "mult": fiscal_mult, "trade_elast": trade_elast,
+              "invest_rate": invest_rate, "openness": openness, "inflation_recent": inflation_recent,
+              "baseline_gdp": baseline_gdp, "currency": profile.get("currency"), "trade_exposure": trade_exposure,
+              "fx": fx.source if isinstance(fx, fx_tables.FxTable) else None}
+    contribs = []
+
+    pols: List[Policy] = extract.get("policies", [])
+    batch = PolicyBatch.from_policies(pols)
+    intensities = _intensities(batch, profile)
+    for i, p in enumerate(pols):
+        lever = p.levers
+        lag = p.lag
         if lag is None:
-            default_lags = tier.get("default_lags", {})
-            if "infrastructure" in lever or "logistics" in lever:
-                lag = default_lags.get("infra", 2)
-            elif "education" in lever:
-                lag = default_lags.get("education", 3)
-            elif "regulation" in lever or "governance" in lever:
-                lag = default_lags.get("regulation", 1)
+            if lever & _M_INFRA:
+                lag = tier.lag_infra
+            elif lever & _M_EDU:
+                lag = tier.lag_education
+            elif lever & _M_REG:
+                lag = tier.lag_regulation
             else:
                 lag = 1
         lag = int(clamp(lag, 0, 7))
-        conf_w = _confidence_weight(p.get("confidence","B"))
-        intensity = _scale_to_intensity(p.get("scale"), baseline_gdp)
+        conf_w = _confidence_weight(p.confidence)
+        intensity = intensities[i]
 
-        tfp_pp = 0.0
-        for k in _lever_to_tfp_keys(lever):
-            tfp_pp += float(tfp_coeff.get(k, 0.0)) * (intensity/5.0) * conf_w
-        for t in range(lag, horizon):
-            g_pot[t] += tfp_pp
+        plan = _lever_plan(tier, lever)
+        scale = (intensity/5.0) * conf_w
+        tfp_pp = plan[0] * scale
+        for spec, part in plan[1]:
+            if lag < horizon:
+                row = tfp_rows.get(spec)
+                if row is None:
+                    row = tfp_rows[spec] = [0.0]*horizon
+                row[lag] += part * scale
 
+        kind, demand_spec = plan[2], plan[3]
         demand_imp = 0.0
-        if any(x in lever for x in ["infrastructure","industry","energy","logistics"]):
-            demand_imp = float(fiscal_mult.get("capex",1.0)) * (intensity/5.0)
-        elif any(x in lever for x in ["finance","governance","regulation"]):
-            demand_imp = float(fiscal_mult.get("current",0.5)) * (intensity/5.0) * 0.5
-        elif "trade" in lever:
-            demand_imp = trade_elast * (min(1.0, openness) * intensity/10.0)
-
-        if demand_imp != 0.0:
-            if lag < horizon:
-                demand[lag] += demand_imp*0.6
-            if lag+1 < horizon:
-                demand[lag+1] += demand_imp*0.4
+        if kind == _D_CAPEX:
+            demand_imp = capex_mult * (intensity/5.0)
+        elif kind == _D_CURRENT:
+            demand_imp = current_mult * (intensity/5.0) * 0.5
+        elif kind == _D_TRADE:
+            demand_imp = trade_elast * (min(1.0, openness) * intensity/10.0) * trade_exposure
+
+        if demand_imp != 0.0 and lag < horizon:
+            row = demand_rows.get(demand_spec)
+            if row is None:
+                row = demand_rows[demand_spec] = [0.0]*horizon
+            row[lag] += demand_imp
+
+        contribs.append((p.title, lever_names(lever), lag, round(intensity, 4), round(tfp_pp, 4), round(demand_imp, 4)))
 
-        explain_lines.append(f"[Policy] {p.get('title')} lever={lever} lag={lag} intensity(%GDP)={intensity:.2f} tfp_pp/yr~{tfp_pp:.2f} demand_imp~{demand_imp:.2f}")
+    g_pot = [potential_g + x for x in kernels.convolve_rows(tfp_rows, horizon)]
+    demand = kernels.convolve_rows(demand_rows, horizon)
 
     base = []
     low = []
@@ -255,5 +332,4 @@ def forecast(profile: Dict[str, Any], extract: Dict[str, Any], horizon: int) ->
         cpi.append(target + gap)
 
     scenarios = {"base": base, "low": low, "high": high}
-    explain = "\n".join(explain_lines)
-    return scenarios, cpi, explain
+    return scenarios, cpi, {"inputs": inputs, "policies": contribs}
@@ -0,0 +1,240 @@
+# core/neardup.py
+"""
+ほぼ同じ政策テキスト（言い換え・箇条書きの追加・句読点の違い）の検出と、過去の抽出結果の再利用。
+
+- 正規化: NFKC・小文字化・記号と空白の除去。文は 。．！？ / 改行 / 箇条書き記号で区切る
+- 署名: 正規化したテキストの文字3-gram 集合の MinHash（1回のハッシュで 64 個のビンに振り分ける
+  one-permutation 方式。空のビンは右隣のビンから借りる）。句読点・空白・箇条書き記号だけの違いは同一
+- 索引: 4 行 × 16 帯の LSH。帯ごとに (帯のハッシュ, スロット) のソート済み配列を持ち、候補は 16 回の
+  二分探索で集まる。候補は推定 Jaccard（一致するビンの割合）が NEARDUP_MIN_SIM（既定 0.6）以上のものだけ。
+  署名も帯も array に詰めるので、1件あたり約 450 バイト（20 万件で約 90MB。辞書だと数倍になる）。
+  登録は配列の挿入（memmove）で O(件数) だが、登録するのは LLM を呼んだ後だけなので問題にならない
+- 再利用: 一致したら保存済みの抽出結果を使い、新しいテキストにしかない文だけローカル抽出を走らせて足す。
+  違う文が NEARDUP_MAX_DIFF（既定 0.5、文字数の割合）を超えるときは再利用しない
+- 登録は LLM が1つ以上答えた抽出結果だけ（再利用した結果は登録しない＝少しずつずれていくのを防ぐ）
+- 件数の上限 NEARDUP_MAX_ENTRIES（既定 200000）。超えたら古いものから捨てる（プロセス内のみ）
+- NEARDUP=off で無効
+"""
+import hashlib
+from bisect import bisect_left
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import Counter
+
+ENABLED = os.getenv("NEARDUP", "on").lower() not in ("0", "off", "false", "no")
+MIN_SIM = float(os.getenv("NEARDUP_MIN_SIM", "0.6"))
+MAX_DIFF = float(os.getenv("NEARDUP_MAX_DIFF", "0.5"))
+MAX_ENTRIES = int(os.getenv("NEARDUP_MAX_ENTRIES", "200000"))
+MIN_CHARS = int(os.getenv("NEARDUP_MIN_CHARS", "20"))
+
+NEARDUP_LOOKUPS = Counter("gdpbot_neardup_lookups_total", "Near-duplicate text lookups by result")
+
+_K = 64          # MinHash のビン数
+_ROWS = 4        # 1帯の行数（帯の数は _K // _ROWS）
+_BANDS = _K // _ROWS
+_BIN_SHIFT = 64 - 6   # 上位 6bit でビンを選ぶ（_K = 64）
+_VAL_MASK = 0xFFFFFFFF
+_KEY_MASK = (1 << 64) - 1
+_EMPTY = _VAL_MASK + 1
+_SHINGLE = 3
+
+_SENT_SPLIT = re.compile(r"[。．.!！?？;；\n]+|(?:^|\s)[・•●○◆■\-*－]\s*|(?:^|\s)\d+[.)）]\s+")
+
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFKC", s).lower()
+    return "".join(ch for ch in s if ch.isalnum())
+
+
+def sentences(text: str) -> List[str]:
+    """正規化した文（空のものは除く）"""
+    out = []
+    for part in _SENT_SPLIT.split(text or ""):
+        n = _norm(part)
+        if n:
+            out.append(n)
+    return out
+
+
+def minhash(norm_text: str) -> array:
+    """one-permutation MinHash（32bit × _K）"""
+    mins = [_EMPTY] * _K
+    n = len(norm_text) - _SHINGLE + 1
+    for sh in ({norm_text[i:i + _SHINGLE] for i in range(n)} if n > 0 else {norm_text}):
+        h = _h64(sh)
+        b = h >> _BIN_SHIFT
+        v = h & _VAL_MASK
+        if v < mins[b]:
+            mins[b] = v
+    # 空のビンは右隣（循環）の空でないビンの値を借りる。全部空なら 0 のまま
+    if _EMPTY in mins:
+        filled = [i for i, v in enumerate(mins) if v != _EMPTY]
+        if not filled:
+            return array("I", [0]) * _K
+        for i in range(_K):
+            if mins[i] == _EMPTY:
+                j = next((f for f in filled if f > i), filled[0])
+                mins[i] = (mins[j] + (j - i) % _K * 0x9E3779B1) & _VAL_MASK
+    return array("I", mins)
+
+
+def signature(text: str) -> Tuple[array, List[str]]:
+    sents = sentences(text)
+    return minhash("".join(sents)), sents
+
+
+def similarity(a, b) -> float:
+    """推定 Jaccard 係数（一致するビンの割合）"""
+    return sum(1 for x, y in zip(a, b) if x == y) / _K
+
+
+class NearDupIndex:
+    """MinHash の LSH 索引。スロットは固定長のリングバッファ（古いものから上書き）"""
+
+    def __init__(self, capacity: int = MAX_ENTRIES, min_sim: float = MIN_SIM):
+        self.capacity = max(1, capacity)
+        self.min_sim = min_sim
+        self._sig = array("I")   # スロット i の署名は [i*_K, (i+1)*_K)
+        self._payload: List[Any] = []
+        self._sents: List[frozenset] = []   # 正規化した文のハッシュ（プロセス内でだけ使う）
+        # 帯ごとに (キー昇順の帯ハッシュ, 同じ並びのスロット)
+        self._keys = [array("Q") for _ in range(_BANDS)]
+        self._slots = [array("I") for _ in range(_BANDS)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._payload)
+
+    @staticmethod
+    def _band_keys(sig):
+        for b in range(_BANDS):
+            k = b
+            for v in sig[b * _ROWS:(b + 1) * _ROWS]:
+                k = ((k ^ v) * 0x100000001B3) & _KEY_MASK   # FNV 風に畳み込む
+            yield b, k
+
+    def _unlink(self, slot: int):
+        old = self._sig[slot * _K:(slot + 1) * _K]
+        for b, k in self._band_keys(old):
+            keys, slots = self._keys[b], self._slots[b]
+            i = bisect_left(keys, k)
+            while i < len(keys) and keys[i] == k:
+                if slots[i] == slot:
+                    del keys[i]
+                    del slots[i]
+                    break
+                i += 1
+
+    def add(self, sig: array, sents: List[str], payload: Any) -> int:
+        with self._lock:
+            slot = self._next
+            self._next = (slot + 1) % self.capacity
+            if slot < len(self._payload):
+                self._unlink(slot)
+                self._sig[slot * _K:(slot + 1) * _K] = sig
+                self._payload[slot] = payload
+                self._sents[slot] = frozenset(map(hash, sents))
+            else:
+                self._sig.extend(sig)
+                self._payload.append(payload)
+                self._sents.append(frozenset(map(hash, sents)))
+            for b, k in self._band_keys(sig):
+                i = bisect_left(self._keys[b], k)
+                self._keys[b].insert(i, k)
+                self._slots[b].insert(i, slot)
+            return slot
+
+    def nearest(self, sig: array) -> Optional[Tuple[int, float]]:
+        """(スロット, 推定 Jaccard)。min_sim 未満しか無ければ None"""
+        best = None
+        seen = set()
+        with self._lock:
+            for b, k in self._band_keys(sig):
+                keys, slots = self._keys[b], self._slots[b]
+                i = bisect_left(keys, k)
+                while i < len(keys) and keys[i] == k:
+                    slot = slots[i]
+                    i += 1
+                    if slot in seen:
+                        continue
+                    seen.add(slot)
+                    sim = similarity(self._sig[slot * _K:(slot + 1) * _K], sig)
+                    if sim >= self.min_sim and (best is None or sim > best[1]
+                                                or (sim == best[1] and self._newer(slot, best[0]))):
+                        best = (slot, sim)
+        return best
+
+    def _newer(self, a: int, b: int) -> bool:
+        # リングバッファ上で a の方が後に書かれたか
+        n = self._next
+        return (a - n) % self.capacity > (b - n) % self.capacity
+
+    def get(self, slot: int) -> Tuple[Any, frozenset]:
+        with self._lock:
+            return self._payload[slot], self._sents[slot]
+
+
+_index: Optional[NearDupIndex] = None
+
+
+def index() -> NearDupIndex:
+    global _index
+    if _index is None:
+        _index = NearDupIndex()
+    return _index
+
+
+def lookup(text: str) -> Optional[Dict[str, Any]]:
+    """保存済みの抽出結果のうちほぼ同じテキストのもの。
+    戻り値: {"horizon_years", "policies", "new_sentences": [元の文...], "similarity", "kind": "exact"|"near"}"""
+    if not ENABLED or len(text or "") < MIN_CHARS:
+        return None
+    sig, sents = signature(text)
+    hit = index().nearest(sig)
+    if hit is None:
+        NEARDUP_LOOKUPS.inc(result="miss")
+        return None
+    slot, sim = hit
+    (horizon, pols), known = index().get(slot)
+    # 差分の文はローカル抽出に渡すので、正規化前の文で持つ
+    raw = [p for p in _SENT_SPLIT.split(text) if _norm(p)]
+    new = [r for r, n in zip(raw, sents) if hash(n) not in known]
+    total = sum(len(n) for n in sents) or 1
+    if sum(len(_norm(r)) for r in new) / total > MAX_DIFF:
+        NEARDUP_LOOKUPS.inc(result="too_different")
+        return None
+    kind = "exact" if not new and len(known) == len(set(sents)) else "near"
+    NEARDUP_LOOKUPS.inc(result=kind)
+    return {"horizon_years": horizon, "policies": list(pols), "new_sentences": new, "similarity": sim,
+            "kind": kind}
+
+
+def remember(text: str, horizon: int, policies: list):
+    if not ENABLED or len(text or "") < MIN_CHARS:
+        return
+    sig, sents = signature(text)
+    index().add(sig, sents, (horizon, tuple(policies)))
+
+
+def merge_new(policies: list, extra: list) -> list:
+    """再利用した政策に、差分の文から抽出した政策のうち既存と重ならないものを足す"""
+    if not extra:
+        return list(policies)
+    from .ensemble import cluster_indices
+    items = list(policies) + list(extra)
+    n_old = len(policies)
+    out = list(policies)
+    for group in cluster_indices([p.title_key for p in items], [p.levers for p in items]):
+        if all(i >= n_old for i in group):
+            out.append(items[group[0]])
+    return out
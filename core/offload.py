@@ -0,0 +1,177 @@
+# core/offload.py
+"""
+CPU を食う段（ローカル抽出の正規表現・政策クラスタリングの総当たり difflib・モデル計算）を
+プロセスプールへ逃がす。to_thread では GIL のためイベントループ（Discord のハートビート）が止まる。
+
+- POOL_WORKERS（既定 0 = 無効）個のワーカーを spawn で起動し、初期化でティア表・レバー辞書・
+  ローカル抽出の正規表現を読み込んでおく（warm() で起動時に立ち上げ済みにできる）
+- 入力の大きさがしきい値以上のときだけプールに出す。小さい入力はプロセス間の往復の方が高い
+    OFFLOAD_TEXT_CHARS      ローカル抽出に渡すテキストの文字数（既定 20000）
+    OFFLOAD_CLUSTER_ITEMS   クラスタリングする政策の総数（既定 40。比較回数は2乗で増える）
+    OFFLOAD_MODEL_WORK      モデル計算の 政策数×年数（既定 2000）
+- 受け渡しは小さなレコードだけ（クラスタリングは正規化タイトルとレバーのビット列、
+  モデルは PolicyBatch の列とプロファイルのスカラー）
+- プールが壊れたら（ワーカーの異常終了など）作り直し、その回はこのプロセスで実行する
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import Counter
+
+POOL_WORKERS = int(os.getenv("POOL_WORKERS", "0"))
+TEXT_CHARS = int(os.getenv("OFFLOAD_TEXT_CHARS", "20000"))
+CLUSTER_ITEMS = int(os.getenv("OFFLOAD_CLUSTER_ITEMS", "40"))
+MODEL_WORK = int(os.getenv("OFFLOAD_MODEL_WORK", "2000"))
+
+OFFLOAD_CALLS = Counter("gdpbot_offload_calls_total", "CPU-bound stage executions by placement")
+
+# モデル計算に渡すプロファイルの項目（tier_params / fx は pickle できる小さなレコード）
+_PROFILE_KEYS = ("income_tier", "tier_params", "baseline_gdp_usd", "baseline_gdp_estimated", "investment_rate",
+                 "openness_ratio", "inflation_recent", "currency", "fx", "trade_partner_hhi", "export_sector_hhi")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_workers: Optional[int] = None   # configure() で上書き（None なら POOL_WORKERS）
+_lock = threading.Lock()
+
+
+# ---- ワーカー側 ----
+
+def _init_worker():
+    # Ctrl-C は親だけが受ける
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from core import tiers
+    from core.policy import LEVERS, lever_mask
+    from providers.llm_local import extract_policies_local
+    import core.ensemble  # noqa: F401
+    import core.model  # noqa: F401
+    tiers.tables()
+    lever_mask(list(LEVERS))
+    extract_policies_local("インフラ 教育 規制 貿易 1兆円")
+
+
+def _ping(hold: float = 0.0) -> int:
+    time.sleep(hold)   # 1つのワーカーが全部さばかないよう少し掴んでおく
+    return os.getpid()
+
+
+def _w_extract_local(text: str) -> Dict[str, Any]:
+    from providers.llm_local import extract_policies_local
+    return extract_policies_local(text)
+
+
+def _w_cluster(title_keys: List[str], levers) -> List[List[int]]:
+    from core.ensemble import cluster_indices
+    return cluster_indices(title_keys, levers)
+
+
+def _w_forecast(profile: Dict[str, Any], batch, horizon: int):
+    from core.model import forecast
+    return forecast(profile, {"policies": batch.to_policies()}, horizon)
+
+
+# ---- 親側 ----
+
+def _n_workers() -> int:
+    return POOL_WORKERS if _workers is None else _workers
+
+
+def enabled() -> bool:
+    return _n_workers() > 0
+
+
+def configure(workers: int):
+    """ワーカー数を変える（バッチ CLI の --workers 用）。既存のプールは閉じる"""
+    global _workers
+    shutdown()
+    _workers = max(0, int(workers))
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    n = _n_workers()
+    if n <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(n, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker)
+    return _pool
+
+
+def warm():
+    """全ワーカーを起動して初期化まで済ませる（同期。起動時に別スレッドから呼ぶ）"""
+    pool = get_pool()
+    if pool is None:
+        return
+    n = _n_workers()
+    try:
+        pids = {f.result() for f in [pool.submit(_ping, 0.2) for _ in range(n)]}
+    except BrokenProcessPool as e:
+        print(f"[offload] workers failed to start ({e!r}); running inline")
+        _reset_broken(pool)
+        return
+    print(f"[offload] {len(pids)} worker(s) ready")
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _reset_broken(pool: ProcessPoolExecutor):
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run(name: str, size: int, threshold: int, fn: Callable, *args) -> Any:
+    """size >= threshold かつプールが有効ならワーカーで、そうでなければこのプロセスで fn(*args)"""
+    pool = get_pool() if size >= threshold else None
+    if pool is not None:
+        try:
+            res = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            OFFLOAD_CALLS.inc(stage=name, where="pool")
+            return res
+        except BrokenProcessPool as e:
+            print(f"[offload] pool broken ({e!r}); running {name} inline")
+            _reset_broken(pool)
+    OFFLOAD_CALLS.inc(stage=name, where="inline")
+    return fn(*args)
+
+
+# ---- 段ごとの入口 ----
+
+async def extract_local(text: str) -> Dict[str, Any]:
+    return await run("extract_local", len(text or ""), TEXT_CHARS, _w_extract_local, text)
+
+
+async def cluster(outputs: List[Dict[str, Any]]) -> Optional[List[List[int]]]:
+    """merge_outputs 用のクラスタ（items の添字のグループ）。小さい入力は None（merge_outputs が自分で計算）"""
+    pols = [p for o in outputs for p in o.get("policies", [])]
+    if len(pols) < CLUSTER_ITEMS or not enabled():
+        return None
+    return await run("cluster", len(pols), CLUSTER_ITEMS, _w_cluster,
+                     [p.title_key for p in pols], [p.levers for p in pols])
+
+
+async def forecast(profile: Dict[str, Any], policies: list, horizon: int):
+    from core.model import forecast as model_forecast
+    from core.policy import PolicyBatch
+    work = len(policies) * horizon
+    if work < MODEL_WORK or not enabled():
+        OFFLOAD_CALLS.inc(stage="model", where="inline")
+        return model_forecast(profile, {"policies": policies}, horizon)
+    slim = {k: profile[k] for k in _PROFILE_KEYS if k in profile}
+    return await run("model", work, MODEL_WORK, _w_forecast, slim, PolicyBatch.from_policies(policies), horizon)
@@ -1,59 +1,39 @@
 
 # core/orchestrator.py
 from core.model import make_growth_paths
-import os, asyncio, json, yaml
+import os, asyncio, time, uuid
 from typing import Dict, Any
-from .schemas import JSON_SCHEMA, coerce_extract_output
+from .schemas import SchemaError, clean_extract_output
+from .jsonutil import dumps, loads_llm
+from .utils import debug_enabled
+from .context import current as current_context, request_context
+from .metrics import INFLIGHT, PROVIDER_CALLS, PROVIDER_SECONDS, STAGE_SECONDS, timed_provider, timed_stage
 from .ensemble import merge_outputs
 from .model import forecast
 from .cache import get_cache, cache_key
+from .explain import make_record as make_explain_record
+from .state import ChannelStateStore, store_from_env
+from . import tiers as tier_tables
+from . import fx as fx_tables
+from .tiers import TierParams
+from .policy import Policy, policies_from_output, policies_to_struct
 
-from providers.llm_openai import extract_policies_openai   # async
-from providers.llm_gemini import extract_policies_gemini   # async
-# from providers.llm_claude import extract_policies_claude # 使うなら async
-from providers.llm_local import extract_policies_local     # ← これは同期関数！
-from providers.data_worldbank import fetch_country_profile as fetch_wb_profile
-from providers.data_imf import fetch_imf_profile
-from providers.fx_exchangerate import fetch_fx
-from providers.data_comtrade import fetch_comtrade
+# プロバイダ（httpx など重い依存を含む）は初回の呼び出し時に各関数内で import する。
+# ボットの起動時には読み込まない
 
 import asyncio
 
+# 締め切り直前に fuse/model/応答送信のために残しておく秒数
+_FINAL_RESERVE = 0.5
+# これ未満しか残っていなければ LLM は呼ばない
+_MIN_LLM_BUDGET = 2.0
+WB_CACHE_TTL = 86400
+
 async def _run_sync(func, *args, **kwargs):
     """同期関数をスレッドで非ブロッキング実行（awaitable化）"""
     return await asyncio.to_thread(func, *args, **kwargs)
 
-with open("tiers.yml", "r", encoding="utf-8") as f:
-    TIERS = yaml.safe_load(f)
-    
-# ==== TIER定義 & ヘルパー ====
-TIERS = {
-    "high_income": {
-        "potential_g": 2.0, "capital_share": 0.35, "inflation_target": 2.0,
-        "fiscal_multiplier": {"capex": 0.8, "current": 0.4}, "trade_elasticity": 0.2,
-        "tfp_coeff": {"logistics":0.15,"automation":0.25,"education":0.15,"regulation":0.25,
-                      "governance":0.2,"energy":0.1,"infrastructure":0.1,"trade":0.15,
-                      "industry":0.15,"finance":0.1,"security":0.1},
-        "default_lags": {"infra":2,"ports":2,"education":3,"regulation":1}
-    },
-    "middle_income": {
-        "potential_g": 4.0, "capital_share": 0.35, "inflation_target": 4.0,
-        "fiscal_multiplier": {"capex": 1.0, "current": 0.5}, "trade_elasticity": 0.3,
-        "tfp_coeff": {"logistics":0.2,"automation":0.3,"education":0.2,"regulation":0.3,
-                      "governance":0.2,"energy":0.15,"infrastructure":0.15,"trade":0.2,
-                      "industry":0.2,"finance":0.1,"security":0.1},
-        "default_lags": {"infra":2,"ports":2,"education":3,"regulation":1}
-    },
-    "low_income": {
-        "potential_g": 5.5, "capital_share": 0.35, "inflation_target": 5.0,
-        "fiscal_multiplier": {"capex": 1.2, "current": 0.6}, "trade_elasticity": 0.35,
-        "tfp_coeff": {"logistics":0.25,"automation":0.2,"education":0.25,"regulation":0.25,
-                      "governance":0.2,"energy":0.2,"infrastructure":0.2,"trade":0.25,
-                      "industry":0.25,"finance":0.1,"security":0.1},
-        "default_lags": {"infra":2,"ports":2,"education":3,"regulation":1}
-    },
-}
-
+# ==== TIER定義は tiers.yml（core/tiers.py でコンパイル・ホットリロード） ====
 def pick_tier_by_gdp_pc(gdp_pc: float | None) -> str:
     if gdp_pc is None: return "middle_income"
     if gdp_pc < 1500:  return "low_income"
@@ -90,43 +70,6 @@ def _hint_tier_from_country(name: str | None) -> str | None:
     key = _clean_country_name(name)
     return COUNTRY_TIER_HINT.get(key)
     
-# --- lever を英語カテゴリへ正規化（日本語にも対応）---
-def _normalize_lever_token(s: str) -> str:
-    if not s:
-        return ""
-    t = str(s).strip().lower()
-    # インフラ
-    if any(k in t for k in ["インフラ", "インフラ投資", "道路", "港", "港湾", "鉄道", "送電", "電力網", "空港", "物流", "ロジ", "ロジスティクス", "infrastructure", "infra", "port", "rail", "grid", "logistics"]):
-        return "infrastructure"
-    # 教育・人材
-    if any(k in t for k in ["教育", "人材", "訓練", "職業訓練", "リスキリング", "education", "human capital", "reskilling"]):
-        return "education"
-    # 規制・統治
-    if any(k in t for k in ["規制", "規制改革", "ガバナンス", "行政", "手続", "ビジネス環境", "regulation", "deregulation", "governance", "business"]):
-        return "regulation"
-    # 産業・税・補助
-    if any(k in t for k in ["半導体", "製造", "産業", "税", "減税", "補助", "補助金", "industry", "semiconductor", "manufacturing", "tax", "subsidy"]):
-        return "industry"
-    # 貿易・開放
-    if any(k in t for k in ["貿易", "輸出", "輸入", "fta", "通商", "関税", "trade", "fta"]):
-        return "trade"
-    return t
-
-def _normalize_policies_schema(data: dict) -> dict:
-    """policies の lever 配列を英語カテゴリに正規化"""
-    if not isinstance(data, dict):
-        return data
-    items = data.get("policies") or []
-    for p in items:
-        lev = p.get("lever") or []
-        if isinstance(lev, (list, tuple)):
-            p["lever"] = [_normalize_lever_token(x) for x in lev if x]
-        else:
-            p["lever"] = [_normalize_lever_token(str(lev))]
-    return data
-
-
-
 def _normalize_tier(name: str | None) -> str:
     """HIC/MIC/LIC や表記ゆれを規格化してキー（*_income）に揃える"""
     if not name:
@@ -141,104 +84,162 @@ def _normalize_tier(name: str | None) -> str:
         return "middle_income"
     return "middle_income"
 
-def get_tier_params(income_tier: str | None) -> dict:
+def get_tier_params(income_tier: str | None) -> TierParams:
     key = _normalize_tier(income_tier)
-    # .get で安全に、なければ middle_income を返す
-    return TIERS.get(key, TIERS["middle_income"])
+    # 不変レコードを返す（なければ middle_income）
+    return tier_tables.get(key)
 
 
-_channel_overrides: Dict[int, Dict[str, Any]] = {}
-_channel_explain: Dict[int, str] = {}
+# チャンネル状態は上限付き・永続化ストアに保持（初回アクセス時に生成）
+_channel_state: ChannelStateStore | None = None
+
+def _state() -> ChannelStateStore:
+    global _channel_state
+    if _channel_state is None:
+        _channel_state = store_from_env()
+    return _channel_state
 
 def set_overrides_for_channel(ch: int, overrides: Dict[str, Any]):
-    _channel_overrides[ch] = overrides
+    _state().set_overrides(ch, overrides)
 
 def get_overrides_for_channel(ch: int) -> Dict[str, Any]:
-    return _channel_overrides.get(ch, {})
+    return _state().get_overrides(ch)
+
+def set_last_explain_for_channel(ch: int, explain: Dict[str, Any]):
+    _state().push_explain(ch, explain)
 
-def set_last_explain_for_channel(ch: int, explain: str):
-    _channel_explain[ch] = explain
+def get_last_explain_for_channel(ch: int) -> Dict[str, Any] | None:
+    return _state().last_explain(ch)
 
-def get_last_explain_for_channel(ch: int) -> str | None:
-    return _channel_explain.get(ch)
+def get_explain_history_for_channel(ch: int) -> list:
+    """直近の実行履歴（新しい順）"""
+    return _state().history(ch)
 
+def save_run(record: Dict[str, Any]):
+    """実行 ID で explain レコードを保存（JSON API の GET /explain/{id} 用）"""
+    if record and record.get("id"):
+        _state().put_run(record["id"], record)
 
-def _normalize_lever_token(s: str) -> str:
-    if not s: return ""
-    t=str(s).strip().lower()
-    if any(k in t for k in ["インフラ","infrastructure","infra","port","rail","grid","logistics","港","港湾","鉄道","送電","電力","物流","ロジ"]): return "infrastructure"
-    if any(k in t for k in ["教育","人材","職業訓練","リスキリング","education","human capital","reskilling"]): return "education"
-    if any(k in t for k in ["規制","規制改革","ガバナンス","手続","ビジネス","regulation","deregulation","governance","business"]): return "regulation"
-    if any(k in t for k in ["半導体","製造","産業","税","減税","税額控除","補助","補助金","industry","semiconductor","manufacturing","tax","subsidy"]): return "industry"
-    if any(k in t for k in ["貿易","通商","輸出","輸入","fta","trade"]): return "trade"
-    return t
+def get_run(run_id: str) -> Dict[str, Any] | None:
+    return _state().get_run(run_id)
 
-def _normalize_policies_schema(data: dict) -> dict:
-    if not isinstance(data, dict): return {"policies":[]}
-    items = data.get("policies") or []
-    for p in items:
-        lev = p.get("lever") or []
-        p["lever"] = [_normalize_lever_token(x) for x in (lev if isinstance(lev,(list,tuple)) else [str(lev)]) if x]
-    return {"policies": items}
 
 async def extract_policies(text: str):
-    tasks=[]; active=[]
-    if os.getenv("OPENAI_API_KEY"):  tasks.append(extract_policies_openai(text)); active.append("openai")
-    if os.getenv("GEMINI_API_KEY"):  tasks.append(extract_policies_gemini(text)); active.append("gemini")
-    print(f"[extract] providers active={active}")
-
-    results=[]
-    if tasks:
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    """各プロバイダの出力を Policy レコードに一度だけ変換し、合議した結果を返す
+    呼ぶ LLM は core.router が成績（遅延・失敗率・合議との一致率）から選ぶ。
+    ほぼ同じテキストを抽出済みなら（core.neardup）その結果を使い、差分の文だけローカル抽出する
+    戻り値: {"horizon_years": int, "policies": [Policy, ...], "clusters": [[str, ...], ...]}
+    """
+    from providers.llm_local import extract_policies_local     # ← これは同期関数！
+    from . import offload   # 大きい入力はプロセスプールへ（イベントループを塞がない）
+    from . import neardup, router
+
+    reuse = neardup.lookup(text)
+    if reuse is not None:
+        pols = reuse["policies"]
+        if reuse["new_sentences"]:
+            try:
+                _, extra_pols = policies_from_output(await offload.extract_local("\n".join(reuse["new_sentences"])))
+            except Exception as e:
+                print("[extract] local (diff) fail:", repr(e)); extra_pols = []
+            pols = neardup.merge_new(pols, extra_pols)
+        print(f"[extract] reused {reuse['kind']} match (similarity={reuse['similarity']:.2f}, "
+              f"new sentences={len(reuse['new_sentences'])})")
+        return {"horizon_years": reuse["horizon_years"], "policies": pols, "clusters": [],
+                "reused": reuse["kind"]}
+    calls = {}   # name → coroutine を作る関数（選ばれたものだけ呼ぶ）
+    if os.getenv("OPENAI_API_KEY"):
+        from providers.llm_openai import extract_policies_openai   # async
+        calls["openai"] = extract_policies_openai
+    if os.getenv("GEMINI_API_KEY"):
+        from providers.llm_gemini import extract_policies_gemini   # async
+        calls["gemini"] = extract_policies_gemini
+    available = list(calls)
+
+    # ローカル抽出は先に済ませる（安く、結果をルーターが曖昧さの判断に使う）
     try:
-        results.append(extract_policies_local(text))
+        with PROVIDER_SECONDS.time(provider="local"):
+            local_res = await offload.extract_local(text)
+        PROVIDER_CALLS.inc(provider="local", outcome="ok")
     except Exception as e:
-        results.append(e)
+        PROVIDER_CALLS.inc(provider="local", outcome="error")
+        local_res = e
+
+    results=[]; active=[]
+    ctx = current_context()
+    if available and ctx is not None and ctx.remaining() < _MIN_LLM_BUDGET:
+        # 残り時間が足りない：LLM は呼ばずローカル抽出のみ
+        ctx.degrade("extract:llm_skipped")
+        print(f"[extract] providers active=[] (deadline)")
+    elif available:
+        local_pols = None
+        if isinstance(local_res, dict):
+            try:
+                local_pols = policies_from_output(local_res)[1]
+            except Exception:
+                local_pols = None
+        route = router.plan(text, available, local_pols,
+                            budget=ctx.timeout(reserve=_FINAL_RESERVE) if ctx else None)
+        active = route["providers"]
+        print(f"[extract] providers active={active} of {available} "
+              f"({route['reason']}, conf={route['confidence']}/{route['target']})")
+        futs = [asyncio.ensure_future(router.timed(n, timed_provider(n, calls[n](text)))) for n in active]
+        # 締め切りがあれば、後段（fuse/model）の分を残して打ち切る
+        done, pending = await asyncio.wait(futs, timeout=ctx.timeout(reserve=_FINAL_RESERVE) if ctx else None)
+        for f in pending:
+            f.cancel()
+        if pending and ctx is not None:
+            ctx.degrade("extract:timeout(" + ",".join(n for n, f in zip(active, futs) if f in pending) + ")")
+        results = [(f.exception() or f.result()) if f in done else asyncio.TimeoutError("deadline") for f in futs]
+    else:
+        print(f"[extract] providers active=[]")
+    results.append(local_res)
+    names = active + ["local"]
 
     valids=[]
-    for r in results:
+    for name, r in zip(names, results):
         if isinstance(r, Exception):
             print("[extract] provider error:", repr(r)); continue
         obj=r
         if isinstance(r,str):
-            try: obj=json.loads(r)
+            try: obj=loads_llm(r)
             except Exception as e: print("[extract] json parse fail:",e); continue
         try:
-            data_norm = _normalize_policies_schema(coerce_extract_output(obj))
-            if isinstance(data_norm.get("policies"), list): valids.append(data_norm)
+            obj, dropped = clean_extract_output(obj)
+        except SchemaError as e:
+            print(f"[extract] {name} schema invalid: {e}"); continue
+        if dropped:
+            print(f"[extract] {name} dropped {len(dropped)} invalid policies: {dropped[0]}")
+        try:
+            horizon, pols = policies_from_output(obj)
+            valids.append({"_model_name": name, "horizon_years": horizon, "policies": pols})
         except Exception as e:
             print("[extract] coerce/normalize fail:", e)
 
     if not valids:
         # 最低1件返す保険
-        fb = extract_policies_local(text)
-        if isinstance(fb,str):
-            try: fb=json.loads(fb)
-            except: fb={"policies":[]}
-        valids=[_normalize_policies_schema(coerce_extract_output(fb))]
-
-    merged = merge_outputs(valids) if 'merge_outputs' in globals() else valids[0]
-    print("[extract result]", json.dumps(merged, ensure_ascii=False))
-    # ★ ここで必ず dict {"policies":[...]} にそろえる
-if isinstance(merged, list):
-    merged = {"policies": merged}
-elif not isinstance(merged, dict):
-    merged = {"policies": []}
-
-print("[extract result]", json.dumps(merged, ensure_ascii=False))
-return merged
-    
-    # --- 4) ティア確定の直前にヒント補正を入れる（WB失敗時の安全網） ---
-    hint = _hint_tier_from_country(prof.get("display_name") or country_name)
-    if hint and (not prof.get("income_tier") or str(prof.get("income_tier")).lower() == "middle_income"):
-        # すでに high/low が確実なら触らない。middle または None のときだけ上書き
-        prof["income_tier"] = hint
-            
-
-def fuse_profile(wb, imf, fx, trade, overrides, country_name: str) -> dict:
+        try:
+            horizon, pols = policies_from_output(extract_policies_local(text))
+        except Exception:
+            horizon, pols = 5, []
+        valids=[{"_model_name": "local", "horizon_years": horizon, "policies": pols}]
+
+    with STAGE_SECONDS.time(stage="merge"):
+        merged = merge_outputs(valids, await offload.cluster(valids),
+                               weights=router.weights(names, available + ["local"]))
+    router.observe(active, valids, merged)
+    if any(v["_model_name"] != "local" for v in valids):
+        neardup.remember(text, merged["horizon_years"], merged["policies"])
+    if debug_enabled():
+        print("[extract result]", dumps(policies_to_struct(merged["policies"], merged["horizon_years"])))
+    return merged
+
+
+def fuse_profile(wb, imf, fx, trade, overrides, country_name: str, snap=None) -> dict:
     """
     各ソースをマージ → デフォルトで穴埋め → overrides 反映 →
     income_tier と tier_params を必ずセットして返す安全版。
+    snap はスナップショット（core.snapshot.lookup）の行。ライブの WB の直下の層として使う。
     """
     prof: dict = {}
 
@@ -246,8 +247,11 @@ def fuse_profile(wb, imf, fx, trade, overrides, country_name: str) -> dict:
     baseline_gdp_usd = None
     if isinstance(wb, dict):
         baseline_gdp_usd = wb.get("baseline_gdp_usd") or wb.get("gdp") or wb.get("ny_gdp_mktp_cd")
+    if baseline_gdp_usd is None and isinstance(snap, dict):
+        baseline_gdp_usd = snap.get("baseline_gdp_usd")
     if baseline_gdp_usd is None and isinstance(imf, dict):
         baseline_gdp_usd = imf.get("baseline_gdp_usd")
+    gdp_estimated = baseline_gdp_usd is None
     if baseline_gdp_usd is None:
         baseline_gdp_usd = 1.0e10
 
@@ -260,6 +264,34 @@ def fuse_profile(wb, imf, fx, trade, overrides, country_name: str) -> dict:
             if v is not None:
                 prof[k] = v
 
+    # --- 1a) スナップショット（生成時点の融合済みプロファイル）で WB の欠けを埋める ---
+    if isinstance(snap, dict):
+        used = False
+        for k, v in snap.items():
+            if k != "snapshot_version" and v is not None and prof.get(k) is None:
+                prof[k] = v
+                used = True
+        if used:
+            prof["snapshot_version"] = snap.get("snapshot_version")
+
+    # --- 1b) IMF WEO（ローカルのデータセット）で WB の欠けを埋める ---
+    if isinstance(imf, dict):
+        for k in ("iso3","baseline_gdp_usd","inflation_recent","investment_rate",
+                  "labor_growth","debt_to_gdp","gdp_per_capita","inflation_forecast"):
+            v = imf.get(k)
+            if v is not None and prof.get(k) is None:
+                prof[k] = v
+
+    # --- 1c) Comtrade（ローカルの集計済み指標）: 輸出の相手国・品目の集中度 ---
+    if isinstance(trade, dict) and trade:
+        for src, dst in (("partner_hhi", "trade_partner_hhi"), ("top_partner_share", "trade_top_partner_share"),
+                         ("sector_hhi", "export_sector_hhi"), ("trade_year", "trade_year")):
+            if trade.get(src) is not None:
+                prof[dst] = trade[src]
+        # WB の開放度が無いときは財貿易額/GDP で代用
+        if prof.get("openness_ratio") is None and not gdp_estimated and trade.get("exports_usd") and trade.get("imports_usd"):
+            prof["openness_ratio"] = (trade["exports_usd"] + trade["imports_usd"]) / float(baseline_gdp_usd)
+
     # --- 2) デフォルト穴埋め ---
     prof.setdefault("display_name", country_name)
     prof["baseline_gdp_usd"] = prof.get("baseline_gdp_usd", baseline_gdp_usd)
@@ -276,6 +308,8 @@ def fuse_profile(wb, imf, fx, trade, overrides, country_name: str) -> dict:
             prof["baseline_gdp_usd"] = overrides["baseline_gdp_usd"]
         elif overrides.get("baseline_gdp") is not None:
             prof["baseline_gdp_usd"] = overrides["baseline_gdp"]
+        if overrides.get("baseline_gdp_usd") is not None or overrides.get("baseline_gdp") is not None:
+            gdp_estimated = False
         for k, v in overrides.items():
             if k in ("baseline_gdp","baseline_gdp_usd"):
                 continue
@@ -304,30 +338,74 @@ def fuse_profile(wb, imf, fx, trade, overrides, country_name: str) -> dict:
     tier_name = _normalize_tier(tier_name)
     prof["income_tier"] = tier_name
     prof["tier_params"] = get_tier_params(tier_name)
+
+    # --- 5) 通貨と為替表（通貨建ての政策規模を %GDP に換算するため） ---
+    if gdp_estimated:
+        # GDP が既定値のときは金額 → %GDP の換算をしない（モデルは規模不明として扱う）
+        prof["baseline_gdp_estimated"] = True
+    if not prof.get("currency"):
+        iso3 = prof.get("iso3")
+        if not iso3:
+            from providers.data_worldbank import ISO3_FALLBACK
+            iso3 = ISO3_FALLBACK.get(_clean_country_name(country_name).lower())
+        prof["currency"] = fx_tables.currency_for(iso3)
+    prof["fx"] = fx if isinstance(fx, fx_tables.FxTable) else fx_tables.current()
     return prof
 
 
 
 
+async def _fetch_wb_cached(country_name: str):
+    """World Bank プロファイル（1日キャッシュ。ヒットすればネットワークに出ない）"""
+    cache = get_cache("wb")
+    key = cache_key("wb", _clean_country_name(country_name))
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    from providers.data_worldbank import fetch_country_profile as fetch_wb_profile
+    wb = await timed_stage("wb_fetch", timed_provider("worldbank", _run_sync(fetch_wb_profile, country_name)))
+    if wb:
+        cache.set(key, wb, ttl=WB_CACHE_TTL)
+    return wb
+
+
 async def build_country_profile(country_name: str, overrides: dict):
-    # 取得（wb=同期→to_thread、他はasync）
-    wb, imf, fx, trade = await asyncio.gather(
-        _run_sync(fetch_wb_profile, country_name),
-        fetch_imf_profile(country_name),
-        fetch_fx(country_name),
-        fetch_comtrade(country_name),
-        return_exceptions=True
-    )
-
-    # 例外を None に
-    def _ok(x):
-        return None if isinstance(x, Exception) else x
-    wb, imf, fx, trade = (_ok(wb), _ok(imf), _ok(fx), _ok(trade))
+    # 取得（wb=同期→to_thread、他はasync）。締め切りがあれば間に合わなかったソースは None
+    from providers.data_imf import fetch_imf_profile
+    from providers.data_comtrade import fetch_comtrade
+    names = ("worldbank", "imf", "fx", "comtrade")
+    from . import snapshot
+    snap = snapshot.lookup(country_name)   # mmap の参照だけ（ネットワークに出ない）
+    futs = [
+        asyncio.ensure_future(_fetch_wb_cached(country_name)),
+        asyncio.ensure_future(fetch_imf_profile(country_name)),
+        asyncio.ensure_future(fx_tables.get_table()),   # 共有の為替表（更新間隔ごとに1回だけ取得）
+        asyncio.ensure_future(fetch_comtrade(country_name)),
+    ]
+    ctx = current_context()
+    timeout = ctx.timeout(reserve=_FINAL_RESERVE) if ctx else None
+    if snap is not None:
+        # スナップショットがあれば遅いソースは短時間だけ待つ
+        timeout = snapshot.SNAPSHOT_LIVE_WAIT if timeout is None else min(timeout, snapshot.SNAPSHOT_LIVE_WAIT)
+    done, pending = await asyncio.wait(futs, timeout=timeout)
+    for f in pending:
+        # スナップショットで代替できた WB は裏で取得を続けてキャッシュに載せる
+        if not (snap is not None and f is futs[0]):
+            f.cancel()
+    timed_out = [n for n, f in zip(names, futs) if f in pending and not (snap is not None and n == "worldbank")]
+    if timed_out and ctx is not None:
+        ctx.degrade("profile:timeout(" + ",".join(timed_out) + ")")
+
+    # 例外・未完了を None に
+    def _ok(f):
+        return None if f not in done or f.exception() is not None else f.result()
+    wb, imf, fx, trade = (_ok(f) for f in futs)
 
     # まずは既存のマージロジックを試す
     prof = None
     try:
-        prof = fuse_profile(wb, imf, fx, trade, overrides, country_name)
+        with STAGE_SECONDS.time(stage="fuse"):
+            prof = fuse_profile(wb, imf, fx, trade, overrides, country_name, snap=snap)
     except Exception:
         prof = None
 
@@ -353,55 +431,83 @@ async def build_country_profile(country_name: str, overrides: dict):
     prof = prof or {}
     prof["income_tier"] = _normalize_tier(prof.get("income_tier"))
     prof["tier_params"] = get_tier_params(prof["income_tier"])
+    prof.setdefault("fx", fx_tables.current())
     return prof
  
 
-async def run_pipeline(country: str|None, horizon: int, text: str, overrides: dict):
+async def run_pipeline(country: str|None, horizon: int, text: str, overrides: dict, progress=None,
+                       deadline: float | None = None, executor=None):
+    """progress: 任意のコールバック progress(event, data)。段の完了ごとに呼ぶ（JSON API のストリーム用）
+    deadline: 秒。指定するとこの時間内に（必要なら劣化した）結果を返す。呼び出し側の
+    request_context があればそちらの締め切りも守る
+    executor: 指定するとモデル計算を必ずそこで実行。省略時は大きい入力だけ core.offload のプールへ"""
+    with INFLIGHT.track(kind="pipeline"), STAGE_SECONDS.time(stage="pipeline"):
+        if deadline is None:
+            return await _run_pipeline(country, horizon, text, overrides, progress, executor)
+        with request_context(deadline):
+            return await _run_pipeline(country, horizon, text, overrides, progress, executor)
+
+
+async def _run_pipeline(country: str|None, horizon: int, text: str, overrides: dict, progress=None, executor=None):
     horizon = max(1, min(10, horizon))
-    policies_struct = await extract_policies(text)
-    raw = await extract_policies(text)
-
-# ★ 戻り値の正規化：dict/str/list 何が来ても dict{"policies": [...]} にする
-if isinstance(raw, dict):
-    policies_struct = raw
-elif isinstance(raw, list):
-    policies_struct = {"policies": raw}
-elif isinstance(raw, str):
+    t0 = time.perf_counter()
+    timings = {}
+    # 抽出とプロファイル取得は独立なので並行に走らせる
+    profile_task = asyncio.ensure_future(timed_stage("profile", build_country_profile(country, overrides)))
     try:
-        obj = json.loads(raw)
-        policies_struct = obj if isinstance(obj, dict) else {"policies": (obj or [])}
-    except Exception:
-        policies_struct = {"policies": []}
-else:
-    policies_struct = {"policies": []}
-
-items = policies_struct.get("policies") or []
+        extracted = await timed_stage("extract", extract_policies(text))
+    except BaseException:
+        profile_task.cancel()
+        raise
+    timings["extract"] = time.perf_counter() - t0
+    policies = extracted.get("policies") or []
+    extra = {}
 
     # ★ ここが肝：抽出0件ならダミー政策を必ず注入して数値が動くか確認
-    items = (policies_struct or {}).get("policies") or []
-    if not items:
-        policies_struct = {
-            "policies":[
-                {"title":"インフラ投資", "lever":["infrastructure"], "lag_years":1,
-                 "scale":{"value":10, "unit":"trillion_yen_per_year"}},
-                {"title":"規制改革", "lever":["regulation"], "lag_years":0, "scale":None}
-            ],
-            "_debug":"fallback_injected"
-        }
-
-    profile  = await build_country_profile(country, overrides)
-
-    # ★ model は policies_struct["policies"] を渡すこと
+    if not policies:
+        policies = [
+            Policy.from_dict({"title":"インフラ投資", "lever":["infrastructure"], "lag_years":1,
+                              "scale":{"value":10, "unit":"trillion_yen_per_year"}}),
+            Policy.from_dict({"title":"規制改革", "lever":["regulation"], "lag_years":0, "scale":None}),
+        ]
+        extra["_debug"] = "fallback_injected"
+
+    if progress:
+        progress("policies", policies_to_struct(policies, **extra))
+
+    profile  = await profile_task
+    timings["profile"] = time.perf_counter() - t0
+    if progress:
+        progress("profile", {k: v for k, v in profile.items() if k not in ("tier_params", "fx")})
+
+    # ★ model は {"policies": [Policy, ...]} を渡すこと
     from core.model import forecast as model_forecast
-    scenarios, cpi_path, explain = model_forecast(profile, policies_struct.get("policies", []), horizon)
-    explain = (explain or "") + f"\n[PoliciesUsed] {json.dumps(policies_struct, ensure_ascii=False)}"
-    explain += f"\n[ProfileResolved] {json.dumps(profile, ensure_ascii=False)}"
+    t_model = time.perf_counter()
+    with STAGE_SECONDS.time(stage="model"):
+        if executor is None:
+            from . import offload
+            scenarios, cpi_path, model_explain = await offload.forecast(profile, policies, horizon)
+        else:
+            scenarios, cpi_path, model_explain = await asyncio.get_running_loop().run_in_executor(
+                executor, model_forecast, profile, {"policies": policies}, horizon)
+    timings["model"] = time.perf_counter() - t_model
+    # explain は構造化レコードのまま保持（文字列化は /explain 時のみ）
+    explain = make_explain_record(model_explain, profile, horizon)
+    explain["id"] = run_id = uuid.uuid4().hex[:16]
+    ctx = current_context()
+    degraded = list(ctx.degraded) if ctx is not None else []
+    if degraded:
+        explain["degraded"] = degraded
 
     return {
+        "id": run_id,
+        "degraded": degraded,
         "scenarios": scenarios,
         "cpi": cpi_path,
         "explain": explain,
         "profile_used": profile,
-        "policies_struct": policies_struct
+        "policies_struct": policies_to_struct(policies, **extra),
+        "policies": policies,
+        # 段ごとの所要秒（extract/profile は開始からの経過。並行に走るため）
+        "timings": {k: round(v, 4) for k, v in {**timings, "total": time.perf_counter() - t0}.items()},
     }
-
@@ -0,0 +1,292 @@
+# core/policy.py
+"""
+抽出 → 合議 → モデル で共通に使う政策レコード。
+
+プロバイダ出力（dict / JSON）は取り込み時に一度だけ Policy へ変換し、以降の段では
+再パースしない。
+- lever   : Lever のビットマスク（正規化済み。ビット位置は core/tiers.LEVERS と共通）
+- scale   : 数値（基本単位に換算済み）+ 単位コード（Unit）+ 通貨コード（Unit.CCY のとき）
+- confidence : S..D → 4..0（不明は -1）
+"""
+import enum
+import math
+import re
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .tiers import LEVERS
+from .utils import normalize_title
+
+
+class Lever(enum.IntFlag):
+    LOGISTICS = 1 << 0
+    AUTOMATION = 1 << 1
+    EDUCATION = 1 << 2
+    REGULATION = 1 << 3
+    GOVERNANCE = 1 << 4
+    ENERGY = 1 << 5
+    INFRASTRUCTURE = 1 << 6
+    TRADE = 1 << 7
+    INDUSTRY = 1 << 8
+    FINANCE = 1 << 9
+    SECURITY = 1 << 10
+
+
+assert [m.name.lower() for m in Lever] == list(LEVERS)
+
+LEVER_BITS: Dict[str, int] = {name: 1 << i for i, name in enumerate(LEVERS)}
+
+
+# --- lever を英語カテゴリへ正規化（日本語にも対応）---
+@lru_cache(maxsize=4096)
+def _normalize_lever_token(s: str) -> str:
+    if not s: return ""
+    t=str(s).strip().lower()
+    if any(k in t for k in ["インフラ","infrastructure","infra","port","rail","grid","logistics","港","港湾","鉄道","送電","電力","物流","ロジ"]): return "infrastructure"
+    if any(k in t for k in ["教育","人材","職業訓練","リスキリング","education","human capital","reskilling"]): return "education"
+    if any(k in t for k in ["規制","規制改革","ガバナンス","手続","ビジネス","regulation","deregulation","governance","business"]): return "regulation"
+    if any(k in t for k in ["半導体","製造","産業","税","減税","税額控除","補助","補助金","industry","semiconductor","manufacturing","tax","subsidy"]): return "industry"
+    if any(k in t for k in ["貿易","通商","輸出","輸入","fta","trade"]): return "trade"
+    return t
+
+
+def lever_mask(tokens: Any) -> int:
+    """lever 配列（文字列・表記ゆれ可）→ ビットマスク。未知カテゴリは捨てる"""
+    if not tokens:
+        return 0
+    if not isinstance(tokens, (list, tuple)):
+        tokens = [tokens]
+    mask = 0
+    for x in tokens[:5]:
+        if x:
+            mask |= LEVER_BITS.get(_normalize_lever_token(str(x)), 0)
+    return mask
+
+
+def lever_names(mask: int) -> List[str]:
+    return [name for i, name in enumerate(LEVERS) if mask >> i & 1]
+
+
+def iter_lever_indices(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# ---- 規模の単位 ----
+class Unit(enum.IntEnum):
+    NONE = 0       # 規模なし
+    PCT_GDP = 1    # %GDP
+    USD = 2        # 米ドル（基本単位）
+    LCU = 3        # 自国通貨（基本単位）
+    CCY = 4        # その他通貨（currency に ISO4217、基本単位）
+    QTY = 5
+    PERCENT = 6    # 率（%GDP ではない）
+    UNKNOWN = 7
+
+
+UNIT_LABEL = {Unit.PCT_GDP: "%GDP", Unit.USD: "USD", Unit.LCU: "LCU", Unit.QTY: "qty",
+              Unit.PERCENT: "percent", Unit.UNKNOWN: "unknown"}
+
+# merge 時にどの規模表現を優先するか
+UNIT_PRIORITY = {Unit.PCT_GDP: 3, Unit.USD: 2, Unit.LCU: 1, Unit.CCY: 1, Unit.QTY: 0,
+                 Unit.PERCENT: -1, Unit.UNKNOWN: -1}
+
+_MAGNITUDE = (("trillion", 1e12), ("兆", 1e12), ("billion", 1e9), ("bn", 1e9), ("million", 1e6),
+              ("mn", 1e6), ("億", 1e8), ("thousand", 1e3), ("万", 1e4))
+_CCY_WORDS = (("yen", "JPY"), ("円", "JPY"), ("euro", "EUR"), ("€", "EUR"), ("yuan", "CNY"), ("rmb", "CNY"),
+              ("元", "CNY"), ("won", "KRW"), ("rupee", "INR"), ("dong", "VND"), ("pound", "GBP"),
+              ("dollar", "USD"), ("$", "USD"))
+_ISO_CCY = re.compile(r"(?<![a-z])([a-z]{3})(?![a-z])")
+
+
+@lru_cache(maxsize=1024)
+def parse_unit(unit: str) -> Tuple[int, float, Optional[str]]:
+    """単位文字列 → (Unit, 倍率, 通貨コード)"""
+    u = str(unit).strip().lower()
+    if not u:
+        return Unit.NONE, 1.0, None
+    if "gdp" in u and ("%" in u or "pct" in u or "percent" in u or "share" in u):
+        return Unit.PCT_GDP, 1.0, None
+    if u in ("percent", "%", "％", "pct"):
+        return Unit.PERCENT, 1.0, None
+    if u in ("qty", "quantity", "count"):
+        return Unit.QTY, 1.0, None
+    if u == "unknown":
+        return Unit.UNKNOWN, 1.0, None
+    mult = 1.0
+    for word, m in _MAGNITUDE:
+        if word in u:
+            mult = m
+            break
+    if "lcu" in u or "local" in u:
+        return Unit.LCU, mult, None
+    ccy = None
+    for word, code in _CCY_WORDS:
+        if word in u:
+            ccy = code
+            break
+    if ccy is None:
+        for m in _ISO_CCY.finditer(u):
+            if m.group(1) not in ("per", "bn", "mn"):
+                ccy = m.group(1).upper()
+                break
+    if ccy == "USD":
+        return Unit.USD, mult, None
+    if ccy:
+        return Unit.CCY, mult, ccy
+    return Unit.UNKNOWN, 1.0, None
+
+
+def parse_scale(scale: Any) -> Tuple[Optional[float], int, Optional[str]]:
+    """scale dict → (基本単位の値, Unit, 通貨)"""
+    if not isinstance(scale, dict) or scale.get("unit") is None:
+        return None, Unit.NONE, None
+    unit, mult, ccy = parse_unit(scale.get("unit"))
+    try:
+        val = float(scale.get("value", 0) or 0)
+    except (TypeError, ValueError):
+        val = 0.0
+    return val * mult, unit, ccy
+
+
+# ---- 確信度 ----
+CONF_LEVELS = ("D", "C", "B", "A", "S")
+CONF_CODE = {c: i for i, c in enumerate(CONF_LEVELS)}
+CONF_UNKNOWN = -1
+CONF_DEFAULT = CONF_CODE["B"]
+
+
+def conf_code(c: Any) -> int:
+    if c is None:
+        return CONF_DEFAULT
+    return CONF_CODE.get(str(c)[:1], CONF_UNKNOWN)
+
+
+def conf_label(code: int) -> str:
+    return CONF_LEVELS[code] if 0 <= code < len(CONF_LEVELS) else "?"
+
+
+class Policy:
+    __slots__ = ("title", "levers", "direction", "lag", "scale_value", "scale_unit", "currency",
+                 "confidence", "title_key")
+
+    def __init__(self, title: str, levers: int = 0, direction: Tuple[str, ...] = (), lag: Optional[int] = None,
+                 scale_value: Optional[float] = None, scale_unit: int = Unit.NONE, currency: Optional[str] = None,
+                 confidence: int = CONF_DEFAULT, title_key: Optional[str] = None):
+        self.title = title
+        self.levers = levers
+        self.direction = direction
+        self.lag = lag
+        self.scale_value = scale_value
+        self.scale_unit = scale_unit
+        self.currency = currency
+        self.confidence = confidence
+        # クラスタリング用の正規化タイトル（トークンをソートして連結）
+        self.title_key = title_key if title_key is not None else " ".join(sorted(normalize_title(title).split()))
+
+    def __reduce__(self):
+        return (Policy, tuple(getattr(self, k) for k in self.__slots__))
+
+    def __repr__(self):
+        return f"Policy({self.title!r}, levers={lever_names(self.levers)}, lag={self.lag})"
+
+    @classmethod
+    def from_dict(cls, p: Dict[str, Any]) -> "Policy":
+        lag = p.get("lag_years")
+        val, unit, ccy = parse_scale(p.get("scale"))
+        return cls(
+            title=str(p.get("title", ""))[:256] or "(untitled)",
+            levers=lever_mask(p.get("lever")),
+            direction=tuple(str(x) for x in (p.get("direction") or [])[:5]),
+            lag=None if lag is None else int(lag),
+            scale_value=val,
+            scale_unit=unit,
+            currency=ccy,
+            confidence=conf_code(p.get("confidence", "B")),
+        )
+
+    def scale_dict(self) -> Optional[Dict[str, Any]]:
+        if self.scale_unit == Unit.NONE:
+            return None
+        label = self.currency if self.scale_unit == Unit.CCY else UNIT_LABEL.get(self.scale_unit, "unknown")
+        return {"value": self.scale_value, "unit": label}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """表示・JSON 出力用（旧 dict 形式）"""
+        return {
+            "title": self.title,
+            "lever": lever_names(self.levers),
+            "direction": list(self.direction),
+            "lag_years": self.lag,
+            "scale": self.scale_dict(),
+            "confidence": conf_label(self.confidence),
+        }
+
+
+def policies_from_output(obj: Any) -> Tuple[int, List[Policy]]:
+    """プロバイダ出力（dict）→ (horizon_years, [Policy])"""
+    if not isinstance(obj, dict):
+        return 5, []
+    try:
+        horizon = int(obj.get("horizon_years", 5))
+    except (TypeError, ValueError):
+        horizon = 5
+    out: List[Policy] = []
+    for p in obj.get("policies") or []:
+        if isinstance(p, dict):
+            out.append(Policy.from_dict(p))
+    return horizon, out
+
+
+def policies_to_struct(policies: List[Policy], horizon: int | None = None, **extra) -> Dict[str, Any]:
+    st: Dict[str, Any] = {"policies": [p.to_dict() for p in policies]}
+    if horizon is not None:
+        st["horizon_years"] = horizon
+    st.update(extra)
+    return st
+
+
+class PolicyBatch:
+    """Policy の列指向表現（モデルのベクトル化パス・プロセス間受け渡し用）"""
+    __slots__ = ("titles", "levers", "lags", "scale_values", "scale_units", "currencies", "confidences")
+
+    def __init__(self, titles, levers, lags, scale_values, scale_units, currencies, confidences):
+        self.titles = titles
+        self.levers = levers              # array('Q')
+        self.lags = lags                  # array('b')  -1 = None
+        self.scale_values = scale_values  # array('d')  NaN = None
+        self.scale_units = scale_units    # array('B')
+        self.currencies = currencies      # list[str|None]
+        self.confidences = confidences    # array('b')
+
+    def __len__(self):
+        return len(self.levers)
+
+    def __reduce__(self):
+        return (PolicyBatch, tuple(getattr(self, k) for k in self.__slots__))
+
+    @classmethod
+    def from_policies(cls, pols: List[Policy]) -> "PolicyBatch":
+        nan = math.nan
+        return cls(
+            [p.title for p in pols],
+            array("Q", [p.levers for p in pols]),
+            array("b", [-1 if p.lag is None else max(-128, min(127, p.lag)) for p in pols]),
+            array("d", [nan if p.scale_value is None else p.scale_value for p in pols]),
+            array("B", [int(p.scale_unit) for p in pols]),
+            [p.currency for p in pols],
+            array("b", [p.confidence for p in pols]),
+        )
+
+    def to_policies(self) -> List[Policy]:
+        out = []
+        for i in range(len(self)):
+            v = self.scale_values[i]
+            out.append(Policy(
+                self.titles[i], self.levers[i], (), None if self.lags[i] < 0 else self.lags[i],
+                None if math.isnan(v) else v, self.scale_units[i], self.currencies[i], self.confidences[i],
+            ))
+        return out
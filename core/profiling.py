@@ -0,0 +1,249 @@
+# core/profiling.py
+"""
+1回の run_pipeline を対象にしたオンデマンドのプロファイリング。
+
+- サンプリングプロファイラ：別スレッドが一定間隔で sys._current_frames() を読み、
+  全スレッド（イベントループ・to_thread のワーカー）のスタックを数える。
+  出力は collapsed stack 形式（"スレッド;関数;関数... 件数"）。flamegraph.pl / speedscope にそのまま渡せる
+- イベントループ遅延：短い sleep の寝過ごし量を測る（ループを塞ぐ同期処理の検出）
+- tracemalloc：開始時と終了時のスナップショット差分（行単位の確保量上位）
+
+ProfileSession を作らない限り何も起動しない（無効時のオーバーヘッドはゼロ）。
+サンプルはプロセス全体なので、同時に走っている他のリクエストも混ざる点に注意。
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Awaitable, Dict, List, Optional
+
+DEFAULT_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "profiles"),
+)
+
+
+def env_enabled() -> bool:
+    """FORECAST_PROFILE=1 なら全 /forecast をプロファイルする（調査時だけ使う）"""
+    return os.getenv("FORECAST_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+# 待機中のスレッド（スレッドプールの空きワーカー・監視スレッドの sleep）はスタックに数えない
+_IDLE_LEAVES = ("_worker (thread.py:", "wait (threading.py:", "_watch_loop (tiers.py:", "_flush_loop (state.py:")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_depth: int = 64):
+        self.interval = max(0.001, float(interval))
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                parts: List[str] = []
+                f = frame
+                while f is not None and len(parts) < self.max_depth:
+                    parts.append(_frame_label(f.f_code))
+                    f = f.f_back
+                if parts and parts[0].startswith(_IDLE_LEAVES):
+                    self.idle += 1
+                    continue
+                parts.append(names.get(tid, f"thread-{tid}"))
+                self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + "\n"
+
+    def top(self, n: int = 15) -> List[Dict[str, Any]]:
+        """関数ごとの self（先頭にいた回数）と total（スタック中にいた回数）"""
+        self_c: Counter = Counter()
+        total_c: Counter = Counter()
+        for stack, cnt in self.stacks.items():
+            frames = stack.split(";")[1:]   # 先頭はスレッド名
+            if not frames:
+                continue
+            self_c[frames[-1]] += cnt
+            for fr in set(frames):
+                total_c[fr] += cnt
+        denom = max(1, sum(self.stacks.values()))
+        return [{"frame": fr, "self_pct": round(100.0 * c / denom, 1),
+                 "total_pct": round(100.0 * total_c[fr] / denom, 1)} for fr, c in self_c.most_common(n)]
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - t0 - self.interval))
+
+    def summary(self) -> Dict[str, float]:
+        xs = sorted(self.lags)
+        if not xs:
+            return {"max_ms": 0.0, "p95_ms": 0.0, "blocked_ms": 0.0}
+        return {
+            "max_ms": round(xs[-1] * 1000, 2),
+            "p95_ms": round(xs[min(len(xs) - 1, int(0.95 * len(xs)))] * 1000, 2),
+            # 10ms を超えた寝過ごしの合計 ≒ ループが塞がれていた時間
+            "blocked_ms": round(sum(x for x in xs if x > 0.01) * 1000, 2),
+        }
+
+
+# tracemalloc はプロセスに1つ。同時に走るセッションの数を数え、最後のセッションが抜けたときだけ止める
+_tm_lock = threading.Lock()
+_tm_users = 0
+_tm_ours = False   # 最初のセッションが start したか（外から有効にされていたら止めない）
+
+
+def _tracemalloc_acquire():
+    global _tm_users, _tm_ours
+    with _tm_lock:
+        if _tm_users == 0:
+            _tm_ours = not tracemalloc.is_tracing()
+            if _tm_ours:
+                tracemalloc.start(8)
+        _tm_users += 1
+
+
+def _tracemalloc_release():
+    global _tm_users
+    with _tm_lock:
+        _tm_users -= 1
+        if _tm_users == 0 and _tm_ours:
+            tracemalloc.stop()
+
+
+class ProfileSession:
+    """async with で囲んだ区間をプロファイルする（run(aw) は1つの awaitable を囲む簡易版）"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, trace_malloc: bool = True, malloc_top: int = 10):
+        self.sampler = SamplingProfiler(interval)
+        self.lag = LoopLagMonitor()
+        self.trace_malloc = trace_malloc
+        self.malloc_top = malloc_top
+        self._tracing = False
+        self._snap0 = None
+        self.alloc: List[Dict[str, Any]] = []
+        self.wall = 0.0
+        self._t0 = 0.0
+
+    async def __aenter__(self):
+        if self.trace_malloc:
+            _tracemalloc_acquire()
+            self._tracing = True
+            try:
+                self._snap0 = tracemalloc.take_snapshot()
+            except Exception as e:
+                print("[profile] tracemalloc snapshot failed:", repr(e))
+        self.lag.start()
+        self.sampler.start()
+        self._t0 = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.wall = time.perf_counter() - self._t0
+        self.sampler.stop()
+        await self.lag.stop()
+        try:
+            if self._snap0 is not None:
+                snap1 = tracemalloc.take_snapshot()
+                flt = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+                diff = snap1.filter_traces(flt).compare_to(self._snap0.filter_traces(flt), "lineno")
+                self.alloc = [{"where": f"{os.path.basename(d.traceback[0].filename)}:{d.traceback[0].lineno}",
+                               "size_kb": round(d.size_diff / 1024, 1), "count": d.count_diff}
+                              for d in diff[:self.malloc_top]]
+        except Exception as e:
+            # 確保量の集計はおまけ。失敗してもプロファイル対象の処理の結果は返す
+            print("[profile] tracemalloc diff failed:", repr(e))
+        finally:
+            self._snap0 = None
+            if self._tracing:
+                self._tracing = False
+                _tracemalloc_release()
+        return False
+
+    async def run(self, aw: Awaitable[Any]) -> Any:
+        async with self:
+            return await aw
+
+    # ---- 出力 ----
+    def collapsed(self) -> str:
+        return self.sampler.collapsed()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "wall_s": round(self.wall, 3),
+            "samples": self.sampler.samples,
+            "interval_ms": round(self.sampler.interval * 1000, 2),
+            "loop_lag": self.lag.summary(),
+            "top": self.sampler.top(),
+            "alloc": self.alloc,
+        }
+
+    def summary_text(self) -> str:
+        s = self.summary()
+        lag = s["loop_lag"]
+        lines = [f"wall={s['wall_s']}s samples={s['samples']} interval={s['interval_ms']}ms",
+                 f"loop lag: max={lag['max_ms']}ms p95={lag['p95_ms']}ms blocked={lag['blocked_ms']}ms",
+                 "", "self%  total%  frame"]
+        for t in s["top"]:
+            lines.append(f"{t['self_pct']:>5}  {t['total_pct']:>6}  {t['frame']}")
+        if s["alloc"]:
+            lines += ["", "alloc diff (KB)  count  where"]
+            for a in s["alloc"]:
+                lines.append(f"{a['size_kb']:>15}  {a['count']:>5}  {a['where']}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, name: str, directory: str = PROFILE_DIR) -> str:
+        """collapsed stack と要約をファイルに保存し、collapsed のパスを返す"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(self.summary_text())
+        return path
@@ -0,0 +1,229 @@
+# core/router.py
+"""
+抽出プロバイダのルーティング。プロバイダごとに直近の成績を持ち、リクエストごとに
+「締め切り内に目標の確からしさへ届く、いちばん安い組み合わせ」だけを呼ぶ。
+
+- 成績（直近 ROUTER_WINDOW 回、既定 200）
+    遅延     p50 / p90（締め切りで打ち切られた呼び出しは打ち切りまでの時間で数える）
+    失敗率   例外・タイムアウト・スキーマ不正・JSON 不正
+    一致率   合議（2つ以上のプロバイダが出したクラスタ）との一致。そのプロバイダの政策のうち
+             合議に入った割合（適合率）と、合議のうちそのプロバイダも出していた割合（再現率）の
+             調和平均。LLM が2つ以上答えたときだけ記録する
+- 確からしさ: 1 - Π(1 - q)、q = (1 - 失敗率) × 一致率。観測が少ないうちは事前値に寄せる
+  （事前値だけなら全プロバイダを呼ぶ＝従来どおり）
+- 目標: 短く曖昧さの少ないテキストは ROUTER_TARGET_EASY（既定 0.8）、長い・曖昧なテキストは
+  ROUTER_TARGET（既定 0.9）。曖昧さはテキスト長（ROUTER_LONG_CHARS、既定 1200）と、
+  先に走らせたローカル抽出の政策数（0件、または ROUTER_MANY_POLICIES 件以上）で判断する
+- コストは ROUTER_COST_<NAME>（既定 openai 1.0 / gemini 0.4）。p90 が残り時間を超えるプロバイダは使わない
+- ROUTER_EXPLORE（既定 0.05）の割合で全プロバイダを呼び、使われないプロバイダの成績も更新する
+- 学習した重み（BASE_WEIGHTS × 一致率の事前値比）を merge_outputs に渡す。呼んだ組み合わせの重みの合計が
+  全プロバイダを呼んだときの合計と等しくなるよう正規化する（少数で呼んだとき1票が軽くなりすぎない）
+- ROUTER=off で常に全プロバイダを呼び、重みも BASE_WEIGHTS のまま
+"""
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from .ensemble import BASE_WEIGHTS
+from .metrics import Counter, Gauge
+
+ENABLED = os.getenv("ROUTER", "on").lower() not in ("0", "off", "false", "no")
+WINDOW = int(os.getenv("ROUTER_WINDOW", "200"))
+TARGET = float(os.getenv("ROUTER_TARGET", "0.9"))
+TARGET_EASY = float(os.getenv("ROUTER_TARGET_EASY", "0.8"))
+LONG_CHARS = int(os.getenv("ROUTER_LONG_CHARS", "1200"))
+MANY_POLICIES = int(os.getenv("ROUTER_MANY_POLICIES", "4"))
+EXPLORE = float(os.getenv("ROUTER_EXPLORE", "0.05"))
+
+_DEFAULT_COST = {"openai": 1.0, "gemini": 0.4, "claude": 1.0, "local": 0.0}
+
+# 事前値（擬似観測数つき）
+_PRIOR_OK, _PRIOR_OK_N = 0.95, 10
+_PRIOR_AGREE = {"local": 0.4}
+_PRIOR_AGREE_DEFAULT, _PRIOR_AGREE_N = 0.6, 20
+# 学習した重みの倍率の範囲（BASE_WEIGHTS に対して）
+_WEIGHT_MIN, _WEIGHT_MAX = 0.5, 1.5
+
+ROUTER_PICKS = Counter("gdpbot_router_picks_total", "Provider subsets chosen by the extraction router")
+
+
+def _cost(name: str) -> float:
+    v = os.getenv(f"ROUTER_COST_{name.upper()}")
+    return float(v) if v else _DEFAULT_COST.get(name, 1.0)
+
+
+class _Stats:
+    __slots__ = ("latency", "ok", "agree")
+
+    def __init__(self):
+        self.latency: deque = deque(maxlen=WINDOW)
+        self.ok: deque = deque(maxlen=WINDOW)
+        self.agree: deque = deque(maxlen=WINDOW)
+
+    def pct(self, q: float) -> Optional[float]:
+        if not self.latency:
+            return None
+        xs = sorted(self.latency)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def ok_rate(self) -> float:
+        return (sum(self.ok) + _PRIOR_OK * _PRIOR_OK_N) / (len(self.ok) + _PRIOR_OK_N)
+
+    def agreement(self, name: str) -> float:
+        prior = _PRIOR_AGREE.get(name, _PRIOR_AGREE_DEFAULT)
+        return (sum(self.agree) + prior * _PRIOR_AGREE_N) / (len(self.agree) + _PRIOR_AGREE_N)
+
+
+_stats: Dict[str, _Stats] = {}
+_lock = threading.Lock()
+
+
+def _get(name: str) -> _Stats:
+    st = _stats.get(name)
+    if st is None:
+        with _lock:
+            st = _stats.setdefault(name, _Stats())
+    return st
+
+
+# ---- 観測 ----
+
+async def timed(name: str, aw):
+    """プロバイダ呼び出しの遅延を記録する（キャンセル＝打ち切りも経過時間で数える）"""
+    t0 = time.monotonic()
+    try:
+        return await aw
+    finally:
+        _get(name).latency.append(time.monotonic() - t0)
+
+
+def observe(called: Sequence[str], valids: List[Dict[str, Any]], merged: Dict[str, Any]):
+    """1回の抽出の結果を記録する。called は呼んだ LLM（local は常に呼ぶので含めなくてよい）"""
+    by_name = {v["_model_name"]: v for v in valids}
+    for name in list(called) + ["local"]:
+        _get(name).ok.append(1 if name in by_name else 0)
+    if sum(1 for n in by_name if n != "local") < 2:
+        return   # 合議と呼べるほどの相手がいない（自分の出力＝合議になる）
+    consensus = [cl for cl in merged.get("clusters") or [] if len(set(cl)) >= 2]
+    for name, out in by_name.items():
+        n_out = len(out.get("policies") or [])
+        if not n_out and not consensus:
+            continue
+        hits = sum(cl.count(name) for cl in consensus)
+        covered = sum(1 for cl in consensus if name in cl)
+        p = hits / n_out if n_out else 0.0
+        r = covered / len(consensus) if consensus else 0.0
+        _get(name).agree.append(2 * p * r / (p + r) if p + r else 0.0)
+
+
+# ---- 選択 ----
+
+def _quality(name: str) -> float:
+    st = _get(name)
+    return st.ok_rate() * st.agreement(name)
+
+
+def _confidence(names: Sequence[str]) -> float:
+    miss = 1.0
+    for n in list(names) + ["local"]:
+        miss *= 1.0 - _quality(n)
+    return 1.0 - miss
+
+
+def is_hard(text: str, local_policies: Optional[list]) -> bool:
+    if len(text or "") >= LONG_CHARS:
+        return True
+    n = len(local_policies or [])
+    return n == 0 or n >= MANY_POLICIES
+
+
+def plan(text: str, available: Sequence[str], local_policies: Optional[list] = None,
+         budget: Optional[float] = None) -> Dict[str, Any]:
+    """呼ぶ LLM の組み合わせを決める。budget は LLM に使える残り秒数（None なら制限なし）
+    戻り値: {"providers": [...], "target": float, "confidence": float, "reason": str}"""
+    available = list(available)
+    hard = is_hard(text, local_policies)
+    target = TARGET if hard else TARGET_EASY
+    if not ENABLED or len(available) <= 1:
+        return {"providers": available, "target": target, "confidence": round(_confidence(available), 3),
+                "reason": "all"}
+    if EXPLORE > 0 and random.random() < EXPLORE:
+        ROUTER_PICKS.inc(subset="+".join(available), reason="explore")
+        return {"providers": available, "target": target, "confidence": round(_confidence(available), 3),
+                "reason": "explore"}
+
+    def fits(n: str) -> bool:
+        p90 = _get(n).pct(0.9)
+        return budget is None or p90 is None or p90 <= budget
+    usable = [n for n in available if fits(n)]
+    if not usable:
+        # どれも間に合いそうにない：いちばん速いものだけ
+        usable = [min(available, key=lambda n: _get(n).pct(0.5) or 0.0)]
+        reason = "fastest"
+    else:
+        reason = "cheapest"
+
+    best = None
+    for k in range(1, len(usable) + 1):
+        for combo in itertools.combinations(usable, k):
+            conf = _confidence(combo)
+            if conf < target:
+                continue
+            key = (sum(_cost(n) for n in combo), max((_get(n).pct(0.9) or 0.0) for n in combo))
+            if best is None or key < best[0]:
+                best = (key, list(combo), conf)
+    if best is None:
+        # 目標に届かない：間に合うものを全部
+        chosen, conf = usable, _confidence(usable)
+        if reason == "cheapest":
+            reason = "below_target"
+    else:
+        chosen, conf = best[1], best[2]
+    chosen = [n for n in available if n in chosen]   # 呼び出し順は元のまま
+    ROUTER_PICKS.inc(subset="+".join(chosen), reason=reason)
+    return {"providers": chosen, "target": target, "confidence": round(conf, 3),
+            "reason": reason + (":hard" if hard else ":easy")}
+
+
+def weights(called: Sequence[str], available: Sequence[str]) -> Dict[str, float]:
+    """merge_outputs に渡す重み。called / available には local も含める"""
+    if not ENABLED:
+        return {n: BASE_WEIGHTS.get(n, 0.2) for n in called}
+    learned = {}
+    for n in set(called) | set(available):
+        prior = _PRIOR_AGREE.get(n, _PRIOR_AGREE_DEFAULT)
+        mult = min(_WEIGHT_MAX, max(_WEIGHT_MIN, _get(n).agreement(n) / prior))
+        learned[n] = BASE_WEIGHTS.get(n, 0.2) * mult
+    ref = sum(BASE_WEIGHTS.get(n, 0.2) for n in available)
+    tot = sum(learned[n] for n in called)
+    scale = ref / tot if tot > 0 else 1.0
+    return {n: learned[n] * scale for n in called}
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """プロバイダごとの現在の成績（/metrics・デバッグ用）"""
+    out = {}
+    for name, st in list(_stats.items()):
+        p50, p90 = st.pct(0.5), st.pct(0.9)
+        out[name] = {"calls": len(st.ok), "p50_s": p50, "p90_s": p90, "ok_rate": round(st.ok_rate(), 3),
+                     "agreement": round(st.agreement(name), 3), "quality": round(_quality(name), 3)}
+    return out
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def _gauge(field: str) -> dict:
+    return {(("provider", n),): float(v[field]) for n, v in snapshot().items() if v.get(field) is not None}
+
+
+ROUTER_QUALITY = Gauge("gdpbot_router_quality", "Learned per-provider quality (ok rate x consensus agreement)",
+                       fn=lambda: _gauge("quality"))
+ROUTER_P90 = Gauge("gdpbot_router_latency_p90_seconds", "Rolling p90 latency per extraction provider",
+                   fn=lambda: _gauge("p90_s"))
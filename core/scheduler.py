@@ -0,0 +1,268 @@
+# core/scheduler.py
+"""
+/forecast などの重いジョブ用のプロセス内スケジューラ。
+
+- 全体の同時実行数に上限（LLM クォータ・メモリを保護）
+- ギルド → ユーザーの2段の重み付き公平キュー（stride scheduling）
+  忙しいギルド/ユーザーが他を飢えさせない
+- キュー位置と推定待ち時間をコールバックで通知（Discord の defer 応答を更新）
+- 推定待ち時間が予算（既定 60 秒）を超えるジョブは投入時に即拒否
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from .metrics import Counter, Gauge, Histogram
+
+QUEUE_DEPTH = Gauge("gdpbot_sched_queue_depth", "Jobs waiting in the scheduler")
+SCHED_RUNNING = Gauge("gdpbot_sched_running", "Jobs currently running in the scheduler")
+SCHED_WAIT = Histogram("gdpbot_sched_wait_seconds", "Time jobs spent queued")
+SCHED_REJECTED = Counter("gdpbot_sched_rejected_total", "Jobs rejected at admission")
+
+PositionCallback = Callable[[int, float], Awaitable[None]]
+
+
+class JobRejected(Exception):
+    def __init__(self, reason: str, estimated_wait: float = 0.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.estimated_wait = estimated_wait
+
+
+class _Job:
+    __slots__ = ("factory", "guild", "user", "future", "on_position", "position", "enqueued", "task", "context")
+
+    def __init__(self, factory, guild, user, on_position):
+        self.factory = factory
+        self.guild = guild
+        self.user = user
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position = -1
+        self.enqueued = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        # 投入元のコンテキスト（締め切り等）をそのまま実行タスクへ引き継ぐ
+        self.context = contextvars.copy_context()
+
+
+class _Flow:
+    """ギルド内のユーザー別キュー（stride scheduling の pass 値付き）"""
+    __slots__ = ("jobs", "pass_")
+
+    def __init__(self, pass_: float):
+        self.jobs: Deque[_Job] = deque()
+        self.pass_ = pass_
+
+
+class _GuildFlow:
+    __slots__ = ("users", "pass_", "vtime")
+
+    def __init__(self, pass_: float):
+        self.users: Dict[Hashable, _Flow] = {}
+        self.pass_ = pass_
+        self.vtime = 0.0   # ギルド内の仮想時刻（ユーザー pass の下限）
+
+
+class JobScheduler:
+    def __init__(self, max_concurrency: int = 4, budget_sec: float = 60.0, max_queue: int = 200,
+                 max_per_guild: int = 50, guild_weights: Optional[Dict[Hashable, float]] = None,
+                 user_weights: Optional[Dict[Hashable, float]] = None, initial_duration: float = 8.0):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.budget = float(budget_sec)
+        self.max_queue = int(max_queue)
+        self.max_per_guild = int(max_per_guild)
+        self.guild_weights = guild_weights or {}
+        self.user_weights = user_weights or {}
+        self.avg_duration = float(initial_duration)   # EWMA（秒）
+
+        self._guilds: Dict[Hashable, _GuildFlow] = {}
+        self._vtime = 0.0     # 全体の仮想時刻（ギルド pass の下限）
+        self._queued = 0
+        self._running = 0
+
+    # ---- 見積もり ----
+    def estimate_wait(self, position: int) -> float:
+        """キュー位置（0 始まり）→ 実行開始までの推定秒数"""
+        ahead = position + self._running - self.max_concurrency + 1
+        if ahead <= 0:
+            return 0.0
+        return ahead / self.max_concurrency * self.avg_duration
+
+    # ---- 公開API ----
+    async def submit(self, factory: Callable[[], Awaitable[Any]], *, guild: Hashable = 0, user: Hashable = 0,
+                     on_position: Optional[PositionCallback] = None) -> Any:
+        """ジョブを投入し、完了まで待って結果を返す。混雑時は JobRejected"""
+        if self._queued >= self.max_queue:
+            SCHED_REJECTED.inc(reason="queue_full")
+            raise JobRejected("queue full", self.estimate_wait(self._queued))
+        gf = self._guilds.get(guild)
+        if gf is not None and sum(len(f.jobs) for f in gf.users.values()) >= self.max_per_guild:
+            SCHED_REJECTED.inc(reason="guild_limit")
+            raise JobRejected("too many queued jobs for this server")
+
+        est = self.estimate_wait(self._queued)
+        if est + self.avg_duration > self.budget:
+            SCHED_REJECTED.inc(reason="budget")
+            raise JobRejected("estimated wait exceeds budget", est)
+
+        job = _Job(factory, guild, user, on_position)
+        self._enqueue(job)
+        self._pump()
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            # 呼び出し側が諦めた（タイムアウト等）：待機中ならキューから外し、実行中なら止める
+            if job.task is not None:
+                job.task.cancel()
+            else:
+                self._remove(job)
+            raise
+
+    # ---- キュー操作 ----
+    def _enqueue(self, job: _Job):
+        gf = self._guilds.get(job.guild)
+        if gf is None:
+            # 新しく活性化したフローは現在の仮想時刻から開始（貯金させない）
+            gf = self._guilds[job.guild] = _GuildFlow(self._vtime)
+        uf = gf.users.get(job.user)
+        if uf is None:
+            uf = gf.users[job.user] = _Flow(gf.vtime)
+        uf.jobs.append(job)
+        self._queued += 1
+        QUEUE_DEPTH.set(self._queued)
+
+    def _remove(self, job: _Job):
+        gf = self._guilds.get(job.guild)
+        if gf is None:
+            return
+        uf = gf.users.get(job.user)
+        if uf is None or job not in uf.jobs:
+            return
+        uf.jobs.remove(job)
+        self._queued -= 1
+        QUEUE_DEPTH.set(self._queued)
+        self._gc(job.guild, gf, job.user, uf)
+        self._notify_positions()
+
+    def _gc(self, gkey, gf: _GuildFlow, ukey, uf: _Flow):
+        if not uf.jobs:
+            gf.users.pop(ukey, None)
+        if not gf.users:
+            self._guilds.pop(gkey, None)
+
+    def _pick(self) -> Optional[_Job]:
+        if not self._guilds:
+            return None
+        gkey, gf = min(self._guilds.items(), key=lambda kv: kv[1].pass_)
+        ukey, uf = min(gf.users.items(), key=lambda kv: kv[1].pass_)
+        job = uf.jobs.popleft()
+        self._vtime = max(self._vtime, gf.pass_)
+        gf.vtime = max(gf.vtime, uf.pass_)
+        gf.pass_ += 1.0 / max(1e-6, self.guild_weights.get(gkey, 1.0))
+        uf.pass_ += 1.0 / max(1e-6, self.user_weights.get(ukey, 1.0))
+        self._queued -= 1
+        QUEUE_DEPTH.set(self._queued)
+        self._gc(gkey, gf, ukey, uf)
+        return job
+
+    def _order(self) -> List[_Job]:
+        """現在のキューが実行される順（pick を模擬）"""
+        sim = []
+        for gkey, gf in self._guilds.items():
+            users = [[uf.pass_, ukey, list(uf.jobs)] for ukey, uf in gf.users.items()]
+            sim.append([gf.pass_, gkey, users])
+        out: List[_Job] = []
+        while sim:
+            g = min(sim, key=lambda x: x[0])
+            u = min(g[2], key=lambda x: x[0])
+            out.append(u[2].pop(0))
+            g[0] += 1.0 / max(1e-6, self.guild_weights.get(g[1], 1.0))
+            u[0] += 1.0 / max(1e-6, self.user_weights.get(u[1], 1.0))
+            if not u[2]:
+                g[2].remove(u)
+            if not g[2]:
+                sim.remove(g)
+        return out
+
+    def _notify_positions(self):
+        if self._queued == 0:
+            return
+        for pos, job in enumerate(self._order()):
+            if job.on_position is not None and job.position != pos:
+                job.position = pos
+                asyncio.ensure_future(self._safe_notify(job, pos))
+
+    async def _safe_notify(self, job: _Job, pos: int):
+        try:
+            await job.on_position(pos, self.estimate_wait(pos))
+        except Exception as e:
+            print("[sched] position callback error:", repr(e))
+
+    # ---- 実行 ----
+    def _pump(self):
+        while self._running < self.max_concurrency:
+            job = self._pick()
+            if job is None:
+                break
+            self._running += 1
+            SCHED_RUNNING.set(self._running)
+            SCHED_WAIT.observe(time.monotonic() - job.enqueued)
+            job.task = asyncio.get_running_loop().create_task(self._run(job), context=job.context)
+            job.task.add_done_callback(functools.partial(self._release, job, time.monotonic()))
+        self._notify_positions()
+
+    async def _run(self, job: _Job):
+        try:
+            res = await job.factory()
+        except BaseException as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(res)
+
+    def _release(self, job: _Job, started: float, task: asyncio.Task):
+        # 枠の返却はタスクの完了コールバックで行う。最初の一歩の前にキャンセルされたタスクは
+        # _run の本体が1行も走らないので、コルーチン内の finally では返却できない
+        if task.cancelled():
+            if not job.future.done():
+                job.future.cancel()
+        else:
+            self.avg_duration = 0.8 * self.avg_duration + 0.2 * (time.monotonic() - started)
+        self._running -= 1
+        SCHED_RUNNING.set(self._running)
+        self._pump()
+
+
+def _parse_weights(s: str) -> Dict[Hashable, float]:
+    out: Dict[Hashable, float] = {}
+    for part in (s or "").split(","):
+        if ":" in part:
+            k, v = part.split(":", 1)
+            try:
+                key: Hashable = int(k)
+            except ValueError:
+                key = k.strip()
+            out[key] = float(v)
+    return out
+
+
+_scheduler: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler(
+            max_concurrency=int(os.getenv("SCHED_MAX_CONCURRENCY", "4")),
+            budget_sec=float(os.getenv("SCHED_BUDGET_SEC", "60")),
+            max_queue=int(os.getenv("SCHED_MAX_QUEUE", "200")),
+            max_per_guild=int(os.getenv("SCHED_MAX_PER_GUILD", "50")),
+            guild_weights=_parse_weights(os.getenv("SCHED_GUILD_WEIGHTS", "")),
+            user_weights=_parse_weights(os.getenv("SCHED_USER_WEIGHTS", "")),
+        )
+    return _scheduler
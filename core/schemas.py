@@ -1,5 +1,6 @@
 # core/schemas.py
-from typing import Any, Dict, List
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # LLMへ渡す JSON スキーマ（文字列化して使う）
 JSON_SCHEMA: Dict[str, Any] = {
@@ -37,22 +38,171 @@ JSON_SCHEMA: Dict[str, Any] = {
     "required": ["policies"]
 }
 
-def coerce_extract_output(obj: Dict[str, Any]) -> Dict[str, Any]:
-    """最低限の形に整える（欠損はデフォルト埋め）"""
-    out: Dict[str, Any] = {}
-    out["horizon_years"] = int(obj.get("horizon_years", 5))
-    pols = obj.get("policies") or []
-    norm: List[Dict[str, Any]] = []
-    for p in pols:
+# プロンプトに埋め込む文字列（毎回 dumps しない）
+JSON_SCHEMA_TEXT: str = json.dumps(JSON_SCHEMA, ensure_ascii=False)
+
+
+class SchemaError(ValueError):
+    pass
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "object":  lambda v: isinstance(v, dict),
+    "array":   lambda v: isinstance(v, list),
+    "string":  lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number":  lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null":    lambda v: v is None,
+}
+
+Validator = Callable[[Any, str], Optional[str]]
+
+
+def _compile(schema: Dict[str, Any]) -> Validator:
+    """スキーマ（type/properties/required/items/anyOf のサブセット）を検査関数の木に変換"""
+    checks: List[Validator] = []
+
+    if "anyOf" in schema:
+        alts = [_compile(s) for s in schema["anyOf"]]
+        def _any(v, path, alts=alts):
+            for a in alts:
+                if a(v, path) is None:
+                    return None
+            return f"{path}: no anyOf branch matched"
+        checks.append(_any)
+
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        preds = [_TYPE_CHECKS[t] for t in types]
+        label = "/".join(types)
+        def _type(v, path, preds=preds, label=label):
+            for p in preds:
+                if p(v):
+                    return None
+            return f"{path}: expected {label}, got {type(v).__name__}"
+        checks.append(_type)
+
+    required = tuple(schema.get("required") or ())
+    props = {k: _compile(s) for k, s in (schema.get("properties") or {}).items()}
+    if required or props:
+        def _obj(v, path, required=required, props=props):
+            if not isinstance(v, dict):
+                return None
+            for k in required:
+                if k not in v:
+                    return f"{path}: missing '{k}'"
+            for k, chk in props.items():
+                if k in v:
+                    err = chk(v[k], f"{path}.{k}")
+                    if err:
+                        return err
+            return None
+        checks.append(_obj)
+
+    if "items" in schema:
+        item = _compile(schema["items"])
+        def _arr(v, path, item=item):
+            if not isinstance(v, list):
+                return None
+            for i, x in enumerate(v):
+                err = item(x, f"{path}[{i}]")
+                if err:
+                    return err
+            return None
+        checks.append(_arr)
+
+    def _all(v, path="$", checks=tuple(checks)):
+        for c in checks:
+            err = c(v, path)
+            if err:
+                return err
+        return None
+    return _all
+
+
+# 起動時に一度だけコンパイル（政策1件ぶん。出力全体ではなく政策ごとに検査して、不正な政策だけ捨てる）
+_validate_policy = _compile(JSON_SCHEMA["properties"]["policies"]["items"])
+
+
+def _str_list(v: Any) -> Any:
+    # "infrastructure" のような単独の文字列も1要素の配列として受ける。null は空配列
+    if v is None:
+        return []
+    if isinstance(v, (str, int, float)) and not isinstance(v, bool):
+        return [str(v)]
+    if isinstance(v, list):
+        return [str(x) for x in v if x is not None]
+    return v
+
+
+def _int_like(v: Any) -> Any:
+    # 2.0 / "2" → 2。整数に直せない値はそのまま返して検査で落とす
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, str):
+        try:
+            f = float(v.strip())
+        except ValueError:
+            return v
+        return int(f) if f.is_integer() else v
+    return v
+
+
+def _number_like(v: Any) -> Any:
+    # "10" / "1,000" → 数値。直せない値はそのまま返して検査で落とす
+    if isinstance(v, str):
+        try:
+            return float(v.strip().replace(",", ""))
+        except ValueError:
+            return v
+    return v
+
+
+def _coerce_policy(p: Dict[str, Any]) -> Dict[str, Any]:
+    q = dict(p)
+    if q.get("title") is not None and not isinstance(q["title"], str):
+        q["title"] = str(q["title"])
+    for k in ("lever", "direction"):
+        if k in q:
+            q[k] = _str_list(q[k])
+    if q.get("lag_years") is not None:
+        q["lag_years"] = _int_like(q["lag_years"])
+    if q.get("confidence") is None:
+        q.pop("confidence", None)   # 未知は既定（B）
+    elif not isinstance(q["confidence"], str):
+        q["confidence"] = str(q["confidence"])
+    sc = q.get("scale")
+    if isinstance(sc, dict):
+        q["scale"] = {"value": _number_like(sc.get("value")), "unit": sc.get("unit")}
+    return q
+
+
+def clean_extract_output(obj: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """プロバイダ出力の型の揺れ（2.0 / "5" / null / 単独の文字列など）を直してから政策ごとに検査する。
+    戻り値: (検査を通った政策だけの出力, 捨てた政策の理由)。出力全体が使えないときは SchemaError"""
+    if not isinstance(obj, dict):
+        raise SchemaError(f"$: expected object, got {type(obj).__name__}")
+    pols = obj.get("policies")
+    if not isinstance(pols, list):
+        raise SchemaError("$: missing 'policies'" if pols is None else
+                          f"$.policies: expected array, got {type(pols).__name__}")
+    out: Dict[str, Any] = {"policies": []}
+    hz = _int_like(obj.get("horizon_years"))
+    if isinstance(hz, int) and not isinstance(hz, bool):
+        out["horizon_years"] = hz   # 直せなければ入れない（既定 5）
+    dropped: List[str] = []
+    for i, p in enumerate(pols):
+        path = f"$.policies[{i}]"
         if not isinstance(p, dict):
+            dropped.append(f"{path}: expected object, got {type(p).__name__}")
             continue
-        norm.append({
-            "title":       str(p.get("title", ""))[:256] or "(untitled)",
-            "lever":       [str(x) for x in (p.get("lever") or [])][:5],
-            "scale":       p.get("scale"),
-            "direction":   [str(x) for x in (p.get("direction") or [])][:5],
-            "lag_years":   None if p.get("lag_years") is None else int(p.get("lag_years")),
-            "confidence":  str(p.get("confidence", "B"))[:1]
-        })
-    out["policies"] = norm
-    return out
+        q = _coerce_policy(p)
+        err = _validate_policy(q, path)
+        if err:
+            dropped.append(err)
+        else:
+            out["policies"].append(q)
+    return out, dropped
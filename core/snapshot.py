@@ -0,0 +1,177 @@
+# core/snapshot.py
+"""
+全か国の融合済みプロファイルのスナップショット（core.colstore 形式、mmap）。
+
+- 生成: python ingest_data.py snapshot            # WB（ネットワーク）+ ローカルの IMF / Comtrade を融合
+        python ingest_data.py snapshot --offline  # ローカルの IMF / Comtrade だけで作る
+- 参照: build_country_profile が国名から引き、fuse_profile で「ライブの WB の直下」の層として使う。
+  スナップショットにある国は WB を短時間（SNAPSHOT_LIVE_WAIT_SEC）しか待たない
+  （待ちきれなかった WB の取得は裏で続け、次回からはキャッシュに載る）
+- ネットワークが無くても、既定値（インフレ 4.0・開放度 0.8 など）ではなく国ごとの値で予測できる
+
+数値項目は列（年の軸は生成年の1つだけ）、表示名・所得ティアはヘッダの meta に持つ。
+meta["version"] は生成日時（説明・/explain に snapshot_version として出す）。
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .colstore import ColStore, ColStoreBuilder, open_store
+
+SNAPSHOT_PATH = os.getenv(
+    "PROFILE_SNAPSHOT",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "profile_snapshot.cols"),
+)
+SNAPSHOT_LIVE_WAIT = float(os.getenv("SNAPSHOT_LIVE_WAIT_SEC", "3"))
+SCHEMA = 1
+
+NUM_FIELDS = ("baseline_gdp_usd", "gdp_per_capita", "inflation_recent", "inflation_forecast", "openness_ratio",
+              "investment_rate", "labor_growth", "debt_to_gdp", "trade_partner_hhi", "trade_top_partner_share",
+              "export_sector_hhi")
+
+_store: Optional[ColStore] = None
+_loaded = False
+_by_name: Dict[str, str] = {}
+_rows: Dict[str, Dict[str, Any]] = {}
+
+
+def get_store() -> Optional[ColStore]:
+    global _store, _loaded, _by_name
+    if not _loaded:
+        _store = open_store(SNAPSHOT_PATH)
+        if _store is not None and _store.meta.get("schema") != SCHEMA:
+            print(f"[snapshot] ignoring {SNAPSHOT_PATH}: schema {_store.meta.get('schema')} != {SCHEMA}")
+            _store.close()
+            _store = None
+        _by_name = {}
+        if _store is not None:
+            for iso3, name in (_store.meta.get("names") or {}).items():
+                _by_name[name.lower()] = iso3
+            print(f"[snapshot] loaded {len(_store.keys)} profiles (version {_store.meta.get('version')})")
+        _loaded = True
+    return _store
+
+
+def reload():
+    global _store, _loaded
+    _rows.clear()
+    _store, _loaded = None, False
+
+
+def version() -> Optional[str]:
+    store = get_store()
+    return store.meta.get("version") if store else None
+
+
+def _resolve(store: ColStore, country_name: Optional[str]) -> Optional[str]:
+    key = (country_name or "").strip().strip('"').strip("'").strip()
+    if not key:
+        return None
+    if len(key) == 3 and store.has(key.upper()):
+        return key.upper()
+    low = key.lower()
+    if low in _by_name:
+        return _by_name[low]
+    from providers.data_worldbank import ISO3_FALLBACK
+    iso3 = ISO3_FALLBACK.get(low)
+    return iso3 if iso3 and store.has(iso3) else None
+
+
+def lookup(country_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """国名 / ISO3 → スナップショットのプロファイル（無ければ None）。国ごとにメモ化"""
+    store = get_store()
+    if store is None:
+        return None
+    iso3 = _resolve(store, country_name)
+    if iso3 is None:
+        return None
+    row = _rows.get(iso3)
+    if row is None:
+        row = {k: v for k, v in store.row(iso3, store.year1).items() if k in NUM_FIELDS}
+        row["iso3"] = iso3
+        row["display_name"] = (store.meta.get("names") or {}).get(iso3) or iso3
+        tier = (store.meta.get("tiers") or {}).get(iso3)
+        if tier:
+            row["income_tier"] = tier
+        row["snapshot_version"] = store.meta.get("version")
+        _rows[iso3] = row
+    return row
+
+
+# ---- 生成 ----
+
+def write_snapshot(profiles: Iterable[Dict[str, Any]], path: str = SNAPSHOT_PATH,
+                   sources: Optional[List[str]] = None) -> Dict[str, Any]:
+    year = time.gmtime().tm_year
+    b = ColStoreBuilder([year], meta={"schema": SCHEMA, "version": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                                      "sources": sources or []})
+    names: Dict[str, str] = {}
+    tiers: Dict[str, str] = {}
+    for p in profiles:
+        iso3 = (p.get("iso3") or "").upper()
+        if len(iso3) != 3:
+            continue
+        names[iso3] = p.get("display_name") or iso3
+        if p.get("income_tier"):
+            tiers[iso3] = p["income_tier"]
+        for k in NUM_FIELDS:
+            v = p.get(k)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                b.set(iso3, k, year, float(v))
+    if not names:
+        raise ValueError("no profiles to write")
+    b.meta["names"] = names
+    b.meta["tiers"] = tiers
+    b.write(path)
+    if os.path.abspath(path) == os.path.abspath(SNAPSHOT_PATH):
+        reload()
+    return {"countries": len(names), "version": b.meta["version"], "out": path}
+
+
+async def build_profiles(offline: bool = False, concurrency: int = 8) -> List[Dict[str, Any]]:
+    """全か国のプロファイルを集めて融合する（既定値だけで埋まった項目はスナップショットに入れない）"""
+    from core.orchestrator import fuse_profile, pick_tier_by_gdp_pc
+    from providers import data_comtrade, data_imf
+
+    if offline:
+        imf = data_imf.get_store()
+        if imf is None:
+            raise ValueError(f"--offline needs the IMF dataset ({data_imf.IMF_WEO_STORE})")
+        names = imf.meta.get("names") or {}
+        countries = [(iso3, names.get(iso3) or iso3, None) for iso3 in imf.keys]
+    else:
+        from providers.data_worldbank import list_countries
+        countries = await asyncio.to_thread(list_countries)
+        if not countries:
+            raise OSError("World Bank country list unavailable (use --offline)")
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(iso3: str, name: str, tier: Optional[str]) -> Optional[Dict[str, Any]]:
+        async with sem:
+            wb = None
+            if not offline:
+                from providers.data_worldbank import fetch_country_profile
+                wb = await asyncio.to_thread(fetch_country_profile, iso3)
+            imf_p = data_imf.imf_profile(iso3)
+            trade = data_comtrade.trade_metrics(iso3)
+        if not (wb or imf_p):
+            return None
+        prof = fuse_profile(wb, imf_p, None, trade, {}, name)
+        # 実データで埋まった項目だけ残す（fuse_profile の既定値はスナップショットに焼き込まない）
+        known = {k for src in (wb or {}, imf_p) for k, v in src.items() if v is not None}
+        known |= {k for k in NUM_FIELDS if k.startswith(("trade_", "export_")) and k in prof}
+        if trade.get("exports_usd") and trade.get("imports_usd") and not (wb or {}).get("openness_ratio") \
+                and not prof.get("baseline_gdp_estimated"):
+            known.add("openness_ratio")
+        out = {k: prof[k] for k in NUM_FIELDS if k in known and prof.get(k) is not None}
+        if tier is None and not (wb or {}).get("income_tier"):
+            # WB の所得区分が無いとき（--offline）は1人あたり GDP から決める
+            tier = pick_tier_by_gdp_pc(imf_p.get("gdp_per_capita"))
+        out.update(iso3=iso3, display_name=(wb or {}).get("display_name") or name,
+                   income_tier=tier or prof.get("income_tier"))
+        return out
+
+    res = await asyncio.gather(*(one(*c) for c in countries))
+    return [p for p in res if p]
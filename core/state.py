@@ -0,0 +1,276 @@
+# core/state.py
+"""
+チャンネル単位の状態（/assume の上書き・直近の explain 履歴）を保持するストア。
+
+- メモリ上は LRU + TTL で上限付き（ギルド/チャンネルが増えても常駐メモリは一定）
+- SQLite へ write-behind で永続化（再起動しても上書き設定と履歴が残る）
+- チャンネルごとに初回アクセス時に遅延ロード（起動時に全件読まない）
+- 実行 ID ごとの explain レコード（JSON API の GET /explain/{id} 用）も同じ方式で保持
+- 共有モード（shared=True。シャードごとに別プロセスで動かすとき）は書き込みを即時反映し、
+  他プロセスのコミットを PRAGMA data_version で検知したらメモリ上の読み取りキャッシュを捨てる。
+  同じチャンネルへの同時書き込みは後勝ち（チャンネルは通常1つのシャードだけが扱う）
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from .metrics import cache_lookup
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "channel_state.sqlite3")
+
+
+class _Entry:
+    __slots__ = ("overrides", "history", "touched")
+
+    def __init__(self, overrides: Dict[str, Any], history: deque, touched: float):
+        self.overrides = overrides
+        self.history = history
+        self.touched = touched
+
+
+class ChannelStateStore:
+    def __init__(self, path: Optional[str] = DEFAULT_DB_PATH, max_channels: int = 2048,
+                 ttl_seconds: float = 14 * 86400, history_len: int = 5, flush_interval: float = 2.0,
+                 max_runs: int = 4096, shared: bool = False):
+        self.path = path
+        self.max_channels = max(1, int(max_channels))
+        self.ttl = float(ttl_seconds)
+        self.history_len = max(1, int(history_len))
+        self.flush_interval = float(flush_interval)
+        self.max_runs = max(1, int(max_runs))
+        self.shared = bool(shared) and bool(path)
+        self._data_version: Optional[int] = None
+
+        self._mem: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._pending: Dict[int, tuple] = {}   # ch -> (overrides_json, history_json, touched)
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending_runs: Dict[str, tuple] = {}   # run_id -> (record_json, created)
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._closed = False
+
+    # ---- SQLite（初回アクセス時に開く） ----
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS channel_state ("
+                " channel_id INTEGER PRIMARY KEY, overrides TEXT NOT NULL,"
+                " history TEXT NOT NULL, touched REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT PRIMARY KEY, record TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db = db
+            self._flusher = threading.Thread(target=self._flush_loop, name="channel-state-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+        return self._db
+
+    def _sync_shared(self):
+        """共有モード：他プロセスがコミットしていたら未書き込み以外のキャッシュを捨てる"""
+        if not self.shared:
+            return
+        db = self._conn()
+        v = db.execute("PRAGMA data_version").fetchone()[0]
+        if self._data_version is not None and v != self._data_version:
+            for ch in [c for c in self._mem if c not in self._pending]:
+                del self._mem[ch]
+            self._runs.clear()
+        self._data_version = v
+
+    def _load(self, ch: int) -> _Entry:
+        now = time.time()
+        ov: Dict[str, Any] = {}
+        hist: List[Any] = []
+        pend = self._pending.get(ch)
+        if pend is not None:
+            ov, hist = json.loads(pend[0]), json.loads(pend[1])
+        else:
+            db = self._conn()
+            if db is not None:
+                row = db.execute(
+                    "SELECT overrides, history, touched FROM channel_state WHERE channel_id=?", (ch,)
+                ).fetchone()
+                if row and now - row[2] <= self.ttl:
+                    try:
+                        ov, hist = json.loads(row[0]), json.loads(row[1])
+                    except ValueError:
+                        ov, hist = {}, []
+        return _Entry(ov, deque(hist, maxlen=self.history_len), now)
+
+    def _entry(self, ch: int) -> _Entry:
+        self._sync_shared()
+        now = time.time()
+        ent = self._mem.get(ch)
+        if ent is not None and now - ent.touched > self.ttl:
+            self._mem.pop(ch, None)
+            ent = None
+        cache_lookup("channel_state", ent is not None)
+        if ent is None:
+            ent = self._load(ch)
+            self._mem[ch] = ent
+            while len(self._mem) > self.max_channels:
+                # 退避対象の未書き込み分は _pending にスナップショット済みなので捨ててよい
+                self._mem.popitem(last=False)
+        else:
+            self._mem.move_to_end(ch)
+        ent.touched = now
+        return ent
+
+    def _mark_dirty(self, ch: int, ent: _Entry):
+        if not self.path:
+            return
+        self._pending[ch] = (
+            json.dumps(ent.overrides, ensure_ascii=False),
+            json.dumps(list(ent.history), ensure_ascii=False),
+            ent.touched,
+        )
+        self._conn()
+        if self.shared:
+            self.flush()
+
+    # ---- 公開API ----
+    def get_overrides(self, ch: int) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._entry(ch).overrides)
+
+    def set_overrides(self, ch: int, overrides: Dict[str, Any]):
+        with self._lock:
+            ent = self._entry(ch)
+            ent.overrides = dict(overrides or {})
+            self._mark_dirty(ch, ent)
+
+    def push_explain(self, ch: int, record: Dict[str, Any]):
+        with self._lock:
+            ent = self._entry(ch)
+            ent.history.append(record)
+            self._mark_dirty(ch, ent)
+
+    def last_explain(self, ch: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hist = self._entry(ch).history
+            return hist[-1] if hist else None
+
+    def history(self, ch: int) -> List[Dict[str, Any]]:
+        """新しい順"""
+        with self._lock:
+            return list(reversed(self._entry(ch).history))
+
+    def put_run(self, run_id: str, record: Dict[str, Any]):
+        with self._lock:
+            self._runs[run_id] = record
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+            if self.path:
+                self._pending_runs[run_id] = (json.dumps(record, ensure_ascii=False), time.time())
+                self._conn()
+                if self.shared:
+                    self.flush()
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sync_shared()
+            rec = self._runs.get(run_id)
+            cache_lookup("runs", rec is not None)
+            if rec is not None:
+                self._runs.move_to_end(run_id)
+                return rec
+            pend = self._pending_runs.get(run_id)
+            if pend is not None:
+                return json.loads(pend[0])
+            db = self._conn()
+            if db is None:
+                return None
+            row = db.execute("SELECT record, created FROM runs WHERE run_id=?", (run_id,)).fetchone()
+            if not row or time.time() - row[1] > self.ttl:
+                return None
+            rec = json.loads(row[0])
+            self._runs[run_id] = rec
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+            return rec
+
+    # ---- write-behind ----
+    def flush(self):
+        with self._lock:
+            if (not self._pending and not self._pending_runs) or self._db is None:
+                return
+            rows = [(ch, ov, hist, ts) for ch, (ov, hist, ts) in self._pending.items()]
+            runs = [(rid, rec, ts) for rid, (rec, ts) in self._pending_runs.items()]
+            self._pending.clear()
+            self._pending_runs.clear()
+            db = self._db
+            try:
+                db.execute("BEGIN")
+                db.executemany(
+                    "INSERT INTO channel_state(channel_id, overrides, history, touched) VALUES (?,?,?,?) "
+                    "ON CONFLICT(channel_id) DO UPDATE SET overrides=excluded.overrides,"
+                    " history=excluded.history, touched=excluded.touched",
+                    rows,
+                )
+                db.executemany("INSERT OR REPLACE INTO runs(run_id, record, created) VALUES (?,?,?)", runs)
+                cutoff = time.time() - self.ttl
+                db.execute("DELETE FROM channel_state WHERE touched < ?", (cutoff,))
+                db.execute("DELETE FROM runs WHERE created < ?", (cutoff,))
+                db.execute("COMMIT")
+            except Exception as e:
+                db.execute("ROLLBACK")
+                # 失敗分は次回に持ち越す（新しい書き込みがあればそちらを優先）
+                for ch, ov, hist, ts in rows:
+                    self._pending.setdefault(ch, (ov, hist, ts))
+                for rid, rec, ts in runs:
+                    self._pending_runs.setdefault(rid, (rec, ts))
+                print("[state] flush error:", repr(e))
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._wake.set()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def shared_from_env() -> bool:
+    """STATE_SHARED が無ければ、SHARD_IDS（プロセスごとにシャード範囲を持つ構成）のとき共有モード"""
+    v = os.getenv("STATE_SHARED")
+    if v is not None:
+        return v.lower() in ("1", "true", "yes")
+    return bool(os.getenv("SHARD_IDS"))
+
+
+def store_from_env() -> ChannelStateStore:
+    path = os.getenv("STATE_DB_PATH", DEFAULT_DB_PATH)
+    return ChannelStateStore(
+        path=path if path not in ("", ":none:") else None,
+        max_channels=int(os.getenv("STATE_MAX_CHANNELS", "2048")),
+        ttl_seconds=float(os.getenv("STATE_TTL_SECONDS", str(14 * 86400))),
+        history_len=int(os.getenv("STATE_HISTORY", "5")),
+        flush_interval=float(os.getenv("STATE_FLUSH_SEC", "2.0")),
+        max_runs=int(os.getenv("STATE_MAX_RUNS", "4096")),
+        shared=shared_from_env(),
+    )
@@ -0,0 +1,198 @@
+# core/tiers.py
+"""
+tiers.yml を唯一の正とするティア別パラメータ表。
+
+- 読み込み時に不変・__slots__ のレコード（TierParams）へコンパイルする
+- レバー係数は LEVERS の並びで配列化（モデル側は dict ではなく添字で参照）
+- ラグ・カーネル（lag_kernels。core/kernels.py）もレバーごとに仕様タプルの配列へコンパイルする。
+  トップレベルの lag_kernels が全ティア共通、ティアの下の lag_kernels がレバー単位で上書き
+- ファイル監視スレッドが mtime の変化を検知したら表全体を作り直して差し替える（再起動不要）
+"""
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from . import kernels
+
+TIERS_PATH = os.getenv(
+    "TIERS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tiers.yml"),
+)
+
+# レバーの並び（tfp 配列の添字・政策レコードのビット位置と共通）
+LEVERS: Tuple[str, ...] = (
+    "logistics", "automation", "education", "regulation", "governance", "energy",
+    "infrastructure", "trade", "industry", "finance", "security",
+)
+LEVER_INDEX: Dict[str, int] = {name: i for i, name in enumerate(LEVERS)}
+
+DEFAULT_TIER = "middle_income"
+
+
+class TierParams:
+    __slots__ = ("name", "potential_g", "capital_share", "inflation_target",
+                 "capex_mult", "current_mult", "trade_elasticity", "tfp",
+                 "lag_infra", "lag_ports", "lag_education", "lag_regulation",
+                 "tfp_kernels", "demand_kernels", "path_kernel")
+
+    def __init__(self, name: str, potential_g: float, capital_share: float, inflation_target: float,
+                 capex_mult: float, current_mult: float, trade_elasticity: float, tfp: Tuple[float, ...],
+                 lag_infra: int, lag_ports: int, lag_education: int, lag_regulation: int,
+                 tfp_kernels: Optional[Tuple[kernels.Spec, ...]] = None,
+                 demand_kernels: Optional[Tuple[kernels.Spec, ...]] = None,
+                 path_kernel: kernels.Spec = kernels.PATH_RAMP):
+        tfp_kernels = tuple(tfp_kernels or (kernels.STEP,) * len(LEVERS))
+        demand_kernels = tuple(demand_kernels or (kernels.DEMAND_SPLIT,) * len(LEVERS))
+        for k, v in zip(self.__slots__, (name, potential_g, capital_share, inflation_target,
+                                         capex_mult, current_mult, trade_elasticity, tuple(tfp),
+                                         lag_infra, lag_ports, lag_education, lag_regulation,
+                                         tfp_kernels, demand_kernels, path_kernel)):
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("TierParams is immutable")
+
+    def __reduce__(self):
+        return (TierParams, tuple(getattr(self, k) for k in self.__slots__))
+
+    def __repr__(self):
+        return f"TierParams({self.name!r}, potential_g={self.potential_g})"
+
+    @property
+    def fiscal_multiplier(self) -> Dict[str, float]:
+        return {"capex": self.capex_mult, "current": self.current_mult}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """表示・JSON 出力用（tiers.yml と同じ形）"""
+        return {
+            "potential_g": self.potential_g,
+            "capital_share": self.capital_share,
+            "inflation_target": self.inflation_target,
+            "fiscal_multiplier": self.fiscal_multiplier,
+            "trade_elasticity": self.trade_elasticity,
+            "tfp_coeff": dict(zip(LEVERS, self.tfp)),
+            "default_lags": {"infra": self.lag_infra, "ports": self.lag_ports,
+                             "education": self.lag_education, "regulation": self.lag_regulation},
+            "lag_kernels": {
+                "path": kernels.describe(self.path_kernel),
+                **{lv: {"tfp": kernels.describe(tk), "demand": kernels.describe(dk)}
+                   for lv, tk, dk in zip(LEVERS, self.tfp_kernels, self.demand_kernels)},
+            },
+        }
+
+
+def _compile_kernels(shared: Dict[str, Any], own: Dict[str, Any]):
+    """lag_kernels（共通 → ティア別の順に上書き）→ (tfp 用, demand 用, 経路用)"""
+    def pick(lever: str, channel: str):
+        for src in (own, shared):
+            ent = src.get(lever)
+            if isinstance(ent, dict) and channel in ent:
+                return ent[channel]
+        return None
+
+    tfp_default = kernels.compile_spec(pick("default", "tfp"), kernels.STEP)
+    demand_default = kernels.compile_spec(pick("default", "demand"), kernels.DEMAND_SPLIT)
+    tfp_k = tuple(kernels.compile_spec(pick(lv, "tfp"), tfp_default) for lv in LEVERS)
+    demand_k = tuple(kernels.compile_spec(pick(lv, "demand"), demand_default) for lv in LEVERS)
+    path_raw = own.get("path", shared.get("path"))
+    return tfp_k, demand_k, kernels.compile_spec(path_raw, kernels.PATH_RAMP)
+
+
+def compile_tier(name: str, raw: Dict[str, Any], shared_kernels: Optional[Dict[str, Any]] = None) -> TierParams:
+    fm = raw.get("fiscal_multiplier") or {}
+    coeff = raw.get("tfp_coeff") or {}
+    lags = raw.get("default_lags") or {}
+    try:
+        tfp_k, demand_k, path_k = _compile_kernels(shared_kernels or {}, raw.get("lag_kernels") or {})
+    except ValueError as e:
+        raise ValueError(f"tiers.yml: {name}: {e}") from None
+    return TierParams(
+        name=name,
+        potential_g=float(raw.get("potential_g", 3.0)),
+        capital_share=float(raw.get("capital_share", 0.35)),
+        inflation_target=float(raw.get("inflation_target", 3.0)),
+        capex_mult=float(fm.get("capex", 1.0)),
+        current_mult=float(fm.get("current", 0.5)),
+        trade_elasticity=float(raw.get("trade_elasticity", 0.3)),
+        tfp=tuple(float(coeff.get(lv, 0.0)) for lv in LEVERS),
+        lag_infra=int(lags.get("infra", 2)),
+        lag_ports=int(lags.get("ports", 2)),
+        lag_education=int(lags.get("education", 3)),
+        lag_regulation=int(lags.get("regulation", 1)),
+        tfp_kernels=tfp_k,
+        demand_kernels=demand_k,
+        path_kernel=path_k,
+    )
+
+
+def compile_tables(doc: Dict[str, Any]) -> Mapping[str, TierParams]:
+    tiers = (doc or {}).get("tiers") or {}
+    if DEFAULT_TIER not in tiers:
+        raise ValueError(f"tiers.yml: '{DEFAULT_TIER}' is required")
+    shared = (doc or {}).get("lag_kernels") or {}
+    return MappingProxyType({name: compile_tier(name, raw or {}, shared) for name, raw in tiers.items()})
+
+
+def load_tables(path: str = TIERS_PATH) -> Mapping[str, TierParams]:
+    import yaml   # 初回の表読み込み時だけ必要（起動時には読み込まない）
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_tables(yaml.safe_load(f))
+
+
+# ---- 現在の表（参照の差し替えだけで更新するのでロック不要で読める） ----
+_TABLES: Optional[Mapping[str, TierParams]] = None
+_mtime: float = 0.0
+_watch_lock = threading.Lock()
+_watcher: Optional[threading.Thread] = None
+
+
+def reload(path: str = TIERS_PATH) -> bool:
+    """tiers.yml を読み直して差し替える。失敗時は旧テーブルを維持して False"""
+    global _TABLES, _mtime
+    try:
+        mtime = os.path.getmtime(path)
+        tables = load_tables(path)
+    except Exception as e:
+        print(f"[tiers] reload failed ({path}): {e!r}")
+        return False
+    _TABLES, _mtime = tables, mtime
+    return True
+
+
+def _watch_loop(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if mtime != _mtime and reload(path):
+            print(f"[tiers] reloaded {path}")
+
+
+def start_watcher(path: str = TIERS_PATH, interval: float | None = None):
+    global _watcher
+    if interval is None:
+        interval = float(os.getenv("TIERS_WATCH_SEC", "5"))
+    if interval <= 0:
+        return
+    with _watch_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch_loop, args=(path, interval), name="tiers-watch", daemon=True)
+            _watcher.start()
+
+
+def tables() -> Mapping[str, TierParams]:
+    if _TABLES is None:
+        with _watch_lock:
+            if _TABLES is None and not reload():
+                raise RuntimeError(f"tiers.yml could not be loaded: {TIERS_PATH}")
+        start_watcher()
+    return _TABLES
+
+
+def get(name: str) -> TierParams:
+    t = tables()
+    return t.get(name) or t[DEFAULT_TIER]
@@ -1,5 +1,11 @@
 
-import re, unicodedata
+import os, re, unicodedata
+
+# BOT_DEBUG=1 のときだけデバッグ出力（重いシリアライズもここでガードする）
+DEBUG = os.getenv("BOT_DEBUG", "").lower() not in ("", "0", "false", "no")
+
+def debug_enabled() -> bool:
+    return DEBUG
 
 def normalize_title(s: str) -> str:
     s = unicodedata.normalize("NFKC", s or "")
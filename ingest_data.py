@@ -0,0 +1,77 @@
+# ingest_data.py
+"""
+一括データファイル → ローカルの列指向データセット（core.colstore）への取り込み CLI。
+
+  python ingest_data.py imf WEOApr2025all.xls          # IMF WEO（年2回公開）→ data/imf_weo.cols
+  python ingest_data.py comtrade 2022.csv 2023.csv.gz  # UN Comtrade 年次一括 CSV → data/comtrade.cols
+  python ingest_data.py snapshot [--offline]           # 全か国の融合済みプロファイル → data/profile_snapshot.cols
+  python ingest_data.py wb-panel WDICSV.csv [--fetch]  # WDI の過去パネル（バックテスト用）→ data/wb_panel.cols
+
+出力先は各プロバイダの環境変数（IMF_WEO_STORE / COMTRADE_STORE / PROFILE_SNAPSHOT / WB_PANEL_STORE など）か -o で指定。
+取り込みは1行ずつのストリーム処理で、元ファイル全体をメモリに載せない。
+"""
+import argparse
+import json
+import sys
+import time
+
+
+def _cmd_imf(args) -> dict:
+    from providers.data_imf import IMF_WEO_STORE, ingest_weo
+    return ingest_weo(args.path, args.output or IMF_WEO_STORE)
+
+
+def _cmd_comtrade(args) -> dict:
+    from providers.data_comtrade import COMTRADE_STORE, ingest_comtrade
+    return ingest_comtrade(args.paths, args.output or COMTRADE_STORE)
+
+
+def _cmd_snapshot(args) -> dict:
+    import asyncio
+    from core.snapshot import SNAPSHOT_PATH, build_profiles, write_snapshot
+    profiles = asyncio.run(build_profiles(offline=args.offline, concurrency=args.concurrency))
+    sources = (["imf", "comtrade"] if args.offline else ["worldbank", "imf", "comtrade"])
+    return write_snapshot(profiles, args.output or SNAPSHOT_PATH, sources)
+
+
+def _cmd_wb_panel(args) -> dict:
+    from providers.data_worldbank import WB_PANEL_STORE, ingest_wb_panel
+    return ingest_wb_panel(args.paths, args.output or WB_PANEL_STORE, fetch=args.fetch)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="一括データファイルの取り込み")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("imf", help="IMF World Economic Outlook の全件ファイル（タブ区切り）")
+    p.add_argument("path")
+    p.add_argument("-o", "--output", help="出力先（既定: IMF_WEO_STORE）")
+    p.set_defaults(func=_cmd_imf)
+    p = sub.add_parser("comtrade", help="UN Comtrade の年次一括 CSV（複数可、.gz 可）")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-o", "--output", help="出力先（既定: COMTRADE_STORE）")
+    p.set_defaults(func=_cmd_comtrade)
+    p = sub.add_parser("snapshot", help="全か国の融合済みプロファイルのスナップショットを作り直す")
+    p.add_argument("--offline", action="store_true", help="WB を使わずローカルの IMF / Comtrade だけで作る")
+    p.add_argument("-c", "--concurrency", type=int, default=8, help="WB への同時リクエスト数")
+    p.add_argument("-o", "--output", help="出力先（既定: PROFILE_SNAPSHOT）")
+    p.set_defaults(func=_cmd_snapshot)
+    p = sub.add_parser("wb-panel", help="World Bank WDI の過去パネル（一括 CSV / 指標ごとの zip、.gz 可）")
+    p.add_argument("paths", nargs="*")
+    p.add_argument("--fetch", action="store_true", help="WB API から取得する（ファイルと併用可）")
+    p.add_argument("-o", "--output", help="出力先（既定: WB_PANEL_STORE）")
+    p.set_defaults(func=_cmd_wb_panel)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    try:
+        res = args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"[ingest] {args.cmd}: {e}", file=sys.stderr)
+        return 1
+    res["seconds"] = round(time.perf_counter() - t0, 2)
+    print(json.dumps(res, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
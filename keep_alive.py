@@ -1,13 +1,37 @@
-from flask import Flask
+from flask import Flask, Response, jsonify
 from threading import Thread
 import os
 
 app = Flask(__name__)
 
+# ボット側が登録するヘルス関数（シャードごとの接続状態を返す）
+_health_fn = None
+
+def register_health(fn):
+    global _health_fn
+    _health_fn = fn
+
 @app.get("/")
 def home():
     return "I'm alive"
 
+@app.get("/metrics")
+def metrics():
+    # Prometheus テキスト形式（段ごとのレイテンシ・キャッシュ・プロバイダ・処理中件数）
+    from core.metrics import render
+    return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health")
+def health():
+    # {"ok": bool, "shards": [{"id", "connected", "latency_ms", "guilds", ...}]}。どれか切れていれば 503
+    if _health_fn is None:
+        return jsonify({"ok": True, "shards": []})
+    try:
+        body = _health_fn()
+    except Exception as e:
+        body = {"ok": False, "error": repr(e)}
+    return jsonify(body), (200 if body.get("ok") else 503)
+
 def _run():
     port = int(os.getenv("PORT", "8080"))
     # reloaderを切るのが重要（forkされると検出に失敗しやすい）
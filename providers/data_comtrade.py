@@ -1,4 +1,241 @@
+# providers/data_comtrade.py
+"""
+UN Comtrade の年次一括 CSV → 国ごとの貿易エクスポージャー指標（core.colstore）。
+
+- 取り込み: python ingest_data.py comtrade exports_2022.csv exports_2023.csv.gz ...
+  Comtrade Plus の一括 CSV（reporterISO / partnerISO / flowCode / cmdCode / primaryValue）と
+  旧形式（Reporter ISO / Partner ISO / Trade Flow / Commodity Code / Trade Value (US$)）を読める。
+  1行ずつ読みながら (報告国, 年) 単位に集計するだけなので、元ファイルの大きさはメモリに効かない
+- 指標（(報告国, 年) ごと）:
+    exports_usd / imports_usd
+    partner_hhi        輸出相手国の集中度（HHI、0–1）
+    top_partner_share  最大の輸出相手国のシェア（top3_partner_share は上位3か国）
+    sector_hhi         輸出品目（HS 大分類）の集中度
+    sec_<部門>         部門別の輸出シェア
+- 参照: fetch_comtrade はデータセットを引くだけ（国ごとにメモ化）。無ければ従来どおり {}
+"""
+import csv
+import gzip
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from core.colstore import ColStore, ColStoreBuilder, open_store
+
+COMTRADE_STORE = os.getenv(
+    "COMTRADE_STORE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "comtrade.cols"),
+)
+
+# HS 2桁 → 部門
+_SECTORS = (
+    ("agri", 1, 24), ("mineral", 25, 27), ("chem", 28, 40), ("textile", 41, 67),
+    ("metal", 68, 83), ("machinery", 84, 85), ("transport", 86, 89), ("other", 90, 99),
+)
+SECTORS = tuple(s for s, _, _ in _SECTORS)
+_HS2_SECTOR = {hs: name for name, lo, hi in _SECTORS for hs in range(lo, hi + 1)}
+
+# 列名の別名（小文字・空白除去で比較）
+_COLS = {
+    "year": ("refyear", "period", "year"),
+    "reporter": ("reporteriso", "reporteriso3", "reporter iso"),
+    "reporter_name": ("reporterdesc", "reporter"),
+    "partner": ("partneriso", "partneriso3", "partner iso"),
+    "flow": ("flowcode", "trade flow code", "trade flow"),
+    "cmd": ("cmdcode", "commodity code"),
+    "value": ("primaryvalue", "trade value (us$)", "tradevalue"),
+}
+_LEGACY_FLOW = {"1": "M", "2": "X"}
+_FLOW_INITIAL = {"X": "X", "E": "X", "M": "M", "I": "M"}
+_WORLD = ("W00", "WLD", "0", "")
+_TOTAL = ("TOTAL", "AG0", "ALL")
+
+
+def _open_csv(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def iter_trade_rows(path: str) -> Iterator[Tuple[str, int, str, str, str, float, str]]:
+    """(報告国 ISO3, 年, 相手国 ISO3, "X"/"M", 品目コード, 金額 USD, 報告国名) を1行ずつ返す"""
+    with _open_csv(path) as f:
+        sample = f.readline()
+        delim = "\t" if sample.count("\t") > sample.count(",") else ","
+        header = next(csv.reader([sample], delimiter=delim))
+        norm = {h.strip().lower(): i for i, h in enumerate(header)}
+        idx = {}
+        for name, aliases in _COLS.items():
+            idx[name] = next((norm[a] for a in aliases if a in norm), None)
+        missing = [n for n in ("year", "reporter", "partner", "flow", "cmd", "value") if idx[n] is None]
+        if missing:
+            raise ValueError(f"not a Comtrade extract (missing {', '.join(missing)}): {path}")
+        i_y, i_r, i_p, i_f, i_c, i_v, i_n = (idx[n] for n in ("year", "reporter", "partner", "flow", "cmd",
+                                                              "value", "reporter_name"))
+        width = max(i for i in idx.values() if i is not None)
+        for rec in csv.reader(f, delimiter=delim):
+            if len(rec) <= width:
+                continue
+            raw = rec[i_f].strip().upper()
+            # 旧形式の Trade Flow Code は数値（1=輸入 / 2=輸出 / 3・4=再輸出入）。
+            # それ以外は X / M（"Export" / "Import" も先頭1文字で判定）
+            flow = _LEGACY_FLOW.get(raw) or _FLOW_INITIAL.get(raw[:1])
+            if flow is None:
+                continue   # 再輸出・再輸入などは数えない
+            try:
+                year = int(str(rec[i_y]).strip()[:4])
+                value = float(rec[i_v].replace(",", "") or 0.0)
+            except ValueError:
+                continue
+            yield (rec[i_r].strip().upper(), year, rec[i_p].strip().upper(), flow, rec[i_c].strip().upper(),
+                   value, rec[i_n].strip() if i_n is not None else "")
+
+
+def _hhi(values: Iterable[float]) -> Tuple[float, float]:
+    vals = [v for v in values if v > 0]
+    tot = sum(vals)
+    if tot <= 0:
+        return 0.0, 0.0
+    return sum((v / tot) ** 2 for v in vals), tot
+
+
+def ingest_comtrade(paths: Iterable[str], out: str = COMTRADE_STORE) -> Dict[str, Any]:
+    # (報告国, 年) → 相手国 → 輸出額。合計行（TOTAL）と HS2 桁行のどちらかしか無いファイルもあるので両方集める
+    partner_total: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    partner_hs2: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    # (報告国, 年) → 部門 → 輸出額（相手国＝世界の行を優先、無ければ相手国別の和）
+    sector_world: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    sector_sum: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    totals: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: {"X": 0.0, "M": 0.0})
+    totals_hs2: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: {"X": 0.0, "M": 0.0})
+    names: Dict[str, str] = {}
+    rows = 0
+    files = []
+    for path in paths:
+        files.append(os.path.basename(path))
+        for rep, year, partner, flow, cmd, value, rname in iter_trade_rows(path):
+            rows += 1
+            if len(rep) != 3 or not rep.isalpha():
+                continue
+            if rname:
+                names.setdefault(rep, rname)
+            key = (rep, year)
+            world = partner in _WORLD
+            if cmd in _TOTAL:
+                if world:
+                    totals[key][flow] += value
+                elif flow == "X":
+                    partner_total[key][partner] += value
+            elif len(cmd) == 2 and cmd.isdigit():
+                if world:
+                    totals_hs2[key][flow] += value
+                if flow == "X":
+                    sec = _HS2_SECTOR.get(int(cmd), "other")
+                    (sector_world if world else sector_sum)[key][sec] += value
+                    if not world:
+                        partner_hs2[key][partner] += value
+
+    keys = set(partner_total) | set(partner_hs2) | set(sector_world) | set(sector_sum) | set(totals) | set(totals_hs2)
+    if not keys:
+        raise ValueError("no export/import rows found")
+    b = ColStoreBuilder([y for _, y in keys], meta={"source": "UN Comtrade", "files": files,
+                                                    "ingested": time.strftime("%Y-%m-%dT%H:%M:%S%z")})
+    top: Dict[str, Dict[str, str]] = defaultdict(dict)
+    for key in keys:
+        rep, year = key
+        tot = totals[key] if key in totals else totals_hs2.get(key, {"X": 0.0, "M": 0.0})
+        b.set(rep, "exports_usd", year, tot["X"] or None)
+        b.set(rep, "imports_usd", year, tot["M"] or None)
+        partners = partner_total.get(key) or partner_hs2.get(key)
+        if partners:
+            hhi, ptot = _hhi(partners.values())
+            ranked = sorted(partners.items(), key=lambda kv: -kv[1])
+            b.set(rep, "partner_hhi", year, hhi)
+            b.set(rep, "top_partner_share", year, ranked[0][1] / ptot if ptot else None)
+            b.set(rep, "top3_partner_share", year, sum(v for _, v in ranked[:3]) / ptot if ptot else None)
+            top[rep][str(year)] = ranked[0][0]
+        sectors = sector_world.get(key) or sector_sum.get(key)
+        if sectors:
+            hhi, stot = _hhi(sectors.values())
+            b.set(rep, "sector_hhi", year, hhi)
+            for sec in SECTORS:
+                b.set(rep, "sec_" + sec, year, sectors.get(sec, 0.0) / stot if stot else None)
+    b.meta["names"] = names
+    b.meta["top_partner"] = top
+    b.write(out)
+    reload_store()
+    return {"rows": rows, "reporters": len({r for r, _ in keys}), "years": [b.year0, b.year1], "out": out}
+
+
+# ---- 参照 ----
+
+_store: Optional[ColStore] = None
+_loaded = False
+_by_name: Dict[str, str] = {}
+_metrics: Dict[str, Dict[str, Any]] = {}
+
+
+def get_store() -> Optional[ColStore]:
+    global _store, _loaded, _by_name
+    if not _loaded:
+        _store = open_store(COMTRADE_STORE)
+        _by_name = {n.lower(): iso3 for iso3, n in ((_store.meta.get("names") or {}) if _store else {}).items()}
+        _loaded = True
+    return _store
+
+
+def reload_store():
+    global _store, _loaded
+    _metrics.clear()
+    _store, _loaded = None, False
+
+
+def _resolve_iso3(store: ColStore, country_name: Optional[str]) -> Optional[str]:
+    key = (country_name or "").strip().strip('"').strip()
+    if not key:
+        return None
+    if len(key) == 3 and store.has(key.upper()):
+        return key.upper()
+    low = key.lower()
+    if low in _by_name:
+        return _by_name[low]
+    from providers.data_worldbank import ISO3_FALLBACK
+    iso3 = ISO3_FALLBACK.get(low)
+    return iso3 if iso3 and store.has(iso3) else None
+
+
+def trade_metrics(iso3: str) -> Dict[str, Any]:
+    """最新年の指標（相手国・品目の内訳がある年を優先）"""
+    store = get_store()
+    if store is None or not store.has(iso3):
+        return {}
+    hit = store.latest(iso3, "partner_hhi") or store.latest(iso3, "sector_hhi") or store.latest(iso3, "exports_usd")
+    if hit is None:
+        return {}
+    year = hit[0]
+    row = store.row(iso3, year)
+    out: Dict[str, Any] = {"iso3": iso3, "trade_year": year}
+    for k in ("exports_usd", "imports_usd", "partner_hhi", "top_partner_share", "top3_partner_share", "sector_hhi"):
+        if k in row:
+            out[k] = row[k]
+    shares = {sec: row["sec_" + sec] for sec in SECTORS if "sec_" + sec in row}
+    if shares:
+        out["sector_shares"] = shares
+    tp = ((store.meta.get("top_partner") or {}).get(iso3) or {}).get(str(year))
+    if tp:
+        out["top_partner"] = tp
+    return out
+
 
-# Minimal stub for UN Comtrade（任意）
 async def fetch_comtrade(country_name: str | None):
-    return {}
+    store = get_store()
+    if store is None:
+        return {}
+    iso3 = _resolve_iso3(store, country_name)
+    if iso3 is None:
+        return {}
+    m = _metrics.get(iso3)
+    if m is None:
+        m = _metrics[iso3] = trade_metrics(iso3)
+    return m
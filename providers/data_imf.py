@@ -1,4 +1,209 @@
+# providers/data_imf.py
+"""
+IMF World Economic Outlook（WEO）の一括ファイル → ローカルの列指向データセット（core.colstore）。
+
+- 取り込み: python ingest_data.py imf WEOApr2025all.xls
+  WEO の "By Countries" 全件ファイル（中身はタブ区切りテキスト。UTF-16 / Latin-1 どちらも可）を
+  1行ずつ読み、(ISO3, WEO Subject Code, 年) の値として IMF_WEO_STORE に書き出す。
+  Scale（Billions / Millions）は取り込み時に掛けて基本単位で持つ
+- 参照: fetch_imf_profile はネットワークに出ず、mmap したデータセットを引くだけ（国ごとに結果をメモ化）
+  データセットが無ければ従来どおり {} を返す
+"""
+import codecs
+import csv
+import io
+import os
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from core.colstore import ColStore, ColStoreBuilder, open_store
+
+IMF_WEO_STORE = os.getenv(
+    "IMF_WEO_STORE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "imf_weo.cols"),
+)
+
+# fuse_profile で使う WEO 系列
+S_GDP_USD = "NGDPD"          # 名目 GDP（USD）
+S_GDP_PC = "NGDPDPC"         # 1人あたり名目 GDP（USD）
+S_GROWTH = "NGDP_RPCH"       # 実質 GDP 成長率（%）
+S_INFL = "PCPIPCH"           # 消費者物価上昇率（年平均、%）
+S_INVEST = "NID_NGDP"        # 総投資（%GDP）
+S_DEBT = "GGXWDG_NGDP"       # 一般政府総債務（%GDP）
+S_POP = "LP"                 # 人口
+_PROFILE_SUBJECTS = (S_GDP_USD, S_GDP_PC, S_GROWTH, S_INFL, S_INVEST, S_DEBT, S_POP)
+
+_SCALE = {"": 1.0, "units": 1.0, "thousands": 1e3, "millions": 1e6, "billions": 1e9, "trillions": 1e12}
+_MISSING = ("", "n/a", "--", "na", "...")
+
+
+# ---- 取り込み ----
+
+def _open_text(path: str) -> io.TextIOBase:
+    """BOM を見て文字コードを決める（WEO の配布ファイルは版によって UTF-16 / Latin-1）"""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        enc = "utf-16"
+    elif head.startswith(codecs.BOM_UTF8):
+        enc = "utf-8-sig"
+    else:
+        enc = "latin-1"
+    return open(path, encoding=enc, newline="")
+
+
+def _num(s: Optional[str]) -> Optional[float]:
+    s = (s or "").strip().replace(",", "")
+    if s.lower() in _MISSING:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def iter_weo_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """WEO ファイルを1行ずつ読み、{"iso3", "subject", "country", "scale", "est_after", "values": {年: 値}} を返す"""
+    with _open_text(path) as f:
+        first = f.readline()
+        delim = "\t" if "\t" in first else ","
+        header = next(csv.reader([first], delimiter=delim))
+        col = {h.strip(): i for i, h in enumerate(header)}
+        years = [(i, int(h)) for i, h in enumerate(header) if h.strip().isdigit()]
+        i_iso, i_subj = col.get("ISO"), col.get("WEO Subject Code")
+        if i_iso is None or i_subj is None or not years:
+            raise ValueError(f"not a WEO country file (missing ISO / WEO Subject Code / year columns): {path}")
+        i_name, i_scale, i_est = col.get("Country"), col.get("Scale"), col.get("Estimates Start After")
+        for rec in csv.reader(f, delimiter=delim):
+            if len(rec) <= i_subj:
+                continue   # 末尾の出典行など
+            iso3 = rec[i_iso].strip().upper()
+            subj = rec[i_subj].strip()
+            if len(iso3) != 3 or not subj:
+                continue
+            mult = _SCALE.get((rec[i_scale] if i_scale is not None and i_scale < len(rec) else "").strip().lower(), 1.0)
+            vals = {}
+            for i, y in years:
+                v = _num(rec[i]) if i < len(rec) else None
+                if v is not None:
+                    vals[y] = v * mult
+            est = _num(rec[i_est]) if i_est is not None and i_est < len(rec) else None
+            yield {"iso3": iso3, "subject": subj, "country": rec[i_name].strip() if i_name is not None else "",
+                   "est_after": int(est) if est is not None else None, "values": vals}
+
+
+def _weo_years(path: str) -> range:
+    with _open_text(path) as f:
+        first = f.readline()
+    ys = [int(h) for h in first.replace(",", "\t").split("\t") if h.strip().isdigit()]
+    if not ys:
+        raise ValueError(f"no year columns in {path}")
+    return range(min(ys), max(ys) + 1)
+
+
+def ingest_weo(path: str, out: str = IMF_WEO_STORE) -> Dict[str, Any]:
+    """WEO の一括ファイルを列指向データセットに変換する（ファイル全体はメモリに載せない）"""
+    vintage = os.path.splitext(os.path.basename(path))[0]
+    b = ColStoreBuilder(_weo_years(path), meta={"source": "IMF WEO", "vintage": vintage,
+                                                "ingested": time.strftime("%Y-%m-%dT%H:%M:%S%z")})
+    names: Dict[str, str] = {}
+    est_after: Dict[str, Dict[str, int]] = {}
+    rows = 0
+    for r in iter_weo_rows(path):
+        rows += 1
+        if r["country"]:
+            names.setdefault(r["iso3"], r["country"])
+        if r["est_after"] is not None and r["subject"] in _PROFILE_SUBJECTS:
+            est_after.setdefault(r["iso3"], {})[r["subject"]] = r["est_after"]
+        b.set_series(r["iso3"], r["subject"], r["values"])
+    b.meta["names"] = names
+    b.meta["est_after"] = est_after
+    b.write(out)
+    reload_store()
+    return {"rows": rows, "series": len(b), "countries": len(names), "out": out, "vintage": vintage}
+
+
+# ---- 参照 ----
+
+_store: Optional[ColStore] = None
+_loaded = False
+_by_name: Dict[str, str] = {}
+_profiles: Dict[str, Dict[str, Any]] = {}
+
+
+def get_store() -> Optional[ColStore]:
+    global _store, _loaded, _by_name
+    if not _loaded:
+        _store = open_store(IMF_WEO_STORE)
+        _by_name = {n.lower(): iso3 for iso3, n in ((_store.meta.get("names") or {}) if _store else {}).items()}
+        _loaded = True
+    return _store
+
+
+def reload_store():
+    """取り込み直後などに開き直す（半年に1回の更新を想定）"""
+    global _store, _loaded
+    _profiles.clear()
+    _store, _loaded = None, False
+
+
+def _resolve_iso3(store: ColStore, country_name: Optional[str]) -> Optional[str]:
+    key = (country_name or "").strip().strip('"').strip()
+    if not key:
+        return None
+    if len(key) == 3 and store.has(key.upper()):
+        return key.upper()
+    low = key.lower()
+    if low in _by_name:
+        return _by_name[low]
+    from providers.data_worldbank import ISO3_FALLBACK
+    iso3 = ISO3_FALLBACK.get(low)
+    return iso3 if iso3 and store.has(iso3) else None
+
+
+def _actual(store: ColStore, iso3: str, subj: str, asof: int) -> Optional[float]:
+    """実績値（Estimates Start After 以前）の最新。無ければ asof 年以前の最新（推計込み）"""
+    est = ((store.meta.get("est_after") or {}).get(iso3) or {}).get(subj)
+    hit = store.latest(iso3, subj, upto=min(est, asof) if est else asof)
+    return hit[1] if hit else None
+
+
+def imf_profile(iso3: str, asof: Optional[int] = None) -> Dict[str, Any]:
+    store = get_store()
+    if store is None or not store.has(iso3):
+        return {}
+    y = asof or time.gmtime().tm_year
+    infl_fwd = store.get(iso3, S_INFL, y + 1)
+    if infl_fwd is None:
+        infl_fwd = store.get(iso3, S_INFL, y)
+    debt = store.latest(iso3, S_DEBT, upto=y)
+    invest = _actual(store, iso3, S_INVEST, y)
+    pop = store.latest(iso3, S_POP, upto=y)
+    pop_prev = store.get(iso3, S_POP, pop[0] - 1) if pop else None
+    prof = {
+        "display_name": (store.meta.get("names") or {}).get(iso3),
+        "iso3": iso3,
+        "baseline_gdp_usd": _actual(store, iso3, S_GDP_USD, y),
+        "gdp_per_capita": _actual(store, iso3, S_GDP_PC, y),
+        "inflation_recent": _actual(store, iso3, S_INFL, y),      # %
+        "inflation_forecast": infl_fwd,                            # % （WEO の翌年見通し）
+        "growth_forecast": store.get(iso3, S_GROWTH, y + 1),       # %
+        "investment_rate": invest / 100.0 if invest is not None else None,
+        "debt_to_gdp": debt[1] / 100.0 if debt else None,
+        "labor_growth": (pop[1] / pop_prev - 1.0) * 100.0 if pop and pop_prev else None,
+        "imf_vintage": store.meta.get("vintage"),
+    }
+    return {k: v for k, v in prof.items() if v is not None}
+
 
-# Placeholder IMF adapter: 最小構成では呼びません（WBのCPIを利用）。
 async def fetch_imf_profile(country_name: str | None):
-    return {}
+    store = get_store()
+    if store is None:
+        return {}
+    iso3 = _resolve_iso3(store, country_name)
+    if iso3 is None:
+        return {}
+    prof = _profiles.get(iso3)
+    if prof is None:
+        prof = _profiles[iso3] = imf_profile(iso3)
+    return prof
@@ -1,8 +1,16 @@
 # providers/data_worldbank.py
-import httpx
-from typing import Optional, Dict, Any, List
+import csv
+import gzip
+import io
+import os
+import time
+import zipfile
+from core.http import sync_client
+from core.context import budget
+from core.colstore import ColStore, ColStoreBuilder, open_store
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 
-WB_BASE = "https://api.worldbank.org/v2"
+WB_BASE = os.getenv("WB_BASE_URL", "https://api.worldbank.org/v2").rstrip("/")
 
 # 最低限のISO3フォールバック（失敗時でも動かすため）
 ISO3_FALLBACK = {
@@ -19,6 +27,37 @@ ISO3_FALLBACK = {
     "korea": "KOR",
 }
 
+# 国一覧（プロセス内で1回だけ取得。失敗時は次回再試行）
+_country_rows: Optional[List[Dict[str, Any]]] = None
+
+def _countries() -> List[Dict[str, Any]]:
+    global _country_rows
+    if _country_rows is None:
+        url = f"{WB_BASE}/country?format=json&per_page=400"
+        r = sync_client().get(url, timeout=budget(10))
+        r.raise_for_status()
+        _country_rows = r.json()[1]
+    return _country_rows
+
+def _tier_from_income(x: str) -> str:
+    if x == "HIC":
+        return "high_income"
+    if x in ("UMC", "LMC", "MIC"):
+        return "middle_income"
+    if x in ("LIC",):
+        return "low_income"
+    return "middle_income"
+
+def list_countries() -> List[tuple]:
+    """集計地域を除いた国の (ISO3, 名前, 所得ティア) 一覧（スナップショット生成用）。取得失敗時は []"""
+    try:
+        rows = _countries()
+    except Exception:
+        return []
+    return [(row.get("id"), row.get("name") or row.get("id"),
+             _tier_from_income((row.get("incomeLevel") or {}).get("id") or ""))
+            for row in rows if (row.get("region") or {}).get("id") != "NA" and row.get("id")]
+
 def resolve_iso3(country_name: str) -> Optional[str]:
     if not country_name:
         return None
@@ -27,11 +66,7 @@ def resolve_iso3(country_name: str) -> Optional[str]:
         return ISO3_FALLBACK[key]
     # Web API: 国一覧から検索
     try:
-        url = f"{WB_BASE}/country?format=json&per_page=400"
-        r = httpx.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        rows: List[Dict[str, Any]] = data[1]
+        rows = _countries()
         # 名前/別名/ISO2/ISO3のいずれかにヒットさせる
         for row in rows:
             names = [
@@ -73,7 +108,7 @@ def fetch_country_profile(country_name: str) -> Optional[Dict[str, Any]]:
     try:
         ind_list = ",".join(IND.values())
         url = f"{WB_BASE}/country/{iso3}/indicator/{ind_list}?format=json&per_page=20000"
-        r = httpx.get(url, timeout=15)
+        r = sync_client().get(url, timeout=budget(15))
         r.raise_for_status()
         data = r.json()[1]  # [0]にメタ、[1]にデータ
         # seriesごとに分ける
@@ -91,21 +126,12 @@ def fetch_country_profile(country_name: str) -> Optional[Dict[str, Any]]:
 
         # 所得ティアを取得（高・中・低）。日本は "HIC" → high_income
         url2 = f"{WB_BASE}/country/{iso3}?format=json"
-        r2 = httpx.get(url2, timeout=10)
+        r2 = sync_client().get(url2, timeout=budget(10))
         r2.raise_for_status()
         meta = r2.json()[1][0]
         income_id = (meta.get("incomeLevel", {}) or {}).get("id")  # HIC, MIC, LIC 等
 
-        def tier_from_income(x: str) -> str:
-            if x == "HIC":
-                return "high_income"
-            if x in ("UMC", "LMC", "MIC"):
-                return "middle_income"
-            if x in ("LIC",):
-                return "low_income"
-            return "middle_income"
-
-        tier = tier_from_income(income_id or "")
+        tier = _tier_from_income(income_id or "")
 
         profile = {
             "display_name": meta.get("name") or country_name,
@@ -126,3 +152,161 @@ def fetch_country_profile(country_name: str) -> Optional[Dict[str, Any]]:
 
 # 互換用エイリアス（古いコードで fetch_wb_profile を呼んでも動くように）
 fetch_wb_profile = fetch_country_profile
+
+
+# ---- 過去パネル（バックテスト用） ----
+# WDI の一括 CSV（または API）→ (ISO3, 項目, 年) の列指向データセット（core.colstore）。
+#   python ingest_data.py wb-panel WDICSV.csv                 # WDI 全件（zip / .gz も可）
+#   python ingest_data.py wb-panel API_NY.GDP.MKTP.KD.ZG_*.zip ...   # 指標ごとのダウンロード
+#   python ingest_data.py wb-panel --fetch                    # API から PANEL_INDICATORS を取得
+# PANEL_INDICATORS 以外の指標・集計地域（WLD / HIC など）は読み飛ばす。値は WDI の単位のまま（% は %）
+WB_PANEL_STORE = os.getenv(
+    "WB_PANEL_STORE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "wb_panel.cols"),
+)
+
+# 項目名 → WDI 指標コード
+PANEL_INDICATORS = {
+    "growth": "NY.GDP.MKTP.KD.ZG",     # 実質 GDP 成長率（%）
+    "gdp_usd": "NY.GDP.MKTP.CD",       # 名目 GDP（USD）
+    "gdp_pc": "NY.GDP.PCAP.CD",        # 1人あたり名目 GDP（USD）
+    "invest": "NE.GDI.FTOT.ZS",        # 総固定資本形成（%GDP）
+    "openness": "NE.TRD.GNFS.ZS",      # 貿易（%GDP）
+    "inflation": "FP.CPI.TOTL.ZG",     # 消費者物価上昇率（%）
+    "pop_growth": "SP.POP.GROW",       # 人口増加率（%）
+}
+_PANEL_FIELD = {code: name for name, code in PANEL_INDICATORS.items()}
+_PANEL_FIRST_YEAR = 1960
+
+# WDI の集計地域・所得グループ（国ではないので取り込まない）
+_AGGREGATES = frozenset((
+    "AFE AFW ARB CEB CSS EAP EAR EAS ECA ECS EMU EUU FCS HIC HPC IBD IBT IDA IDB IDX INX LAC LCN LDC LIC "
+    "LMC LMY LTE MEA MIC MNA NAC OED OSS PRE PSS PST SAS SSA SSF SST TEA TEC TLA TMN TSA TSS UMC WLD"
+).split())
+
+
+def _panel_num(s: Optional[str]) -> Optional[float]:
+    s = (s or "").strip()
+    if not s or s == "..":
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _iter_wdi_text(f, path: str, strict: bool) -> Iterator[Tuple[str, str, str, Dict[int, float]]]:
+    reader = csv.reader(f)
+    header = None
+    for rec in reader:
+        # API のダウンロードは先頭に "Data Source" などの前置きが数行ある
+        if "Country Code" in (h.strip() for h in rec):
+            header = [h.strip() for h in rec]
+            break
+    if header is None or "Indicator Code" not in header:
+        if strict:
+            raise ValueError(f"not a WDI CSV (missing Country Code / Indicator Code columns): {path}")
+        return
+    i_iso, i_name, i_ind = header.index("Country Code"), header.index("Country Name"), header.index("Indicator Code")
+    years = [(i, int(h)) for i, h in enumerate(header) if h.isdigit()]
+    for rec in reader:
+        if len(rec) <= i_ind:
+            continue
+        field = _PANEL_FIELD.get(rec[i_ind].strip())
+        iso3 = rec[i_iso].strip().upper()
+        if field is None or len(iso3) != 3 or iso3 in _AGGREGATES:
+            continue
+        vals = {}
+        for i, y in years:
+            v = _panel_num(rec[i]) if i < len(rec) else None
+            if v is not None:
+                vals[y] = v
+        yield iso3, rec[i_name].strip(), field, vals
+
+
+def iter_wdi_rows(path: str) -> Iterator[Tuple[str, str, str, Dict[int, float]]]:
+    """WDI の横持ち CSV を1行ずつ読み、(ISO3, 国名, 項目名, {年: 値}) を返す（PANEL_INDICATORS の指標だけ）。
+    zip は中の CSV を順に読む（Metadata_* や国・系列の説明ファイルは読み飛ばす）"""
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as z:
+            for name in z.namelist():
+                base = os.path.basename(name)
+                if not base.lower().endswith(".csv") or base.startswith("Metadata_"):
+                    continue
+                with z.open(name) as raw:
+                    yield from _iter_wdi_text(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""), path, False)
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+        yield from _iter_wdi_text(f, path, True)
+
+
+def fetch_wb_panel_rows(first_year: int = _PANEL_FIRST_YEAR) -> Iterator[Tuple[str, str, str, Dict[int, float]]]:
+    """API から PANEL_INDICATORS を全か国分取得する（指標ごとにページ送り）。iter_wdi_rows と同じ形で返す"""
+    last_year = time.gmtime().tm_year
+    for field, code in PANEL_INDICATORS.items():
+        by_iso: Dict[str, Dict[int, float]] = {}
+        names: Dict[str, str] = {}
+        page, pages = 1, 1
+        while page <= pages:
+            url = (f"{WB_BASE}/country/all/indicator/{code}?format=json&per_page=20000"
+                   f"&date={first_year}:{last_year}&page={page}")
+            r = sync_client().get(url, timeout=budget(60))
+            r.raise_for_status()
+            body = r.json()
+            if not isinstance(body, list) or len(body) < 2:
+                raise ValueError(f"unexpected WB API response for {code}: {str(body)[:200]}")
+            pages = int((body[0] or {}).get("pages") or 1)
+            for row in body[1] or []:
+                iso3 = (row.get("countryiso3code") or "").upper()
+                v, y = row.get("value"), row.get("date")
+                if len(iso3) != 3 or iso3 in _AGGREGATES or v is None or not str(y).isdigit():
+                    continue
+                by_iso.setdefault(iso3, {})[int(y)] = float(v)
+                names.setdefault(iso3, (row.get("country") or {}).get("value") or iso3)
+            page += 1
+        for iso3, vals in by_iso.items():
+            yield iso3, names[iso3], field, vals
+
+
+def ingest_wb_panel(paths: Iterable[str], out: str = WB_PANEL_STORE, fetch: bool = False) -> Dict[str, Any]:
+    """WDI の CSV（複数可）または API から過去パネルを作る（1行ずつ流し込むのでファイル全体は載せない）"""
+    paths = list(paths)
+    if not paths and not fetch:
+        raise ValueError("no input files (or use --fetch)")
+    b = ColStoreBuilder(range(_PANEL_FIRST_YEAR, time.gmtime().tm_year + 1),
+                        meta={"source": "World Bank WDI", "indicators": PANEL_INDICATORS,
+                              "files": [os.path.basename(p) for p in paths] + (["api"] if fetch else []),
+                              "ingested": time.strftime("%Y-%m-%dT%H:%M:%S%z")})
+    names: Dict[str, str] = {}
+    rows = 0
+    sources = [iter_wdi_rows(p) for p in paths] + ([fetch_wb_panel_rows()] if fetch else [])
+    for src in sources:
+        for iso3, name, field, vals in src:
+            rows += 1
+            names.setdefault(iso3, name)
+            b.set_series(iso3, field, vals)
+    if not rows:
+        raise ValueError("no panel rows found (expected WDI indicators: " + ", ".join(PANEL_INDICATORS.values()) + ")")
+    b.meta["names"] = names
+    b.write(out)
+    reload_panel()
+    return {"rows": rows, "series": len(b), "countries": len(names), "out": out}
+
+
+_panel: Optional[ColStore] = None
+_panel_loaded = False
+
+
+def get_panel() -> Optional[ColStore]:
+    """過去パネル（無ければ None）"""
+    global _panel, _panel_loaded
+    if not _panel_loaded:
+        _panel = open_store(WB_PANEL_STORE)
+        _panel_loaded = True
+    return _panel
+
+
+def reload_panel():
+    global _panel, _panel_loaded
+    _panel, _panel_loaded = None, False
@@ -1,13 +1,16 @@
 
-import httpx
+import os
+from core.http import async_client
+from core.context import budget
+
+FX_BASE = os.getenv("FX_BASE_URL", "https://api.exchangerate.host").rstrip("/")
 
 async def fetch_fx(base: str = "USD"):
     try:
-        url = f"https://api.exchangerate.host/latest?base={base}"
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.get(url)
-            r.raise_for_status()
-            js = r.json()
-            return {"base": base, "date": js.get("date"), "rates": js.get("rates", {})}
+        url = f"{FX_BASE}/latest?base={base}"
+        r = await async_client().get(url, timeout=budget(15))
+        r.raise_for_status()
+        js = r.json()
+        return {"base": base, "date": js.get("date"), "rates": js.get("rates", {})}
     except Exception:
         return {"base": base, "rates": {}}
@@ -1,8 +1,13 @@
 
-import os, httpx, json
-from core.schemas import JSON_SCHEMA
+import os
+from typing import Any, Dict
+from core.schemas import JSON_SCHEMA_TEXT
+from core.jsonutil import loads, loads_llm
+from core.http import async_client
+from core.context import budget
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1").rstrip("/")
 
 PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンです。
 次のJSONスキーマに完全準拠して出力。未知は null/unknown。
@@ -12,29 +17,26 @@ PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンで
 出力は JSON のみ。
 '''
 
-async def extract_policies_claude(policy_text: str) -> str:
+async def extract_policies_claude(policy_text: str) -> Dict[str, Any]:
     if not ANTHROPIC_API_KEY:
         raise RuntimeError("ANTHROPIC_API_KEY not set")
-    prompt = PROMPT_TMPL.format(schema=json.dumps(JSON_SCHEMA, ensure_ascii=False), text=policy_text)
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": ANTHROPIC_API_KEY,
-                "anthropic-version": "2023-06-01"
-            },
-            json={
-                "model": "claude-3-7-sonnet-20250219",
-                "max_tokens": 2048,
-                "messages": [{"role":"user","content":prompt}],
-            }
-        )
-        r.raise_for_status()
-        data = r.json()
-        text = data["content"][0]["text"]
-        try:
-            obj = json.loads(text)
-            obj["_model_name"] = "claude"
-            return json.dumps(obj, ensure_ascii=False)
-        except Exception:
-            return text
+    prompt = PROMPT_TMPL.format(schema=JSON_SCHEMA_TEXT, text=policy_text)
+    client = async_client()  # 共有プール
+    r = await client.post(
+        f"{ANTHROPIC_BASE_URL}/messages",
+        headers={
+            "x-api-key": ANTHROPIC_API_KEY,
+            "anthropic-version": "2023-06-01"
+        },
+        json={
+            "model": "claude-3-7-sonnet-20250219",
+            "max_tokens": 2048,
+            "messages": [{"role":"user","content":prompt}],
+        },
+        timeout=budget(30),  # 残り時間で切り詰め
+    )
+    r.raise_for_status()
+    data = loads(r.content)
+    text = data["content"][0]["text"]
+    # パース済みオブジェクトをそのまま返す（文字列へ戻さない）
+    return loads_llm(text)
@@ -1,8 +1,13 @@
 
-import os, httpx, json
-from core.schemas import JSON_SCHEMA
+import os
+from typing import Any, Dict
+from core.schemas import JSON_SCHEMA_TEXT
+from core.jsonutil import loads, loads_llm
+from core.http import async_client
+from core.context import budget
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
 
 PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンです。
 次のJSONスキーマに完全準拠し、出力は JSON のみ。
@@ -12,22 +17,18 @@ PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンで
 {text}
 '''
 
-async def extract_policies_gemini(policy_text: str) -> str:
+async def extract_policies_gemini(policy_text: str) -> Dict[str, Any]:
     if not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY not set")
-    prompt = PROMPT_TMPL.format(schema=json.dumps(JSON_SCHEMA, ensure_ascii=False), text=policy_text)
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-pro:generateContent?key={GEMINI_API_KEY}"
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(url, json={
-            "contents":[{"parts":[{"text": prompt}]}],
-            "generationConfig":{"responseMimeType":"application/json"}
-        })
-        r.raise_for_status()
-        data = r.json()
-        text = data["candidates"][0]["content"]["parts"][0]["text"]
-        try:
-            obj = json.loads(text)
-            obj["_model_name"] = "gemini"
-            return json.dumps(obj, ensure_ascii=False)
-        except Exception:
-            return text
+    prompt = PROMPT_TMPL.format(schema=JSON_SCHEMA_TEXT, text=policy_text)
+    url = f"{GEMINI_BASE_URL}/models/gemini-1.5-pro:generateContent?key={GEMINI_API_KEY}"
+    client = async_client()  # 共有プール
+    r = await client.post(url, json={
+        "contents":[{"parts":[{"text": prompt}]}],
+        "generationConfig":{"responseMimeType":"application/json"}
+    }, timeout=budget(30))
+    r.raise_for_status()
+    data = loads(r.content)
+    text = data["candidates"][0]["content"]["parts"][0]["text"]
+    # パース済みオブジェクトをそのまま返す（文字列へ戻さない）
+    return loads_llm(text)
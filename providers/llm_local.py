@@ -18,7 +18,7 @@ def _guess_scale(text: str):
         return {"value": v, "unit": "trillion_yen_per_year" if "年" in t else "trillion_yen"}
     m = re.search(_NUMBER + r'\s*億', t)
     if m:
-        v = float(m.group(1)) / 10.0  # ざっくり換算：10億 = 1兆の1/10
+        v = float(m.group(1)) / 10000.0  # 1兆 = 1万億
         return {"value": v, "unit": "trillion_yen_per_year" if "年" in t else "trillion_yen"}
     m = re.search(_NUMBER + r'\s*%|％', t)
     if m:
@@ -1,8 +1,13 @@
 
-import os, httpx, json
-from core.schemas import JSON_SCHEMA
+import os
+from typing import Any, Dict
+from core.schemas import JSON_SCHEMA_TEXT
+from core.jsonutil import loads, loads_llm
+from core.http import async_client
+from core.context import budget
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
 
 PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンです。
 次のJSONスキーマに完全準拠し、未知は null/unknown を使用してください。
@@ -12,32 +17,29 @@ PROMPT_TMPL = '''あなたは政策テキストを構造化するエンジンで
 出力は JSON のみ。
 '''
 
-async def extract_policies_openai(policy_text: str) -> str:
+async def extract_policies_openai(policy_text: str) -> Dict[str, Any]:
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY not set")
-    prompt = PROMPT_TMPL.format(schema=json.dumps(JSON_SCHEMA, ensure_ascii=False), text=policy_text)
+    prompt = PROMPT_TMPL.format(schema=JSON_SCHEMA_TEXT, text=policy_text)
     payload = {
         "model": "gpt-4.1-mini",
         "input": prompt,
         "response_format": {"type": "json_object"}
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(
-            "https://api.openai.com/v1/responses",
-            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-            json=payload
-        )
-        r.raise_for_status()
-        data = r.json()
-        text = data.get("output_text")
-        if not text:
-            try:
-                text = data["output"][0]["content"][0]["text"]
-            except Exception:
-                text = json.dumps({"horizon_years":5,"policies":[]}, ensure_ascii=False)
+    client = async_client()  # 共有プール
+    r = await client.post(
+        f"{OPENAI_BASE_URL}/responses",
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+        json=payload,
+        timeout=budget(30),  # 残り時間で切り詰め
+    )
+    r.raise_for_status()
+    data = loads(r.content)
+    text = data.get("output_text")
+    if not text:
         try:
-            obj = json.loads(text)
-            obj["_model_name"] = "openai"
-            return json.dumps(obj, ensure_ascii=False)
+            text = data["output"][0]["content"][0]["text"]
         except Exception:
-            return text
+            return {"horizon_years":5,"policies":[]}
+    # パース済みオブジェクトをそのまま返す（文字列へ戻さない）
+    return loads_llm(text)
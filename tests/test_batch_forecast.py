@@ -0,0 +1,34 @@
+# tests/test_batch_forecast.py
+import json
+
+import batch_forecast
+import core.orchestrator
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+def test_resume_retries_failures_without_duplicate_ids(tmp_path, monkeypatch):
+    inp, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    inp.write_text("".join(json.dumps({"id": i, "country": "Japan", "text": f"policy {i}"}) + "\n"
+                           for i in ("a", "b", "c")), encoding="utf-8")
+    failing = {"b"}
+
+    async def fake_pipeline(country, horizon, text, overrides, deadline=None, executor=None):
+        if text.endswith(tuple(failing)):
+            raise RuntimeError("upstream down")
+        return {"id": "run", "scenarios": {"base": [1.0]}, "profile_used": {"display_name": country}}
+
+    monkeypatch.setattr(core.orchestrator, "run_pipeline", fake_pipeline)
+    assert batch_forecast.main([str(inp), "-o", str(out)]) == 1
+    assert {r["id"]: r["ok"] for r in _lines(out)} == {"a": True, "b": False, "c": True}
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"id": "c", "ok": tr')   # 中断で切れた最終行
+
+    failing.clear()
+    assert batch_forecast.main([str(inp), "-o", str(out)]) == 0
+    recs = _lines(out)
+    assert sorted(r["id"] for r in recs) == ["a", "b", "c"]
+    assert all(r["ok"] for r in recs)
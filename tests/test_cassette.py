@@ -0,0 +1,45 @@
+# tests/test_cassette.py
+import asyncio
+import gzip
+import json
+
+import httpx
+
+from core.cassette import (AsyncRecordingTransport, AsyncReplayTransport, Cassette, RecordingTransport,
+                           ReplayTransport)
+
+_BODY = {"page": 1, "value": [1.5, 2.5]}
+
+
+def _gzip_upstream(request: httpx.Request) -> httpx.Response:
+    raw = gzip.compress(json.dumps(_BODY).encode("utf-8"))
+    return httpx.Response(200, content=raw, headers={"content-type": "application/json",
+                                                     "content-encoding": "gzip",
+                                                     "content-length": str(len(raw))})
+
+
+def test_record_then_replay_gzip_upstream(tmp_path):
+    path = str(tmp_path / "c.jsonl")
+    url = "https://api.example.org/v2/country/JPN?format=json&key=secret"
+    with httpx.Client(transport=RecordingTransport(Cassette(path), inner=httpx.MockTransport(_gzip_upstream))) as c:
+        r = c.get(url)
+        assert r.json() == _BODY
+        assert "content-encoding" not in r.headers
+    with httpx.Client(transport=ReplayTransport(Cassette(path).load())) as c:
+        r = c.get(url)
+        assert r.status_code == 200
+        assert r.json() == _BODY
+
+
+def test_async_record_then_replay_gzip_upstream(tmp_path):
+    path = str(tmp_path / "c.jsonl")
+    url = "https://api.example.org/v1/chat"
+
+    async def go():
+        rec = AsyncRecordingTransport(Cassette(path), inner=httpx.MockTransport(_gzip_upstream))
+        async with httpx.AsyncClient(transport=rec) as c:
+            assert (await c.post(url, content=b"{}")).json() == _BODY
+        async with httpx.AsyncClient(transport=AsyncReplayTransport(Cassette(path).load())) as c:
+            assert (await c.post(url, content=b"{}")).json() == _BODY
+
+    asyncio.run(go())
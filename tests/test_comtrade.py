@@ -0,0 +1,59 @@
+# tests/test_comtrade.py
+import csv
+
+import pytest
+
+from core.colstore import ColStore
+from providers.data_comtrade import ingest_comtrade
+
+# (年, 報告国, 報告国名, 相手国, "X"/"M"/"RX", 品目, 金額)
+_ROWS = [
+    (2022, "JPN", "Japan", "WLD", "X", "TOTAL", 700.0),
+    (2022, "JPN", "Japan", "WLD", "M", "TOTAL", 800.0),
+    (2022, "JPN", "Japan", "USA", "X", "TOTAL", 200.0),
+    (2022, "JPN", "Japan", "CHN", "X", "TOTAL", 150.0),
+    (2022, "JPN", "Japan", "KOR", "X", "TOTAL", 50.0),
+    (2022, "JPN", "Japan", "WLD", "RX", "TOTAL", 999.0),
+    (2022, "JPN", "Japan", "WLD", "X", "87", 300.0),
+    (2022, "JPN", "Japan", "WLD", "X", "85", 400.0),
+]
+
+_LEGACY_HEADER = ["Classification", "Year", "Period", "Period Desc.", "Aggregate Level", "Is Leaf Code",
+                  "Trade Flow Code", "Trade Flow", "Reporter Code", "Reporter", "Reporter ISO", "Partner Code",
+                  "Partner", "Partner ISO", "Commodity Code", "Commodity", "Trade Value (US$)", "Flag"]
+_LEGACY_FLOW = {"X": ("2", "Export"), "M": ("1", "Import"), "RX": ("3", "Re-Export")}
+
+
+def _write_plus(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["refYear", "reporterISO", "reporterDesc", "partnerISO", "flowCode", "cmdCode", "primaryValue"])
+        for y, rep, name, par, flow, cmd, v in _ROWS:
+            w.writerow([y, rep, name, par, flow, cmd, v])
+
+
+def _write_legacy(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(_LEGACY_HEADER)
+        for y, rep, name, par, flow, cmd, v in _ROWS:
+            code, label = _LEGACY_FLOW[flow]
+            w.writerow(["H5", y, y, y, 0 if cmd == "TOTAL" else 2, 0, code, label, 392, name, rep, 0, par, par,
+                        cmd, "", v, 0])
+
+
+@pytest.mark.parametrize("writer", [_write_plus, _write_legacy])
+def test_ingest_plus_and_legacy_headers(tmp_path, writer):
+    src, out = str(tmp_path / "trade.csv"), str(tmp_path / "trade.cols")
+    writer(src)
+    res = ingest_comtrade([src], out)
+    assert res["reporters"] == 1
+    st = ColStore(out)
+    try:
+        assert st.get("JPN", "exports_usd", 2022) == 700.0
+        assert st.get("JPN", "imports_usd", 2022) == 800.0
+        assert st.get("JPN", "top_partner_share", 2022) == pytest.approx(0.5)
+        assert st.get("JPN", "sec_machinery", 2022) == pytest.approx(400 / 700)
+        assert st.meta["names"]["JPN"] == "Japan"
+    finally:
+        st.close()
@@ -0,0 +1,34 @@
+# tests/test_profiling.py
+import asyncio
+import tracemalloc
+
+from core.profiling import ProfileSession
+
+
+def test_overlapping_sessions_share_tracemalloc():
+    async def work(delay, value):
+        buf = [bytes(1000) for _ in range(100)]
+        await asyncio.sleep(delay)
+        return value, len(buf)
+
+    async def go():
+        short, long_ = ProfileSession(interval=0.001), ProfileSession(interval=0.001)
+        # 先に始まった短いセッションが tracemalloc を開始し、長いセッションより先に抜ける
+        return await asyncio.gather(short.run(work(0.02, "short")), long_.run(work(0.1, "long"))), short, long_
+
+    assert not tracemalloc.is_tracing()
+    (r_short, r_long), short, long_ = asyncio.run(go())
+    assert r_long == ("long", 100) and r_short == ("short", 100)
+    assert short.alloc and long_.alloc
+    assert not tracemalloc.is_tracing()
+
+
+def test_external_tracing_is_left_running():
+    tracemalloc.start()
+    try:
+        async def go():
+            return await ProfileSession(interval=0.001).run(asyncio.sleep(0.01, result=1))
+        assert asyncio.run(go()) == 1
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
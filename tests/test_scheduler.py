@@ -0,0 +1,52 @@
+# tests/test_scheduler.py
+import asyncio
+
+from core.scheduler import JobScheduler
+
+
+def test_cancel_before_first_step_releases_slot():
+    async def go():
+        sched = JobScheduler(max_concurrency=1, budget_sec=1e9)
+        started = []
+
+        async def job():
+            started.append(1)
+            await asyncio.sleep(10)
+
+        waiter = asyncio.ensure_future(sched.submit(job))
+        while not sched._running:
+            await asyncio.sleep(0)
+        # 実行タスクが最初の一歩を踏む前にキャンセルされる（submit の CancelledError 経路と同じ状態）
+        runner, = asyncio.all_tasks() - {asyncio.current_task(), waiter}
+        runner.cancel()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert started == []
+        assert sched._running == 0
+
+        async def quick():
+            return "ok"
+        assert await asyncio.wait_for(sched.submit(quick), 1) == "ok"
+        assert sched._running == 0
+
+    asyncio.run(go())
+
+
+def test_cancel_while_running_releases_slot():
+    async def go():
+        sched = JobScheduler(max_concurrency=1, budget_sec=1e9)
+        gate = asyncio.Event()
+
+        async def job():
+            gate.set()
+            await asyncio.sleep(10)
+
+        waiter = asyncio.ensure_future(sched.submit(job))
+        await gate.wait()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert sched._running == 0
+
+    asyncio.run(go())
@@ -0,0 +1,52 @@
+# tests/test_schemas.py
+import pytest
+
+from core.policy import policies_from_output
+from core.schemas import SchemaError, clean_extract_output
+
+
+def _one(**fields):
+    p = {"title": "港湾インフラ整備", "lever": ["infrastructure"], "scale": {"value": 1, "unit": "trillion_jpy"},
+         "direction": ["up"], "lag_years": 2, "confidence": "A"}
+    p.update(fields)
+    return {"horizon_years": 5, "policies": [p]}
+
+
+@pytest.mark.parametrize("fields", [
+    {"lag_years": 2.0},
+    {"lag_years": "2"},
+    {"confidence": None},
+    {"scale": {"value": "10", "unit": "%GDP"}},
+    {"scale": {"value": 10}},
+    {"scale": None},
+    {"lever": "infrastructure"},
+    {"lever": None},
+])
+def test_loose_types_are_coerced(fields):
+    out, dropped = clean_extract_output(_one(**fields))
+    assert dropped == []
+    assert len(out["policies"]) == 1
+    horizon, pols = policies_from_output(out)
+    assert horizon == 5 and len(pols) == 1
+
+
+def test_string_horizon_is_coerced():
+    out, _ = clean_extract_output(dict(_one(), horizon_years="5"))
+    assert out["horizon_years"] == 5
+    out, _ = clean_extract_output(dict(_one(), horizon_years="soon"))
+    assert "horizon_years" not in out
+
+
+def test_only_bad_policy_is_dropped():
+    obj = _one()
+    obj["policies"] += [{"lever": ["trade"]}, {"title": "x", "lag_years": "two"}, "not a policy",
+                        {"title": "規制緩和", "lever": ["regulation"]}]
+    out, dropped = clean_extract_output(obj)
+    assert [p["title"] for p in out["policies"]] == ["港湾インフラ整備", "規制緩和"]
+    assert len(dropped) == 3
+
+
+@pytest.mark.parametrize("obj", [None, [], {"horizon_years": 5}, {"policies": "none"}])
+def test_unusable_output_is_rejected(obj):
+    with pytest.raises(SchemaError):
+        clean_extract_output(obj)